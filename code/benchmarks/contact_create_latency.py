@@ -0,0 +1,82 @@
+# benchmarks/contact_create_latency.py
+"""
+Замер задержки сохранения контакта на стенде (POST /api/contacts/)
+
+Запуск против поднятого API:
+    python benchmarks/contact_create_latency.py --url http://localhost:8000/api --requests 500 --concurrency 4
+
+Число запросов к БД на одно сохранение удобно проверить по логу SQL
+(engine создаётся с echo=True): на сохранение должен приходиться один INSERT ... RETURNING.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import aiohttp
+
+
+def make_contact(i: int) -> dict:
+    suffix = uuid.uuid4().hex[:8]
+    return {
+        "title": f"ООО Стенд {suffix}",
+        "full_name": f"Петров Пётр {i}",
+        "position": "Инженер",
+        "email": f"latency_{suffix}@example.com",
+        "phone_number": f"+7 912 {i % 1000:03d}-{suffix[:2]}",
+        "city": "Екатеринбург",
+        "questionnaire": {"product_type": [], "manufacturer": [], "contact_type": ""},
+    }
+
+
+async def worker(session: aiohttp.ClientSession, url: str, ids: range, latencies: list, errors: list):
+    for i in ids:
+        started = time.perf_counter()
+        async with session.post(f"{url}/contacts/", json=make_contact(i)) as response:
+            await response.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status != 201:
+            errors.append(response.status)
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(url: str, total: int, concurrency: int, user_id: str, session_id: str):
+    headers = {"user_id": user_id, "session_id": session_id} if user_id else {}
+    latencies, errors = [], []
+    per_worker = total // concurrency
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        # Прогрев соединений и пула БД
+        await worker(session, url, range(concurrency), [], [])
+
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(session, url, range(n * per_worker, (n + 1) * per_worker), latencies, errors)
+            for n in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    print(f"{len(latencies)} сохранений за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} в секунду), ошибок: {len(errors)}")
+    print(f"p50={percentile(latencies, 50):.1f} мс  p95={percentile(latencies, 95):.1f} мс  "
+          f"p99={percentile(latencies, 99):.1f} мс  среднее={statistics.mean(latencies):.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--user-id", default="")
+    parser.add_argument("--session-id", default="")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.user_id, args.session_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/contacts_batch.py
+"""
+Нагрузочный замер POST /api/contacts/batch
+
+Запуск против поднятого API:
+    python benchmarks/contacts_batch.py --url http://localhost:8000/api --count 10000
+
+Повторный запуск с тем же --seed проверяет путь с дубликатами
+(все строки должны вернуться со статусом duplicate).
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import aiohttp
+
+
+def make_contacts(count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    contacts = []
+    for i in range(count):
+        number = rnd.randrange(10 ** 9, 10 ** 10)
+        contacts.append({
+            "title": f"ООО Бенчмарк {seed}-{i}",
+            "full_name": f"Иванов Иван {i}",
+            "position": "Менеджер",
+            "email": f"bench{seed}_{i}@example.com",
+            "phone_number": f"+7 ({str(number)[:3]}) {str(number)[3:6]}-{str(number)[6:8]}-{str(number)[8:]}",
+            "city": "Москва",
+            "questionnaire": {"product_type": [], "manufacturer": [], "contact_type": ""},
+        })
+    return contacts
+
+
+async def run(url: str, count: int, seed: int, user_id: str, session_id: str):
+    payload = {"contacts": make_contacts(count, seed)}
+    headers = {"user_id": user_id, "session_id": session_id} if user_id else {}
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        started = time.perf_counter()
+        async with session.post(f"{url}/contacts/batch", json=payload) as response:
+            body = await response.json()
+        elapsed = time.perf_counter() - started
+
+    print(f"HTTP {response.status}, {count} контактов за {elapsed:.2f} с "
+          f"({count / elapsed:.0f} контактов/с)")
+    if response.status == 200:
+        print(f"created={body['created']} duplicate={body['duplicate']} error={body['error']}")
+    else:
+        print(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=int(time.time()))
+    parser.add_argument("--user-id", default="")
+    parser.add_argument("--session-id", default="")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.count, args.seed, args.user_id, args.session_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/files_upload_multiple.py
+"""
+Замер POST /api/files/upload-multiple на стенде (по умолчанию 50 файлов в запросе)
+
+Запуск против поднятого API:
+    python benchmarks/files_upload_multiple.py --url http://localhost:8000/api --files 50 --size-kb 512 --rounds 5
+
+Каждый раунд отправляет новые случайные файлы, поэтому на диск пишутся новые блобы.
+С --repeat-content все раунды шлют одни и те же байты: проверяется путь,
+когда блобы уже есть и на диск ничего не пишется.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import aiohttp
+
+
+def make_files(count: int, size: int) -> list:
+    return [(f"bench_{i}.txt", os.urandom(size)) for i in range(count)]
+
+
+async def upload(session: aiohttp.ClientSession, url: str, files: list) -> tuple:
+    form = aiohttp.FormData()
+    for name, content in files:
+        form.add_field("files", content, filename=name, content_type="text/plain")
+
+    started = time.perf_counter()
+    async with session.post(f"{url}/files/upload-multiple", data=form) as response:
+        body = await response.json()
+    return response.status, body, time.perf_counter() - started
+
+
+async def run(url: str, count: int, size_kb: int, rounds: int, repeat_content: bool):
+    size = size_kb * 1024
+    fixed_files = make_files(count, size) if repeat_content else None
+    timings = []
+
+    async with aiohttp.ClientSession() as session:
+        for round_number in range(rounds):
+            files = fixed_files or make_files(count, size)
+            status, body, elapsed = await upload(session, url, files)
+            timings.append(elapsed)
+
+            if status != 200:
+                print(f"HTTP {status}: {body}")
+                return
+            print(f"Раунд {round_number + 1}: {elapsed:.2f} с, "
+                  f"created={body['created']} error={body['error']}")
+            for item in body["items"]:
+                if item["status"] != "created":
+                    print(f"  {item['filename']}: {'; '.join(item['errors'])}")
+
+    total_mb = count * size / 1024 / 1024
+    median = statistics.median(timings)
+    print(f"{count} файлов по {size_kb}KB: медиана {median:.2f} с, "
+          f"{count / median:.0f} файлов/с, {total_mb / median:.1f} MB/с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api")
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--repeat-content", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.files, args.size_kb, args.rounds, args.repeat_content))
+
+
+if __name__ == "__main__":
+    main()
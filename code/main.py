@@ -1,8 +1,7 @@
 # main.py
-from fastapi import FastAPI, Response, Cookie, HTTPException, status, Depends, File, UploadFile, Form
+from fastapi import FastAPI, Request, Response, Cookie, HTTPException, status, Depends, File, UploadFile, Form
 from fastapi.responses import RedirectResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession
 import uvicorn
@@ -15,9 +14,20 @@ from typing import Dict, Any, Optional
 
 from models.user import User
 
-from models.database import engine, AsyncSessionLocal, create_tables, get_db
-
-from routers import exhibitions_router, contacts_router, files_router, users_router
+from models.database import engine, AsyncSessionLocal, create_tables, get_db, DATABASE_URL
+
+from routers import exhibitions_router, contacts_router, files_router, users_router, uploads_router
+from services.file_cleanup import file_cleanup
+from services.idempotency import purge_expired_keys_periodically
+from services.resumable_uploads import purge_stale_sessions_periodically
+from services.orphan_gc import run_gc_periodically, ORPHAN_GC_INTERVAL
+from services.contact_events import contact_events
+from services.user_cache import user_cache
+from services.auth_service import auth_service
+from services.auth import read_credentials, get_optional_user, revoke_session_tokens
+from services.thumbnails import thumbnails
+from services.session_tokens import issue_session_token, set_session_token_cookie, SESSION_TOKEN_COOKIE
+import asyncio
 
 #OCR
 from PIL import Image, ImageFilter, ImageEnhance
@@ -61,8 +71,32 @@ async def lifespan(app: FastAPI):
         print(f"❌ Ошибка подключения к БД: {e}")
         raise
 
+    # Фоновое удаление файлов с диска
+    file_cleanup.start()
+    # Очистка просроченных ключей идемпотентности
+    idempotency_purge_task = asyncio.create_task(purge_expired_keys_periodically())
+    # Удаление брошенных сессий возобновляемой загрузки
+    resumable_purge_task = asyncio.create_task(purge_stale_sessions_periodically())
+    # Сборка мусора файлов (если задан ORPHAN_GC_INTERVAL)
+    orphan_gc_task = asyncio.create_task(run_gc_periodically()) if ORPHAN_GC_INTERVAL > 0 else None
+    # Live-лента контактов (LISTEN/NOTIFY между воркерами, если включено)
+    await contact_events.start(DATABASE_URL.replace("+asyncpg", ""))
+    # Общий HTTP-клиент к внешней системе авторизации
+    await auth_service.start()
+    # Генерация превью изображений в пуле процессов
+    thumbnails.start()
+
     yield
 
+    await thumbnails.stop()
+    await auth_service.stop()
+    await contact_events.stop()
+    idempotency_purge_task.cancel()
+    resumable_purge_task.cancel()
+    if orphan_gc_task is not None:
+        orphan_gc_task.cancel()
+    await file_cleanup.stop()
+
     # Закрываем соединения при завершении
     await engine.dispose()
     #print("✅ Соединения с БД закрыты")
@@ -88,9 +122,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Подключаем статические файлы
-app.mount("/api/uploads", StaticFiles(directory="uploads"), name="uploads")
-
+# Загруженные файлы: проверка доступа в Python, тело отдаёт nginx (X-Accel-Redirect)
+app.include_router(uploads_router, prefix="/api")
 app.include_router(contacts_router, prefix="/api")
 app.include_router(exhibitions_router, prefix="/api")
 app.include_router(files_router, prefix="/api")
@@ -115,6 +148,12 @@ async def login(
         "session_id": "session_token_123"
     }
     """
+    # Данные пользователя приходят от клиента, поэтому сессия подтверждается внешней системой
+    if not await auth_service.verify_session(user_data.get('session_id'), user_data.get('id')):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Сессия не подтверждена системой авторизации"
+        )
 
     try:
         # Извлекаем данные
@@ -173,6 +212,7 @@ async def login(
 
         await db.commit()
         await db.refresh(user)
+        user_cache.invalidate_user(user.id)
 
         # redirect_url = f"http://exhibitions.kyberlox.ru/users/me"
         #  # Создаем RedirectResponse
@@ -197,8 +237,13 @@ async def login(
             max_age=30 * 24 * 60 * 60
         )
 
+        # Подписанный токен для проверки прав без запроса к БД
+        session_token = issue_session_token(user)
+        set_session_token_cookie(response, session_token)
+
         return {
             "message": "Успешная авторизация",
+            "session_token": session_token,
             "user": {
                 "id": user.id,
                 "full_name": user.full_name,
@@ -242,6 +287,12 @@ async def login_get(
         "session_id": "session_token_123"
     }
     """
+    # Данные пользователя приходят в параметрах, поэтому сессия подтверждается внешней системой
+    if not await auth_service.verify_session(session_id, external_id):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Сессия не подтверждена системой авторизации"
+        )
 
     try:
         # Извлекаем данные
@@ -300,6 +351,7 @@ async def login_get(
 
         await db.commit()
         await db.refresh(user)
+        user_cache.invalidate_user(user.id)
 
         redirect_url = f"https://exhibitions.emk.ru/"
         #  # Создаем RedirectResponse
@@ -324,6 +376,10 @@ async def login_get(
             max_age=30 * 24 * 60 * 60
         )
 
+        # Подписанный токен для проверки прав без запроса к БД
+        session_token = issue_session_token(user)
+        set_session_token_cookie(response, session_token)
+
         # return {
         #     "message": "Успешная авторизация",
         #     "user": {
@@ -349,12 +405,31 @@ async def login_get(
 
 
 @app.post("/api/logout")
-async def logout(response: Response):
+async def logout(
+        request: Request,
+        response: Response,
+        session_id: Optional[str] = Cookie(None, alias="session_id"),
+        user_id: Optional[int] = Cookie(None, alias="user_id"),
+        current_user: Optional[User] = Depends(get_optional_user),
+        db: AsyncSession = Depends(get_db)
+):
     """
-    Выход из системы (очистка куки)
+    Выход из системы (очистка куки и кэшей сессии, отзыв подписанных токенов)
     """
+    if current_user is not None:
+        await revoke_session_tokens(db, current_user.id)
+        await db.commit()
+        user_cache.invalidate_user(current_user.id)
+
+    user_id, session_id = read_credentials(request, session_id, user_id)
+    if session_id:
+        auth_service.invalidate(session_id)
+    if user_id:
+        user_cache.invalidate_user(user_id)
+
     response.delete_cookie(key="session_id")
     response.delete_cookie(key="user_id")
+    response.delete_cookie(key=SESSION_TOKEN_COOKIE)
 
     return {"message": "Успешный выход из системы"}
 
@@ -2,7 +2,9 @@
 from .base import Base
 from .file import File
 from .exhibition import Exhibition
-from .contact import Contact, ContactFileType, contact_file_association
+from .contact import Contact, ContactFileType, ContactTombstone, contact_file_association
+from .idempotency import IdempotencyKey
+from .blob import Blob
 
 __all__ = [
     "Base",
@@ -10,5 +12,8 @@ __all__ = [
     "Exhibition",
     "Contact",
     "ContactFileType",
-    "contact_file_association"
+    "ContactTombstone",
+    "contact_file_association",
+    "IdempotencyKey",
+    "Blob"
 ]
\ No newline at end of file
@@ -0,0 +1,22 @@
+# models/blob.py
+from sqlalchemy import Column, String, Text, DateTime, Integer, BigInteger
+from sqlalchemy.sql import func
+
+from .base import Base
+
+class Blob(Base):
+    """
+    Содержимое файла, хранящееся на диске один раз под своим SHA-256.
+    ref_count — число строк files, ссылающихся на блоб (поддерживается триггером)
+    """
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    path = Column(Text, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<Blob(sha256='{self.sha256}', size={self.size}, ref_count={self.ref_count})>"
@@ -1,5 +1,5 @@
 # models/contact.py
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, Table, DateTime, Boolean
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, Table, DateTime, Boolean, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 import enum
@@ -28,6 +28,11 @@ contact_file_association = Table(
 
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index("ix_contacts_exhibition_email_normalized", "exhibition_id", "email_normalized"),
+        Index("ix_contacts_exhibition_phone_normalized", "exhibition_id", "phone_normalized"),
+        Index("ix_contacts_updated_at_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False, index=True)
@@ -38,7 +43,11 @@ class Contact(Base):
     phone_number = Column(String(255), nullable=False, index=True)
     city = Column(String(255), nullable=True, index=True)
     questionnaire = Column(JSONB, nullable=False, default={})
-    
+
+    # Нормализованные значения для поиска дубликатов (см. services/normalization.py)
+    email_normalized = Column(String(255), nullable=True)
+    phone_normalized = Column(String(32), nullable=True)
+
     exhibition_id = Column(
         Integer,
         ForeignKey("exhibitions.id", ondelete="CASCADE"),
@@ -74,4 +83,17 @@ class Contact(Base):
         secondary=contact_file_association,
         back_populates="contacts",
         cascade="all, delete"
-    )
\ No newline at end of file
+    )
+
+class ContactTombstone(Base):
+    """Отметка об удалённом контакте для дельта-синхронизации устройств"""
+    __tablename__ = "contact_tombstones"
+    __table_args__ = (
+        Index("ix_contact_tombstones_deleted_at_id", "deleted_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, nullable=False, index=True)
+    exhibition_id = Column(Integer, nullable=True, index=True)
+    author_id = Column(Integer, nullable=True, index=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -58,11 +58,15 @@ async def create_tables():
     # Импортируем все модели, чтобы они были зарегистрированы в Base.metadata
     from .file import File
     from .exhibition import Exhibition
-    from .contact import Contact, contact_file_association
+    from .contact import Contact, ContactTombstone, contact_file_association
+    from .idempotency import IdempotencyKey
+    from .blob import Blob
+    from .migrations import run_migrations
 
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await run_migrations(conn)
             print("✅ Таблицы успешно созданы")
     except Exception as e:
         print(f"❌ Ошибка при создании таблиц: {e}")
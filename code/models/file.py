@@ -1,5 +1,6 @@
 # models/file.py
 from sqlalchemy import Column, String, Text, DateTime, Integer
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -11,8 +12,11 @@ class File(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False, index=True)
     format = Column(String(50), nullable=False)
-    path = Column(Text, nullable=False)
-    url = Column(Text, nullable=False)
+    path = Column(Text, nullable=False, index=True)
+    url = Column(Text, nullable=False, index=True)
+    sha256 = Column(String(64), nullable=True, index=True)  # блоб содержимого, NULL у старых файлов
+    mime_type = Column(String(127), nullable=True)  # по содержимому (libmagic) при загрузке
+    derivatives = Column(JSONB, nullable=True)  # превью изображения: {размер: {url, format, width, height}}
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -0,0 +1,25 @@
+# models/idempotency.py
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from .base import Base
+
+class IdempotencyKey(Base):
+    """Сохранённый ответ на запрос с заголовком Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("key", "scope", name="uq_idempotency_keys_key_scope"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String(255), nullable=False)
+    scope = Column(String(255), nullable=False)  # метод, путь запроса и пользователь
+    request_hash = Column(String(64), nullable=True)  # SHA-256 тела запроса
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey(key='{self.key}', scope='{self.scope}')>"
@@ -0,0 +1,174 @@
+# models/migrations.py
+"""
+Идемпотентные миграции схемы, выполняются при старте после create_all.
+create_all не добавляет колонки и индексы в уже существующие таблицы,
+поэтому такие изменения описываются здесь через IF NOT EXISTS.
+"""
+from sqlalchemy import text, select, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from services.normalization import normalize_email, normalize_phone
+
+BACKFILL_BATCH_SIZE = 1000
+
+SCHEMA_STATEMENTS = [
+    # Разовые миграции данных, которые уже выполнены
+    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+    "name VARCHAR(255) PRIMARY KEY, applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())",
+    # Нормализованные email/телефон контакта
+    "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS email_normalized VARCHAR(255)",
+    "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS phone_normalized VARCHAR(32)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_exhibition_email_normalized "
+    "ON contacts (exhibition_id, email_normalized)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_exhibition_phone_normalized "
+    "ON contacts (exhibition_id, phone_normalized)",
+    # Дельта-синхронизация по (updated_at, id)
+    "CREATE INDEX IF NOT EXISTS ix_contacts_updated_at_id ON contacts (updated_at, id)",
+    # Хэш тела запроса для ключа идемпотентности (повтор ключа с другим телом — 422)
+    "ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS request_hash VARCHAR(64)",
+    # Версия подписанных токенов сессии (отзыв токенов)
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0",
+    # Дедупликация содержимого: файл ссылается на блоб по SHA-256
+    "ALTER TABLE files ADD COLUMN IF NOT EXISTS sha256 VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_files_sha256 ON files (sha256)",
+    # Превью изображений
+    "ALTER TABLE files ADD COLUMN IF NOT EXISTS derivatives JSONB",
+    # MIME-тип, определённый по содержимому при потоковой загрузке
+    "ALTER TABLE files ADD COLUMN IF NOT EXISTS mime_type VARCHAR(127)",
+    # Позиции шагов сборщика мусора файлов между запусками
+    "CREATE TABLE IF NOT EXISTS orphan_gc_cursors ("
+    "name VARCHAR(32) PRIMARY KEY, value TEXT NOT NULL, "
+    "updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())",
+    # Проверка доступа при отдаче /uploads ищет файл по пути
+    "CREATE INDEX IF NOT EXISTS ix_files_path ON files (path)",
+    # Счётчик ссылок на блоб ведёт триггер, поэтому он верен при любом способе
+    # вставки и удаления строк files (ORM, DELETE ... RETURNING, каскады)
+    """
+    CREATE OR REPLACE FUNCTION files_blob_ref_count() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.sha256 IS NOT NULL THEN
+            UPDATE blobs SET ref_count = ref_count + 1, updated_at = now() WHERE sha256 = NEW.sha256;
+        END IF;
+        IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.sha256 IS NOT NULL THEN
+            UPDATE blobs SET ref_count = ref_count - 1, updated_at = now() WHERE sha256 = OLD.sha256;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_files_blob_ref_count ON files",
+    "CREATE TRIGGER trg_files_blob_ref_count AFTER INSERT OR DELETE ON files "
+    "FOR EACH ROW EXECUTE FUNCTION files_blob_ref_count()",
+    "DROP TRIGGER IF EXISTS trg_files_blob_ref_count_update ON files",
+    "CREATE TRIGGER trg_files_blob_ref_count_update AFTER UPDATE OF sha256 ON files "
+    "FOR EACH ROW WHEN (OLD.sha256 IS DISTINCT FROM NEW.sha256) EXECUTE FUNCTION files_blob_ref_count()",
+]
+
+
+async def backfill_contact_normalized(conn: AsyncConnection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Заполнение нормализованных полей у существующих контактов пачками"""
+    from .contact import Contact
+
+    contacts = Contact.__table__
+    stmt = (
+        update(contacts)
+        .where(contacts.c.id == bindparam("contact_id"))
+        .values(
+            email_normalized=bindparam("email_norm"),
+            phone_normalized=bindparam("phone_norm"),
+            # Бэкфилл не должен выглядеть как изменение контакта
+            updated_at=contacts.c.updated_at,
+        )
+    )
+
+    total = 0
+    last_id = 0
+    while True:
+        result = await conn.execute(
+            select(contacts.c.id, contacts.c.email, contacts.c.phone_number)
+            .where(
+                contacts.c.id > last_id,
+                contacts.c.email_normalized.is_(None),
+                contacts.c.phone_normalized.is_(None),
+            )
+            .order_by(contacts.c.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        await conn.execute(stmt, [
+            {
+                "contact_id": row.id,
+                "email_norm": normalize_email(row.email),
+                "phone_norm": normalize_phone(row.phone_number),
+            }
+            for row in rows
+        ])
+        total += len(rows)
+        last_id = rows[-1].id
+
+    return total
+
+
+async def normalize_file_urls(conn: AsyncConnection) -> int:
+    """
+    URL файлов и превью в виде /uploads/<путь внутри uploads> (как строит upload_url):
+    блобы и превью какое-то время записывались без префикса /uploads, а такие
+    URL фронтенд превращает в /api/blobs/..., которого нет
+    """
+    files = await conn.execute(text(
+        "UPDATE files SET url = '/' || path WHERE path LIKE 'uploads/%' AND url <> '/' || path"
+    ))
+    derivatives = await conn.execute(text("""
+        UPDATE files SET derivatives = (
+            SELECT jsonb_object_agg(
+                size,
+                CASE WHEN derivative->>'url' LIKE '/uploads/%' THEN derivative
+                     ELSE jsonb_set(derivative, '{url}', to_jsonb('/uploads' || (derivative->>'url')))
+                END
+            )
+            FROM jsonb_each(derivatives) AS d(size, derivative)
+        )
+        WHERE derivatives IS NOT NULL AND EXISTS (
+            SELECT 1 FROM jsonb_each(derivatives) AS d(size, derivative)
+            WHERE derivative->>'url' NOT LIKE '/uploads/%'
+        )
+    """))
+    return files.rowcount + derivatives.rowcount
+
+
+# Разовые миграции данных: выполняются один раз и отмечаются в schema_migrations.
+# Новые контакты получают нормализованные поля при вставке, поэтому повторять бэкфилл не нужно
+DATA_MIGRATIONS = [
+    ("contacts_normalized_backfill", backfill_contact_normalized),
+    ("files_upload_url_prefix", normalize_file_urls),
+]
+
+
+async def run_data_migration(conn: AsyncConnection, name: str, migration) -> bool:
+    """
+    Миграция данных выполняется, только если она ещё не отмечена.
+    Отметка вставляется первой: второй воркер, стартующий одновременно, ждёт
+    на первичном ключе до коммита этой транзакции и затем пропускает миграцию
+    """
+    result = await conn.execute(
+        text("INSERT INTO schema_migrations (name) VALUES (:name) ON CONFLICT DO NOTHING RETURNING name"),
+        {"name": name}
+    )
+    if result.first() is None:
+        return False
+
+    processed = await migration(conn)
+    print(f"✅ Миграция данных {name}: обработано строк {processed}")
+    return True
+
+
+async def run_migrations(conn: AsyncConnection):
+    """Применение всех миграций"""
+    for statement in SCHEMA_STATEMENTS:
+        await conn.execute(text(statement))
+
+    for name, migration in DATA_MIGRATIONS:
+        await run_data_migration(conn, name, migration)
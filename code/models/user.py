@@ -12,6 +12,7 @@ class User(Base):
     position = Column(String(255), nullable=True, index=True)
     department = Column(String(255), nullable=True, index=True)
     is_admin = Column(Boolean, default=False, nullable=False)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)  # увеличивается для отзыва токенов
     last_login = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
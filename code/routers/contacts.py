@@ -1,13 +1,17 @@
 # routers/contacts.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, BackgroundTasks, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_, text, desc, asc
-from typing import List, Optional, Dict, Any
+from sqlalchemy import select, insert, func, or_, and_, text, desc, asc, update, delete, case, exists, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, date, timedelta
 import json
 import re
 from pathlib import Path
 import shutil
+import uuid
+import asyncio
 
 from models.database import get_db
 from models.contact import Contact, ContactFileType, contact_file_association
@@ -20,21 +24,56 @@ from schemas.contact import (
     Contact as ContactSchema,
     ContactList,
     ContactWithExhibition,
+    ContactWithFiles,
     ContactFilter,
     ContactSearch,
     ContactImport,
     ContactBatchCreate,
+    ContactBatchReport,
+    ContactImportReport,
     ContactExport,
     ContactStats,
     ContactDuplicateCheck,
     ContactDuplicateResponse,
-    ContactAdminUpdate
+    ContactAdminUpdate,
+    ContactBulkSelection,
+    ContactBulkUpdate,
+    ContactBulkResult,
+    ContactBulkDeleteResult,
+    ContactFileInfo,
+    ContactDetail,
+    ContactSyncResponse,
+    ContactSyncUpload,
+    ContactSyncUploadReport
 )
 from schemas.base import PaginationParams, PaginatedResponse
-
-from services.auth import get_optional_user, require_admin, require_auth
-from models.user import User
-#from services.active_exhibition import get_current_exhibition
+from pydantic import ValidationError
+
+from services.auth import get_optional_user, get_current_user_id, require_admin, require_auth
+from services.active_exhibition import get_current_exhibition, active_exhibition
+from services.normalization import normalized_contact_fields
+from services.contact_ingest import ingest_contacts, created_contact_ids, summarize_report
+from services.contact_import import import_contacts
+from services.file_cleanup import file_cleanup
+from services.orphan_gc import delete_unreferenced_files
+from services.blob_storage import StagedUpload, stage_upload, store_blobs, discard_staged, file_values
+from services.thumbnails import thumbnails
+from services.idempotency import (
+    idempotency_scope,
+    request_hash,
+    multipart_request_hash,
+    get_idempotent_response,
+    store_idempotent_response
+)
+from services.contact_sync import fetch_changes, tombstones_from_select, InvalidWatermark, SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT
+from services.contact_events import (
+    contact_events,
+    publish_contacts,
+    publish_deleted,
+    EVENT_CREATED,
+    EVENT_UPDATED,
+    EVENT_VALIDATED
+)
 
 
 
@@ -46,15 +85,14 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 ALLOWED_FILE_EXTENSIONS = {
     ".jpg", ".jpeg", ".png", ".pdf", ".doc", ".docx", ".txt"
 }
+IMPORT_FILE_FORMATS = {".csv": "csv", ".xlsx": "xlsx"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_TOTAL_FILES_PER_CONTACT = 3  # Максимум 2 визитки + 1 документ
+STREAM_HEARTBEAT_INTERVAL = 15  # секунд, держит соединение открытым через прокси
+STREAM_RETRY_MS = 3000
 
-async def save_uploaded_file(
-        file: UploadFile,
-        contact_id: int,
-        file_type: str = "business_card"
-) -> FileModel:
-    """Сохранение загруженного файла"""
+def check_uploaded_file(file: UploadFile) -> str:
+    """Проверка размера и расширения загруженного файла, возвращает расширение"""
     # Проверяем размер файла
     file.file.seek(0, 2)
     file_size = file.file.tell()
@@ -74,93 +112,249 @@ async def save_uploaded_file(
             detail=f"Недопустимый формат файла. Разрешены: {', '.join(ALLOWED_FILE_EXTENSIONS)}"
         )
 
-    # Генерируем уникальное имя
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_filename = f"contact_{contact_id}_{file_type}_{timestamp}{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-
-    # Сохраняем файл
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-
-    # Создаем запись в БД
-    db_file = FileModel(
-        name=file.filename,
-        format=file_extension.lstrip('.'),
-        path=str(file_path),
-        url=f"/uploads/contacts/{unique_filename}"
-    )
+    return file_extension
 
-    return db_file
+async def stage_contact_uploads(
+        uploads: List[Tuple[UploadFile, ContactFileType]],
+        extensions: Optional[List[str]] = None
+) -> List[StagedUpload]:
+    """
+    Проверка и потоковое сохранение файлов контакта во временные файлы.
+    extensions передаются, если файлы уже проверены check_uploaded_file.
+    Если не удалось сохранить хотя бы один файл, остальные удаляются
+    """
+    if extensions is None:
+        extensions = [check_uploaded_file(upload_file) for upload_file, _ in uploads]
+    results = await asyncio.gather(*[
+        stage_upload(upload_file, extension, MAX_FILE_SIZE)
+        for (upload_file, _), extension in zip(uploads, extensions)
+    ], return_exceptions=True)
+
+    staged = [result for result in results if isinstance(result, StagedUpload)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await discard_staged(staged)
+        raise errors[0]
+    return staged
+
+def contact_selection_conditions(selection: ContactBulkSelection) -> list:
+    """Условия WHERE для массовых операций по списку id или фильтру"""
+    conditions = []
+    if selection.ids:
+        conditions.append(
+            Contact.id == any_(bindparam("contact_ids", list(set(selection.ids)), type_=ARRAY(Integer)))
+        )
 
-async def check_contact_duplicate(
-        contact_data: Dict[str, Any],
-        db: AsyncSession,
-        exclude_contact_id: Optional[int] = None
-) -> List[str]:
-    """Упрощенная проверка на дубликаты контакта"""
-    duplicate_fields = []
+    contact_filter = selection.filter
+    if contact_filter is not None:
+        if contact_filter.exhibition_id is not None:
+            conditions.append(Contact.exhibition_id == contact_filter.exhibition_id)
+        if contact_filter.author_id is not None:
+            conditions.append(Contact.author_id == contact_filter.author_id)
+        if contact_filter.is_validated is not None:
+            conditions.append(Contact.is_validated == contact_filter.is_validated)
+        if contact_filter.created_from is not None:
+            conditions.append(Contact.created_at >= contact_filter.created_from)
+        if contact_filter.created_to is not None:
+            conditions.append(Contact.created_at <= contact_filter.created_to)
 
-    query = select(Contact)
+    if not conditions:
+        # Пустой фильтр затронул бы все контакты
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Фильтр не содержит условий"
+        )
 
-    # Создаем список условий
-    conditions = []
+    return conditions
 
-    # Проверяем по email
-    if contact_data.get('email'):
-        email = contact_data['email'].lower()
-        email_condition = Contact.email == email
-        conditions.append(email_condition)
+async def delete_contacts_where(
+        db: AsyncSession,
+        conditions: list
+) -> Tuple[List[Any], int, List[str]]:
+    """
+    Удаление контактов и их файлов набором запросов без загрузки объектов.
+    Возвращает удалённые строки (id, exhibition_id), количество удалённых записей файлов
+    и пути старых (не блобовых) файлов для фоновой очистки диска.
+    Блобы без ссылок удаляет сборщик мусора
+    """
+    # Файлы выбранных контактов (связи удалятся каскадно вместе с контактами)
+    file_ids_result = await db.execute(
+        select(contact_file_association.c.file_id)
+        .join(Contact, Contact.id == contact_file_association.c.contact_id)
+        .where(*conditions)
+        .distinct()
+    )
+    file_ids = file_ids_result.scalars().all()
 
-    # Проверяем по телефону (простое сравнение, без очистки)
-    if contact_data.get('phone_number'):
-        phone_condition = Contact.phone_number == contact_data['phone_number']
-        conditions.append(phone_condition)
+    # Отметки об удалении для дельта-синхронизации устройств
+    await db.execute(tombstones_from_select(conditions))
 
-    if not conditions:
-        return duplicate_fields
+    deleted_result = await db.execute(
+        delete(Contact)
+        .where(*conditions)
+        .returning(Contact.id, Contact.exhibition_id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_rows = deleted_result.all()
 
-    # Добавляем условие исключения текущего контакта
-    if exclude_contact_id:
-        query = query.where(Contact.id != exclude_contact_id)
+    # Удаляем только файлы, которые больше ни к чему не привязаны
+    files_deleted, paths = await delete_unreferenced_files(db, file_ids)
 
-    # Добавляем фильтр по выставке
-    if contact_data.get('exhibition_id'):
-        query = query.where(Contact.exhibition_id == contact_data['exhibition_id'])
+    return deleted_rows, files_deleted, paths
 
-    # Объединяем условия через OR
-    query = query.where(or_(*conditions))
+async def load_contacts_files(
+        db: AsyncSession,
+        contact_ids: List[int]
+) -> Dict[int, List[ContactFileInfo]]:
+    """Файлы нескольких контактов одним запросом через ассоциативную таблицу"""
+    files: Dict[int, List[ContactFileInfo]] = {contact_id: [] for contact_id in contact_ids}
+    if not contact_ids:
+        return files
 
-    result = await db.execute(query)
-    existing_contact = result.scalar_one_or_none()
+    result = await db.execute(
+        select(
+            contact_file_association.c.contact_id,
+            FileModel.id,
+            FileModel.name,
+            FileModel.url,
+            FileModel.format,
+            FileModel.created_at,
+            FileModel.derivatives,
+            contact_file_association.c.file_type
+        )
+        .join(contact_file_association, contact_file_association.c.file_id == FileModel.id)
+        .where(contact_file_association.c.contact_id == any_(
+            bindparam("files_contact_ids", list(contact_ids), type_=ARRAY(Integer))
+        ))
+        .order_by(contact_file_association.c.id)
+    )
+    for row in result.all():
+        files[row.contact_id].append(ContactFileInfo(
+            file_id=row.id,
+            name=row.name,
+            type=row.file_type.value if row.file_type is not None else ContactFileType.OTHER.value,
+            url=row.url,
+            format=row.format,
+            created_at=row.created_at,
+            derivatives=row.derivatives
+        ))
+    return files
+
+async def load_contact_files(
+        db: AsyncSession,
+        contact_id: int
+) -> List[ContactFileInfo]:
+    """Файлы контакта одним запросом через ассоциативную таблицу"""
+    return (await load_contacts_files(db, [contact_id]))[contact_id]
+
+async def touch_contact(db: AsyncSession, contact_id: int):
+    """Обновление updated_at, чтобы изменение файлов попало в дельта-синхронизацию"""
+    await db.execute(
+        update(Contact)
+        .where(Contact.id == contact_id)
+        .values(updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
 
-    if existing_contact:
-        if contact_data.get('email') and existing_contact.email == contact_data['email'].lower():
-            duplicate_fields.append('email')
+def format_sse(event: Dict[str, Any]) -> str:
+    """Событие в формате text/event-stream"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
 
-        if contact_data.get('phone_number') and existing_contact.phone_number == contact_data['phone_number']:
-            duplicate_fields.append('phone_number')
+async def insert_contact(
+        db: AsyncSession,
+        contact_data: ContactCreate,
+        current_user_id: Optional[int]
+) -> Dict[str, Any]:
+    """
+    Один INSERT ... RETURNING: активная выставка берётся из кэша,
+    автор подставляется подзапросом. Коммит выполняет вызывающий код
+    """
+    contact_dict = contact_data.dict(exclude_none=True)
 
-    return duplicate_fields
+    # Приводим email к нижнему регистру
+    if 'email' in contact_dict and contact_dict['email']:
+        contact_dict['email'] = contact_dict['email'].lower()
+    contact_dict.update(normalized_contact_fields(contact_dict))
+
+    values = dict(contact_dict)
+    values['exhibition_id'] = await active_exhibition.get(db)
+    # Автор — только существующий пользователь, иначе NULL
+    values['author_id'] = (
+        select(User.id).where(User.id == current_user_id).scalar_subquery()
+        if current_user_id else None
+    )
 
-async def get_current_exhibition(
-        db: AsyncSession = Depends(get_db)
-) -> Optional[int]:
+    result = await db.execute(
+        insert(Contact)
+        .values(**values)
+        .returning(Contact.id, Contact.exhibition_id, Contact.author_id, Contact.created_at, Contact.updated_at)
+    )
+    contact_dict.update(result.one()._mapping)
+    return contact_dict
+
+async def attach_contact_files(
+        db: AsyncSession,
+        contact_id: int,
+        staged: List[StagedUpload],
+        file_types: List[ContactFileType]
+) -> Tuple[List[ContactFileInfo], List[Dict[str, Any]]]:
     """
-    Dependency для получения текущего пользователя из куки
+    Сохранение блобов (на диск пишутся только новые) и вставка записей файлов
+    и связей с контактом двумя многострочными INSERT.
+    Возвращает файлы для ответа и {id, path, sha256} для генерации превью после коммита
     """
+    if not staged:
+        return [], []
+
+    blob_paths = await store_blobs(db, staged)
+    file_rows = [file_values(item, blob_paths[item.sha256]) for item in staged]
 
-    # Строим базовый запрос
     result = await db.execute(
-            select(Exhibition).where(Exhibition.is_active == True)
-        )
-    exhibition_active = result.scalar_one_or_none()
+        insert(FileModel).returning(FileModel.id, FileModel.created_at, sort_by_parameter_order=True),
+        file_rows
+    )
+    inserted = result.all()
+
+    await db.execute(
+        contact_file_association.insert(),
+        [
+            {"contact_id": contact_id, "file_id": row.id, "file_type": file_type.value}
+            for row, file_type in zip(inserted, file_types)
+        ]
+    )
 
-    if exhibition_active is None:
-        return None
+    files = [
+        ContactFileInfo(
+            file_id=row.id,
+            name=file_row["name"],
+            type=file_type.value,
+            url=file_row["url"],
+            format=file_row["format"],
+            created_at=row.created_at
+        )
+        for row, file_row, file_type in zip(inserted, file_rows, file_types)
+    ]
+    stored = [
+        {"id": row.id, "path": file_row["path"], "sha256": file_row["sha256"]}
+        for row, file_row in zip(inserted, file_rows)
+    ]
+    return files, stored
 
-    return exhibition_active.id
+async def replay_idempotent_response(
+        db: AsyncSession,
+        idempotency_key: str,
+        scope: str,
+        body_hash: Optional[str]
+):
+    """Ответ параллельного запроса с тем же Idempotency-Key после отката своей транзакции"""
+    await db.rollback()
+    replay = await get_idempotent_response(db, idempotency_key, scope, body_hash)
+    if replay is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Запрос с таким Idempotency-Key уже выполняется"
+        )
+    return replay
 
 @router.get("/questionnaire")
 def get_questionnaire():
@@ -172,140 +366,334 @@ def get_questionnaire():
 
 @router.post("/", response_model=ContactWithExhibition, status_code=status.HTTP_201_CREATED)
 async def create_contact(
+        request: Request,
         contact_data: ContactCreate,
-        background_tasks: BackgroundTasks,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+        current_user_id: Optional[int] = Depends(get_current_user_id),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Создание нового контакта одним INSERT ... RETURNING.
+    Повтор запроса с тем же Idempotency-Key и тем же телом возвращает исходный ответ
+    """
+    scope = idempotency_scope(request, current_user_id)
+    body_hash = request_hash(contact_data.model_dump(mode="json")) if idempotency_key else None
+    replay = await get_idempotent_response(db, idempotency_key, scope, body_hash)
+    if replay is not None:
+        return replay
+
+    contact_dict = await insert_contact(db, contact_data, current_user_id)
+    response_data = ContactWithExhibition.model_validate(contact_dict).model_dump(mode="json")
+
+    if not await store_idempotent_response(
+            db, idempotency_key, scope, status.HTTP_201_CREATED, response_data, body_hash
+    ):
+        return await replay_idempotent_response(db, idempotency_key, scope, body_hash)
+
+    await db.commit()
+    await publish_contacts(db, EVENT_CREATED, [response_data["id"]])
+
+    return response_data
+
+@router.post("/with-files", response_model=ContactWithFiles, status_code=status.HTTP_201_CREATED)
+async def create_contact_with_files(
+        request: Request,
+        contact: str = Form(..., description="Контакт в формате ContactCreate (JSON)"),
+        business_card_front: Optional[UploadFile] = File(None),
+        business_card_back: Optional[UploadFile] = File(None),
+        document: Optional[UploadFile] = File(None),
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+        current_user_id: Optional[int] = Depends(get_current_user_id),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Создание контакта вместе с визитками и документом одним multipart-запросом.
+    Файлы сохраняются на диск параллельно со вставкой контакта, контакт и файлы
+    сохраняются в одной транзакции. Повтор с тем же Idempotency-Key и тем же телом возвращает исходный ответ
+    """
+    scope = idempotency_scope(request, current_user_id)
+    body_hash = await multipart_request_hash(
+        {"contact": contact},
+        {
+            "business_card_front": business_card_front,
+            "business_card_back": business_card_back,
+            "document": document,
+        }
+    ) if idempotency_key else None
+    replay = await get_idempotent_response(db, idempotency_key, scope, body_hash)
+    if replay is not None:
+        return replay
+
+    try:
+        contact_data = ContactCreate.model_validate_json(contact)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=json.loads(e.json(include_url=False))
+        )
+
+    uploads = [
+        (upload_file, file_type)
+        for upload_file, file_type in (
+            (business_card_front, ContactFileType.BUSINESS_CARD_FRONT),
+            (business_card_back, ContactFileType.BUSINESS_CARD_BACK),
+            (document, ContactFileType.DOCUMENT),
+        )
+        if upload_file
+    ]
+
+    # Все файлы проверяются до вставки контакта
+    extensions = [check_uploaded_file(upload_file) for upload_file, _ in uploads]
+
+    file_types = [file_type for _, file_type in uploads]
+    stage_task = asyncio.create_task(stage_contact_uploads(uploads, extensions))
+
+    try:
+        contact_dict = await insert_contact(db, contact_data, current_user_id)
+        staged = await stage_task
+        contact_dict["files"], stored_files = await attach_contact_files(db, contact_dict["id"], staged, file_types)
+        response_data = ContactWithFiles.model_validate(contact_dict).model_dump(mode="json")
+
+        stored = await store_idempotent_response(
+            db, idempotency_key, scope, status.HTTP_201_CREATED, response_data, body_hash
+        )
+        if stored:
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        # Запись в потоке не прервать: дожидаемся её и удаляем временные файлы
+        staged_result = (await asyncio.gather(stage_task, return_exceptions=True))[0]
+        if isinstance(staged_result, list):
+            await discard_staged(staged_result)
+        raise
+
+    if not stored:
+        # Параллельный запрос с тем же ключом уже создал контакт;
+        # блобы без ссылок убирает сборщик мусора
+        return await replay_idempotent_response(db, idempotency_key, scope, body_hash)
+
+    thumbnails.enqueue(stored_files)
+    await publish_contacts(db, EVENT_CREATED, [response_data["id"]])
+
+    return response_data
+
+@router.post("/batch", response_model=ContactBatchReport)
+async def create_contacts_batch(
+        batch_data: ContactBatchCreate,
         current_user: Optional[User] = Depends(get_optional_user),
         db: AsyncSession = Depends(get_db),
         current_exhibition = Depends(get_current_exhibition)
 ):
-    """Создание нового контакта"""
-
-    # Подготавливаем данные
-    contact_dict = contact_data.dict(exclude_none=True)
-    if "exhibition_id" in contact_dict and contact_dict["exhibition_id"] is not None:
-        # Проверяем существование выставки
-        exhibition_result = await db.execute(
-            select(Exhibition).where(Exhibition.id == contact_dict["exhibition_id"])
-        )
-        exhibition = exhibition_result.scalar_one_or_none()
+    """
+    Массовое создание контактов.
+    Дубликаты ищутся одним запросом на всю пачку, вставка — многострочным INSERT ... RETURNING.
+    Возвращает отчёт по каждой строке: created / duplicate / error
+    """
+    items = await ingest_contacts(
+        db,
+        batch_data.contacts,
+        default_exhibition_id=current_exhibition,
+        author_id=current_user.id if current_user else None
+    )
+    await db.commit()
+    await publish_contacts(db, EVENT_CREATED, created_contact_ids(items))
 
-        if not exhibition:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Выставка не найдена"
-            )
-        contact_dict["exhibition_id"]  = exhibition.id
-    else:
-        contact_dict["exhibition_id"] = current_exhibition #await get_current_exhibition(db)
+    return ContactBatchReport(**summarize_report(items), items=items)
 
+@router.post("/import", response_model=ContactImportReport)
+async def import_contacts_file(
+        file: UploadFile = File(..., description="CSV или XLSX с контактами"),
+        exhibition_id: Optional[int] = Query(None, description="Выставка для строк без exhibition_id"),
+        current_user: User = Depends(require_auth),
+        db: AsyncSession = Depends(get_db),
+        current_exhibition = Depends(get_current_exhibition)
+):
     """
-    ЕСЛИ ЭТО НЕ РАБОТАЕТ, ТО Я ТЕБЯ ПОЗДРАВЛЯЮ
-    СЕЙЧАС НЕТ АКТИВНЫХ ВЫСТАВОК
-    А СКОРЕЕ ВС ЕГО,
-    НЕТ НИКАКИХ ВЫСТАВОК ВООБЩЕ!!!!!
-    КУДА ТЫ СОБРАЛСЯ ДОБАВИТЬ ЭТОТ КОНТАКТ?
+    Импорт контактов из CSV/XLSX (выгрузки партнёров, сканеры визиток).
+    Файл читается потоково и записывается пачками, строки валидируются по ContactImport.
+    Возвращает количество созданных, дубликатов, ошибок и ошибки по строкам.
+    Если сбой случился после записи первых пачек, возвращается частичный отчёт
+    (completed=false): записанные строки — processed_rows, место остановки — failed_rows
     """
-    
+    file_format = IMPORT_FILE_FORMATS.get(Path(file.filename or "").suffix.lower())
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый формат файла. Разрешены: {', '.join(IMPORT_FILE_FORMATS)}"
+        )
 
-    # Приводим email к нижнему регистру
-    if 'email' in contact_dict and contact_dict['email']:
-        contact_dict['email'] = contact_dict['email'].lower()
+    try:
+        report = await import_contacts(
+            db,
+            file.file,
+            file_format,
+            default_exhibition_id=exhibition_id or current_exhibition,
+            author_id=current_user.id
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка при чтении файла {file.filename}: {str(e)}"
+        )
 
-    # Добавляем автора, если пользователь авторизован
-    if current_user:
-        contact_dict['author_id'] = current_user.id
-        print('author_id', current_user.id)
+    return report
 
-    # Создаем контакт
-    db_contact = Contact(**contact_dict)
-    db.add(db_contact)
-    await db.flush()
+@router.patch("/bulk", response_model=ContactBulkResult)
+async def bulk_update_contacts(
+        bulk_data: ContactBulkUpdate,
+        current_user: User = Depends(require_admin),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Массовая валидация и административное обновление контактов
+    одним UPDATE ... WHERE id = ANY(...). Возвращает количество изменённых контактов
+    """
+    values = {
+        field: value
+        for field, value in bulk_data.changes.dict(exclude_unset=True).items()
+        if value is not None
+    }
+    if not values:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны поля для обновления"
+        )
 
-    await db.commit()
-    await db.refresh(db_contact)
+    if values.get('email'):
+        values['email'] = values['email'].lower()
+    values.update(normalized_contact_fields(values))
+
+    # Как и при одиночном обновлении, автор валидации меняется только при смене статуса
+    if 'is_validated' in values:
+        status_changed = Contact.is_validated != values['is_validated']
+        values['validated_by_id'] = case((status_changed, current_user.id), else_=Contact.validated_by_id)
+        values['validated_at'] = case((status_changed, func.now()), else_=Contact.validated_at)
 
-    # Получаем полные данные для ответа
     result = await db.execute(
-        select(Contact).where(Contact.id == db_contact.id)
+        update(Contact)
+        .where(*contact_selection_conditions(bulk_data))
+        .values(**values)
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
     )
+    updated_ids = list(result.scalars().all())
+    await db.commit()
+    await publish_contacts(db, EVENT_VALIDATED if 'is_validated' in values else EVENT_UPDATED, updated_ids)
 
-    contact = result.scalar_one()
-    contact_dict["id"] = contact.id
-    contact_dict["created_at"] = contact.created_at
-    contact_dict["updated_at"] = contact.updated_at
-    return contact_dict
+    return ContactBulkResult(affected=len(updated_ids))
 
-    # # Возвращаем данные вручную вместо from_orm()
-    # return {
-    #     "id": contact.id,
-    #     "title": contact.title,
-    #     "description": contact.description,
-    #     "full_name": contact.full_name,
-    #     "position": contact.position,
-    #     "email": contact.email,
-    #     "phone_number": contact.phone_number,
-    #     "questionnaire": contact.questionnaire,
-    #     "exhibition_id": contact.exhibition_id,
-    #     "created_at": contact.created_at,
-    #     "updated_at": contact.updated_at,
-    #     "exhibition_id" : contact_dict["exhibition_id"]
-    #     # "exhibition": {
-    #     #     # "id": exhibition.id,
-    #     #     # "title": exhibition.title,
-    #     #     # "start_date": exhibition.start_date,
-    #     #     # "end_date": exhibition.end_date,
-    #     #     # "preview_file_id": exhibition.preview_file_id,
-    #     # }
-    # }
-
-@router.post("/batch", response_model=List[ContactWithExhibition], status_code=status.HTTP_201_CREATED)
-async def create_contacts_batch(
-        batch_data: ContactBatchCreate,
-        background_tasks: BackgroundTasks,
+@router.post("/bulk/delete", response_model=ContactBulkDeleteResult)
+async def bulk_delete_contacts(
+        selection: ContactBulkSelection,
+        _: User = Depends(require_admin),
         db: AsyncSession = Depends(get_db)
 ):
-    """Массовое создание контактов"""
-    # Проверяем существование выставки
-    exhibition_result = await db.execute(
-        select(Exhibition).where(Exhibition.id == batch_data.exhibition_id)
+    """
+    Массовое удаление контактов по списку id или фильтру.
+    Файлы удаляются с диска в фоне, прогресс и освобождённый объём — GET /files/cleanup/{job_id}
+    """
+    deleted_rows, files_deleted, paths = await delete_contacts_where(db, contact_selection_conditions(selection))
+    await db.commit()
+    await publish_deleted(deleted_rows)
+
+    return ContactBulkDeleteResult(
+        affected=len(deleted_rows),
+        files_deleted=files_deleted,
+        cleanup_job_id=file_cleanup.enqueue(paths)
     )
-    exhibition = exhibition_result.scalar_one_or_none()
 
-    if not exhibition:
+@router.get("/sync", response_model=ContactSyncResponse)
+async def sync_contacts(
+        since: Optional[str] = Query(None, description="Водяной знак из предыдущей синхронизации"),
+        limit: int = Query(SYNC_DEFAULT_LIMIT, ge=1, le=SYNC_MAX_LIMIT),
+        exhibition_id: Optional[int] = Query(None, description="Фильтр по выставке"),
+        current_user: User = Depends(require_auth),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Дельта-синхронизация для устройств на стенде: контакты (с файлами) и удаления
+    после водяного знака since. Пока has_more=true, запрос повторяется с новым watermark
+    """
+    try:
+        changes = await fetch_changes(
+            db,
+            since,
+            limit=limit,
+            exhibition_id=exhibition_id,
+            author_id=None if current_user.is_admin else current_user.id
+        )
+    except InvalidWatermark:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Выставка не найдена"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный водяной знак since"
         )
 
-    created_contacts = []
-
-    for contact_data in batch_data.contacts:
-        # Подготавливаем данные
-        contact_dict = contact_data.dict(exclude_none=True)
-        contact_dict['exhibition_id'] = batch_data.exhibition_id
-
-        # Проверяем на дубликаты
-        duplicate_fields = await check_contact_duplicate(contact_dict, db)
+    files = await load_contacts_files(db, [contact["id"] for contact in changes["contacts"]])
+    for contact in changes["contacts"]:
+        contact["files"] = files[contact["id"]]
 
-        # Если есть дубликат, пропускаем или добавляем с пометкой
-        if duplicate_fields:
-            # Можно добавить логирование или пропустить контакт
-            continue
+    return changes
 
-        # Приводим email к нижнему регистру
-        if 'email' in contact_dict and contact_dict['email']:
-            contact_dict['email'] = contact_dict['email'].lower()
+@router.post("/sync", response_model=ContactSyncUploadReport)
+async def upload_synced_contacts(
+        upload: ContactSyncUpload,
+        current_user: User = Depends(require_auth),
+        db: AsyncSession = Depends(get_db),
+        current_exhibition = Depends(get_current_exhibition)
+):
+    """
+    Загрузка контактов, собранных на устройстве без сети, одной пачкой.
+    Повторная отправка безопасна: уже загруженные строки вернутся как duplicate с ID контакта
+    """
+    items = await ingest_contacts(
+        db,
+        upload.contacts,
+        default_exhibition_id=current_exhibition,
+        author_id=current_user.id
+    )
+    await db.commit()
+    await publish_contacts(db, EVENT_CREATED, created_contact_ids(items))
 
-        # Создаем контакт
-        db_contact = Contact(**contact_dict)
-        db.add(db_contact)
+    for item, row in zip(items, upload.contacts):
+        client_id = row.get("client_id")
+        item["client_id"] = str(client_id) if client_id is not None else None
 
-    await db.commit()
+    return ContactSyncUploadReport(**summarize_report(items), items=items)
 
-    # Получаем созданные контакты
-    # TODO: Улучшить получение созданных контактов
+@router.get("/stream")
+async def stream_contacts(
+        request: Request,
+        exhibition_id: Optional[int] = Query(None, description="Выставка; без фильтра — события всех выставок"),
+        _: User = Depends(require_admin)
+):
+    """
+    Live-лента для админки (Server-Sent Events): события created / updated / validated / deleted
+    с ID контактов и, для небольших изменений, самими строками.
+    Клиент применяет изменения к уже загруженному списку вместо повторного GET /contacts/
+    """
+    queue = contact_events.subscribe(exhibition_id)
 
-    return created_contacts
+    async def event_stream():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            contact_events.unsubscribe(queue, exhibition_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/", dependencies=[Depends(require_auth)])
 async def get_contacts(
@@ -395,42 +783,37 @@ async def get_contacts(
         items=items
     )
 
-@router.get("/{contact_id}")#, response_model=ContactWithExhibition)
+@router.get("/{contact_id}", response_model=ContactDetail)
 async def get_contact(
         contact_id: int,
+        include: Optional[str] = Query(None, description="Дополнительные данные через запятую: files"),
         db: AsyncSession = Depends(get_db)
 ):
-    """Получение контакта по ID"""
+    """
+    Получение контакта по ID вместе с ФИО автора.
+    С include=files в ответ добавляются файлы контакта (второй запрос)
+    """
+    # Колонки выбираются явно, чтобы не трогать ленивые связи author/files
     result = await db.execute(
-        select(Contact).where(Contact.id == contact_id)
+        select(*Contact.__table__.columns, User.full_name.label("author"))
+        .outerjoin(User, User.id == Contact.author_id)
+        .where(Contact.id == contact_id)
     )
-    contact = result.scalar_one_or_none()
-
-    # return contact
+    row = result.first()
 
-    if not contact:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Контакт не найден"
         )
-    
-    contact_dict = contact.__dict__
-
-    #добавить ФИО автора
-    user_id = contact.author_id
-    if user_id is not None:
-        result = await db.execute(
-            select(User).where(User.id == user_id)
-        )
-        user = result.scalar_one_or_none()
-
-        user_name = user.full_name
 
-        contact_dict['author'] = user_name
-
-    return contact_dict
+    contact = ContactDetail.model_validate(dict(row._mapping))
 
+    includes = {item.strip() for item in include.split(",")} if include else set()
+    if "files" in includes:
+        contact.files = await load_contact_files(db, contact_id)
 
+    return contact
 
 @router.put("/{contact_id}", dependencies=[Depends(require_auth)]) #response_model=ContactWithExhibition, 
 async def update_contact(
@@ -458,33 +841,22 @@ async def update_contact(
                 detail="У вас нет прав на редактирование этого контакта"
             )
 
-    # Проверяем на дубликаты (исключая текущий контакт)
-    # update_dict = contact_data.dict(exclude_unset=True)
-    # if update_dict:
-    #     # Добавляем ID выставки для проверки в рамках той же выставки
-    #     update_dict['exhibition_id'] = contact.exhibition_id
-    #     duplicate_fields = await check_contact_duplicate(
-    #         update_dict,
-    #         db,
-    #         exclude_contact_id=contact_id
-    #     )
-
-    #     if duplicate_fields:
-    #         raise HTTPException(
-    #             status_code=status.HTTP_400_BAD_REQUEST,
-    #             detail=f"Найден дубликат контакта по полям: {', '.join(duplicate_fields)}"
-    #         )
-
     # Обновляем поля
-    for field, value in contact_data.dict(exclude_unset=True).items():
-        if value is not None:
-            # Приводим email к нижнему регистру
-            if field == 'email' and value:
-                value = value.lower()
-            setattr(contact, field, value)
+    update_data = {
+        field: value
+        for field, value in contact_data.dict(exclude_unset=True).items()
+        if value is not None
+    }
+    update_data.update(normalized_contact_fields(update_data))
+    for field, value in update_data.items():
+        # Приводим email к нижнему регистру
+        if field == 'email' and value:
+            value = value.lower()
+        setattr(contact, field, value)
 
     await db.commit()
     await db.refresh(contact)
+    await publish_contacts(db, EVENT_UPDATED, [contact_id])
 
     return contact
 
@@ -518,12 +890,14 @@ async def admin_update_contact(
         del update_data['is_validated']
 
     # Обновляем остальные поля
+    update_data = {field: value for field, value in update_data.items() if value is not None}
+    update_data.update(normalized_contact_fields(update_data))
     for field, value in update_data.items():
-        if value is not None:
-            setattr(contact, field, value)
+        setattr(contact, field, value)
 
     await db.commit()
     await db.refresh(contact)
+    await publish_contacts(db, EVENT_UPDATED, [contact_id])
 
     return contact
 
@@ -556,6 +930,7 @@ async def validate_contact(
 
     await db.commit()
     await db.refresh(contact)
+    await publish_contacts(db, EVENT_VALIDATED, [contact_id])
 
     return contact
 
@@ -565,50 +940,51 @@ async def delete_contact(
         db: AsyncSession = Depends(get_db)
 ):
     """Удаление контакта"""
-    result = await db.execute(
-        select(Contact).where(Contact.id == contact_id)
-    )
-    contact = result.scalar_one_or_none()
+    deleted_rows, _, paths = await delete_contacts_where(db, [Contact.id == contact_id])
 
-    if not contact:
+    if not deleted_rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Контакт не найден"
         )
 
-    # TODO: Удалить связанные файлы с диска
-    # Получаем файлы контакта
-    files_result = await db.execute(
-        select(contact_file_association).where(
-            contact_file_association.c.contact_id == contact_id
-        )
-    )
-    file_associations = files_result.scalars().all()
-
-    # Удаляем файлы с диска
-    for association_file_id in file_associations:
-        file_result = await db.execute(
-            select(FileModel).where(FileModel.id == association_file_id)
-        )
-        file = file_result.scalar_one_or_none()
-        if file and Path(file.path).exists():
-            Path(file.path).unlink()
-
-    await db.delete(contact)
     await db.commit()
+    await publish_deleted(deleted_rows)
+
+    # Файлы удаляются с диска в фоне
+    file_cleanup.enqueue(paths)
 
     return None
 
 @router.post("/{contact_id}/files")
 async def upload_contact_files(
+        request: Request,
         contact_id: int,
         background_tasks: BackgroundTasks,
         business_card_front: Optional[UploadFile] = File(None),
         business_card_back: Optional[UploadFile] = File(None),
         document: Optional[UploadFile] = File(None),
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+        current_user_id: Optional[int] = Depends(get_current_user_id),
         db: AsyncSession = Depends(get_db)
 ):
-    """Загрузка файлов для контакта (визитки и документы)"""
+    """
+    Загрузка файлов для контакта (визитки и документы).
+    Повтор запроса с тем же Idempotency-Key и теми же файлами возвращает исходный ответ без повторной загрузки
+    """
+    scope = idempotency_scope(request, current_user_id)
+    body_hash = await multipart_request_hash(
+        {},
+        {
+            "business_card_front": business_card_front,
+            "business_card_back": business_card_back,
+            "document": document,
+        }
+    ) if idempotency_key else None
+    replay = await get_idempotent_response(db, idempotency_key, scope, body_hash)
+    if replay is not None:
+        return replay
+
     # Проверяем существование контакта
     result = await db.execute(
         select(Contact).where(Contact.id == contact_id)
@@ -650,47 +1026,42 @@ async def upload_contact_files(
             detail=f"Максимальное количество файлов на контакт: {MAX_TOTAL_FILES_PER_CONTACT}"
         )
 
-    # Сохраняем файлы
-    saved_files = []
+    # Сохраняем файлы: одинаковое содержимое хранится на диске один раз
+    staged = await stage_contact_uploads(list(zip(files_to_upload, file_types)))
+    try:
+        files, stored_files = await attach_contact_files(db, contact_id, staged, file_types)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при сохранении файлов: {str(e)}"
+        )
 
-    for i, (upload_file, file_type) in enumerate(zip(files_to_upload, file_types)):
-        try:
-            # Сохраняем файл
-            db_file = await save_uploaded_file(upload_file, contact_id, file_type.value)
-            db.add(db_file)
-            await db.flush()
-
-            # Создаем связь в ассоциативной таблице
-            stmt = contact_file_association.insert().values(
-                contact_id=contact_id,
-                file_id=db_file.id,
-                file_type=file_type.value
-            )
-            await db.execute(stmt)
-
-            saved_files.append({
-                "id": db_file.id,
-                "name": db_file.name,
-                "type": file_type.value,
-                "url": db_file.url
-            })
-
-        except Exception as e:
-            # Если возникла ошибка, откатываем транзакцию для этого файла
-            await db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Ошибка при сохранении файла {upload_file.filename}: {str(e)}"
-            )
+    saved_files = [
+        {"id": file.file_id, "name": file.name, "type": file.type, "url": file.url}
+        for file in files
+    ]
 
-    await db.commit()
+    await touch_contact(db, contact_id)
 
-    return {
+    response_data = {
         "message": f"Успешно загружено {len(saved_files)} файлов",
         "files": saved_files,
         "contact_id": contact_id
     }
 
+    if not await store_idempotent_response(
+            db, idempotency_key, scope, status.HTTP_200_OK, response_data, body_hash
+    ):
+        # Параллельный запрос с тем же ключом уже сохранил файлы
+        return await replay_idempotent_response(db, idempotency_key, scope, body_hash)
+
+    await db.commit()
+    thumbnails.enqueue(stored_files)
+    await publish_contacts(db, EVENT_UPDATED, [contact_id])
+
+    return response_data
+
 @router.delete("/{contact_id}/files/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_contact_file(
         contact_id: int,
@@ -713,24 +1084,20 @@ async def delete_contact_file(
             detail="Файл не найден у данного контакта"
         )
 
-    # Получаем информацию о файле
-    file_result = await db.execute(
-        select(FileModel).where(FileModel.id == file_id)
-    )
-    file = file_result.scalar_one_or_none()
-
-    # Удаляем файл с диска
-    if file and Path(file.path).exists():
-        Path(file.path).unlink()
-
-    # Удаляем связь и файл из БД
+    # Удаляем связь, а затем и запись файла, если он больше ни к чему не привязан
     stmt = contact_file_association.delete().where(
         (contact_file_association.c.contact_id == contact_id) &
         (contact_file_association.c.file_id == file_id)
     )
     await db.execute(stmt)
+    _, paths = await delete_unreferenced_files(db, [file_id])
+    await touch_contact(db, contact_id)
 
     await db.commit()
+    await publish_contacts(db, EVENT_UPDATED, [contact_id])
+
+    # Старые файлы удаляем с диска в фоне, блобы без ссылок — сборщиком мусора
+    file_cleanup.enqueue(paths)
 
     return None
 
@@ -740,63 +1107,24 @@ async def get_contact_files(
         db: AsyncSession = Depends(get_db)
 ):
     """Получение всех файлов контакта"""
-    # Проверяем существование контакта
-    contact_result = await db.execute(
-        select(Contact).where(Contact.id == contact_id)
-    )
-    contact = contact_result.scalar_one_or_none()
+    files = await load_contact_files(db, contact_id)
 
-    if not contact:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Контакт не найден"
+    # Существование контакта проверяем, только если файлов нет
+    if not files:
+        contact_result = await db.execute(
+            select(Contact.id).where(Contact.id == contact_id)
         )
-
-    try:
-        # Простой двухшаговый подход:
-        # 1. Сначала получаем все связи (ассоциации) для контакта
-        associations_result = await db.execute(
-            select(contact_file_association).where(
-                contact_file_association.c.contact_id == contact_id
-            )
-        )
-        associations = associations_result.all()
-
-        # 2. Для каждой связи получаем файл
-        files = []
-        for assoc in associations:
-            # assoc - это RowProxy объект с доступом к колонкам через индекс или имя
-            file_id = assoc.file_id
-            file_type = assoc.file_type
-
-            # Получаем файл
-            file_result = await db.execute(
-                select(FileModel).where(FileModel.id == file_id)
+        if contact_result.scalar_one_or_none() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Контакт не найден"
             )
-            file = file_result.scalar_one_or_none()
-
-            if file:
-                files.append({
-                    "file_id": file.id,
-                    "name": file.name,
-                    "type": file_type,
-                    "url": file.url,
-                    "format": file.format,
-                    "created_at": file.created_at
-                })
-
-        return {
-            "contact_id": contact_id,
-            "total_files": len(files),
-            "files": files
-        }
 
-    except Exception as e:
-        print(f"Ошибка в get_contact_files: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при получении файлов: {str(e)}"
-        )
+    return {
+        "contact_id": contact_id,
+        "total_files": len(files),
+        "files": files
+    }
 
 @router.get("/stats/overview", response_model=ContactStats)
 async def get_contacts_stats(
@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, asc, or_, func
+from sqlalchemy import select, desc, asc, or_, func, delete
 from typing import List, Optional
 from datetime import date, datetime
 import os
@@ -11,7 +11,7 @@ from pathlib import Path
 from models.database import get_db
 from models.exhibition import Exhibition
 from models.user import User
-from models.contact import Contact
+from models.contact import Contact, contact_file_association
 from models.file import File as FileModel
 from schemas import (
     ExhibitionCreate,
@@ -24,7 +24,14 @@ from schemas import (
     ExhibitionWithContactsSimple
 )
 from schemas.base import PaginatedResponse
-from services.auth import require_admin, require_auth, get_current_user
+from services.auth import require_admin, require_auth
+from services.contact_sync import tombstones_from_select
+from services.active_exhibition import active_exhibition
+from services.blob_storage import stage_upload, store_blobs, file_values
+from services.thumbnails import thumbnails
+from services.orphan_gc import delete_unreferenced_files
+from services.file_cleanup import file_cleanup
+from services.contact_events import publish_deleted
 
 router = APIRouter(prefix="/exhibitions", tags=["Выставки"])
 
@@ -48,6 +55,9 @@ async def create_exhibition(
     await db.commit()
     await db.refresh(db_exhibition)
 
+    if db_exhibition.is_active:
+        active_exhibition.invalidate()
+
     # Возвращаем данные вручную
     return {
         "id": db_exhibition.id,
@@ -67,7 +77,7 @@ async def get_exhibitions(
         sort_by: str = Query("start_date", description="Поле для сортировки"),
         sort_desc: bool = Query(True, description="Сортировка по убыванию"),
         db: AsyncSession = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(require_auth)
 ):
     """Получение списка выставок с пагинацией и сортировкой"""
 
@@ -221,9 +231,15 @@ async def update_exhibition(
         if value is not None:
             setattr(exhibition, field, value)
 
+    # Активная выставка выбирается по is_active и дате начала
+    affects_active = exhibition.is_active or 'is_active' in update_data
+
     await db.commit()
     await db.refresh(exhibition)
 
+    if affects_active:
+        active_exhibition.invalidate()
+
     return exhibition
 
 @router.delete("/{exhibition_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_admin)])
@@ -243,12 +259,41 @@ async def delete_exhibition(
             detail="Выставка не найдена"
         )
 
-    # TODO: Проверить, есть ли связанные контакты
-    # Можно добавить каскадное удаление или предупреждение
+    # Файлы контактов выставки и её превью (связи удалятся каскадно вместе с контактами)
+    file_ids_result = await db.execute(
+        select(contact_file_association.c.file_id)
+        .join(Contact, Contact.id == contact_file_association.c.contact_id)
+        .where(Contact.exhibition_id == exhibition_id)
+        .distinct()
+    )
+    file_ids = list(file_ids_result.scalars().all()) + [exhibition.preview_file_id]
+
+    # Отметки об удалении каскадно удаляемых контактов для синхронизации устройств
+    await db.execute(tombstones_from_select([Contact.exhibition_id == exhibition_id]))
+
+    # Контакты удаляются одним запросом, без загрузки в сессию
+    deleted_result = await db.execute(
+        delete(Contact)
+        .where(Contact.exhibition_id == exhibition_id)
+        .returning(Contact.id, Contact.exhibition_id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted_rows = deleted_result.all()
+
+    was_active = exhibition.is_active
 
     await db.delete(exhibition)
+    await db.flush()
+    # Удаляем файлы, которые больше ни к чему не привязаны
+    _, paths = await delete_unreferenced_files(db, file_ids)
     await db.commit()
 
+    if was_active:
+        active_exhibition.invalidate()
+    await publish_deleted(deleted_rows)
+    # Старые файлы удаляем с диска в фоне, блобы без ссылок — сборщиком мусора
+    file_cleanup.enqueue(paths)
+
     return None
 
 @router.post("/{exhibition_id}/preview", response_model=ExhibitionSchema, dependencies=[Depends(require_admin)])
@@ -270,17 +315,6 @@ async def upload_exhibition_preview(
             detail="Выставка не найдена"
         )
 
-    # Проверяем размер файла
-    file.file.seek(0, 2)  # Переходим в конец файла
-    file_size = file.file.tell()
-    file.file.seek(0)  # Возвращаемся в начало
-
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE // 1024 // 1024}MB"
-        )
-
     # Проверяем расширение файла
     file_extension = Path(file.filename).suffix.lower()
     if file_extension not in ALLOWED_IMAGE_EXTENSIONS:
@@ -289,23 +323,12 @@ async def upload_exhibition_preview(
             detail=f"Недопустимый формат файла. Разрешены: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}"
         )
 
-    # Генерируем уникальное имя файла
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_filename = f"{exhibition_id}_{timestamp}{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
-
-    # Сохраняем файл
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Потоковое сохранение с проверкой размера; уже сохранённое изображение в хранилище не дублируется
+    staged = await stage_upload(file, file_extension, MAX_FILE_SIZE)
+    blob_paths = await store_blobs(db, [staged])
 
     # Создаем запись о файле в БД
-    db_file = FileModel(
-        name=file.filename,
-        format=file_extension.lstrip('.'),
-        path=str(file_path),
-        url=f"/uploads/exhibitions/{unique_filename}"
-    )
+    db_file = FileModel(**file_values(staged, blob_paths[staged.sha256]))
     db.add(db_file)
     await db.flush()  # Получаем ID файла
 
@@ -313,6 +336,7 @@ async def upload_exhibition_preview(
     exhibition.preview_file_id = db_file.id
     await db.commit()
     await db.refresh(exhibition)
+    thumbnails.enqueue([{"id": db_file.id, "path": db_file.path, "sha256": db_file.sha256}])
 
     # Возвращаем данные вручную в формате схемы
     return {
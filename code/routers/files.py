@@ -1,20 +1,34 @@
 # routers/files.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, BackgroundTasks
+import asyncio
+import re
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, BackgroundTasks, Request
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert
 from typing import List, Optional
 from pathlib import Path
 
-import aiofiles
-import uuid
-import os
-from datetime import datetime
 
 from models.database import get_db
 from models.file import File as FileModel
 from schemas.file import File as FileSchema
-from schemas.file import FileCreate, FileShort, FileCreateRequest
+from schemas.file import (
+    FileCreate, FileShort, FileCreateRequest, FileUploadItemResult, FileUploadReport,
+    ResumableUploadCreate, ResumableUploadStatus, DirectUploadCreate, DirectUploadTicket, DirectUploadComplete
+)
 from schemas.base import PaginationParams, PaginatedResponse
+from services.auth import require_admin, require_auth
+from services.file_cleanup import file_cleanup
+from services.blob_storage import (
+    StagedUpload, stage_upload, store_blobs, upsert_blobs, blob_path, file_values, upload_url, upload_key,
+    sniff_mime_type, STAGING_DIR, MAX_FILE_SIZE
+)
+from services.storage_backends import storage, storage_key
+from services.orphan_gc import run_gc, GC_BATCH_SIZE
+from models.user import User
+from services import resumable_uploads
+from services.thumbnails import thumbnails, thumbnail_url, THUMBNAIL_SIZES
 
 router = APIRouter(prefix="/files", tags=["Файлы"])
 
@@ -33,101 +47,39 @@ ALLOWED_EXTENSIONS = {
     # Другие
     ".csv", ".json", ".xml"
 }
-MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
-CHUNK_SIZE = 1024 * 1024  # 1MB chunks
-
-async def save_uploaded_file(
-        upload_file: UploadFile,
-        file_type: str = "general",
-        custom_name: Optional[str] = None
-) -> tuple[Path, str, str]:
-    """
-    Сохранение загруженного файла на диск
-    Возвращает: (путь к файлу, уникальное имя файла, оригинальное имя)
-    """
-    # Проверяем расширение файла
-    original_filename = upload_file.filename or "unnamed"
-    file_extension = Path(original_filename).suffix.lower()
+# Сколько файлов одного запроса хэшируется одновременно
+UPLOAD_CONCURRENCY = 8
 
+def check_file_extension(filename: str) -> str:
+    """Расширение файла в нижнем регистре; недопустимое — 400"""
+    file_extension = Path(filename).suffix.lower()
     if file_extension not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Недопустимый формат файла. Разрешены: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
         )
+    return file_extension
 
-    # Генерируем уникальное имя файла
-    if custom_name:
-        # Если указано кастомное имя, используем его (но добавляем расширение)
-        base_name = Path(custom_name).stem
-        unique_filename = f"{base_name}{file_extension}"
-    else:
-        # Генерируем уникальное имя на основе timestamp и uuid
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_uuid = str(uuid.uuid4())[:8]
-        safe_name = Path(original_filename).stem.replace(" ", "_").replace(".", "_")
-        unique_filename = f"{timestamp}_{file_uuid}_{safe_name}{file_extension}"
-
-    # Создаем поддиректорию по типу файла если нужно
-    type_dir = UPLOAD_DIR / file_type
-    type_dir.mkdir(exist_ok=True)
-
-    file_path = type_dir / unique_filename
-
-    # Сохраняем файл чанками
-    total_size = 0
-
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        while True:
-            chunk = await upload_file.read(CHUNK_SIZE)
-            if not chunk:
-                break
-
-            total_size += len(chunk)
-            if total_size > MAX_FILE_SIZE:
-                # Удаляем частично загруженный файл
-                if file_path.exists():
-                    file_path.unlink()
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE // 1024 // 1024}MB"
-                )
-
-            await out_file.write(chunk)
-
-    return file_path, unique_filename, original_filename
-
-async def create_file_record(
+async def save_uploaded_file(
         db: AsyncSession,
-        original_name: str,
-        unique_name: str,
-        file_path: Path,
-        file_type: str = "general"
+        upload_file: UploadFile,
+        custom_name: Optional[str] = None
 ) -> FileModel:
-    """Создание записи о файле в БД"""
-
-    # Определяем формат файла
-    file_extension = Path(original_name).suffix.lower().lstrip('.')
-    if not file_extension:
-        file_extension = "unknown"
+    """
+    Сохранение загруженного файла в хранилище блобов и создание записи в БД (без коммита).
+    Содержимое хранится под своим SHA-256: повторная загрузка тех же байтов на диск не пишется
+    """
+    # Проверяем расширение файла
+    original_filename = upload_file.filename or "unnamed"
+    file_extension = check_file_extension(original_filename)
 
-    # Создаем URL (без домена)
-    url_path = str(file_path.relative_to("uploads")).replace("\\", "/")
-    url = f"/{url_path}"
+    # Кастомное имя используется как имя файла (с исходным расширением)
+    name = f"{Path(custom_name).stem}{file_extension}" if custom_name else original_filename
 
-    # Создаем запись в БД
-    db_file = FileModel(
-        name=original_name,
-        format=file_extension,
-        path=str(file_path),
-        url=url,
-        metadata={
-            "original_name": original_name,
-            "unique_name": unique_name,
-            "type": file_type,
-            "uploaded_at": datetime.now().isoformat()
-        }
-    )
+    staged = await stage_upload(upload_file, file_extension, MAX_FILE_SIZE, name=name)
+    blob_paths = await store_blobs(db, [staged])
 
+    db_file = FileModel(**file_values(staged, blob_paths[staged.sha256]))
     db.add(db_file)
     await db.flush()
     return db_file
@@ -143,38 +95,15 @@ async def upload_file(
     Загрузка файла на сервер
 
     - **file**: Файл для загрузки
-    - **file_type**: Тип файла для организации в директориях
+    - **file_type**: Тип файла (оставлен для совместимости, файлы хранятся по хэшу содержимого)
     - **custom_name**: Опциональное кастомное имя файла
     """
     try:
-        # Сохраняем файл на диск
-        file_path, unique_name, original_name = await save_uploaded_file(
-            upload_file=file,
-            file_type=file_type,
-            custom_name=custom_name
-        )
-
-        # Проверяем, нет ли уже файла с таким путем (уникальным именем)
-        existing_file = await db.execute(
-            select(FileModel).where(FileModel.path == str(file_path))
-        )
-        existing_file = existing_file.scalar_one_or_none()
-
-        if existing_file:
-            # Если файл уже существует, возвращаем существующую запись
-            return existing_file
-
-        # Создаем запись в БД
-        db_file = await create_file_record(
-            db=db,
-            original_name=original_name,
-            unique_name=unique_name,
-            file_path=file_path,
-            file_type=file_type
-        )
+        db_file = await save_uploaded_file(db, file, custom_name=custom_name)
 
         await db.commit()
         await db.refresh(db_file)
+        thumbnails.enqueue([{"id": db_file.id, "path": db_file.path, "sha256": db_file.sha256}])
 
         return db_file
 
@@ -188,59 +117,263 @@ async def upload_file(
             detail=f"Ошибка при загрузке файла: {str(e)}"
         )
 
-@router.post("/upload-multiple", response_model=List[FileSchema])
+@router.post("/upload-multiple", response_model=FileUploadReport)
 async def upload_multiple_files(
         files: List[UploadFile] = File(...),
-        file_type: str = Query("general", description="Тип файлов"),
         db: AsyncSession = Depends(get_db)
 ):
     """
-    Загрузка нескольких файлов одновременно
+    Загрузка нескольких файлов одновременно.
+    Файлы проверяются и потоково пишутся на диск параллельно (не более UPLOAD_CONCURRENCY сразу),
+    блобы регистрируются одним вызовом хранилища, записи создаются одним
+    многострочным INSERT ... RETURNING. Для каждого файла возвращается свой статус
     """
-    uploaded_files = []
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    items = [
+        FileUploadItemResult(index=index, filename=upload_file.filename or "unnamed", status="created")
+        for index, upload_file in enumerate(files)
+    ]
 
-    for upload_file in files:
+    async def prepare(upload_file: UploadFile, item: FileUploadItemResult) -> Optional[StagedUpload]:
         try:
-            # Сохраняем каждый файл
-            file_path, unique_name, original_name = await save_uploaded_file(
-                upload_file=upload_file,
-                file_type=file_type
-            )
+            file_extension = check_file_extension(item.filename)
+            async with semaphore:
+                return await stage_upload(upload_file, file_extension, MAX_FILE_SIZE, name=item.filename)
+        except HTTPException as e:
+            item.status = "error"
+            item.errors.append(str(e.detail))
+        except Exception as e:
+            item.status = "error"
+            item.errors.append(f"Ошибка чтения файла: {str(e)}")
+        return None
 
-            # Проверяем на дубликат по пути
-            existing_file = await db.execute(
-                select(FileModel).where(FileModel.path == str(file_path))
-            )
-            existing_file = existing_file.scalar_one_or_none()
-
-            if existing_file:
-                uploaded_files.append(existing_file)
-                continue
-
-            # Создаем запись
-            db_file = await create_file_record(
-                db=db,
-                original_name=original_name,
-                unique_name=unique_name,
-                file_path=file_path,
-                file_type=file_type
+    prepared = await asyncio.gather(*[prepare(upload_file, item) for upload_file, item in zip(files, items)])
+    accepted = [(item, staged) for item, staged in zip(items, prepared) if staged is not None]
+
+    if accepted:
+        try:
+            blob_paths = await store_blobs(db, [staged for _, staged in accepted])
+            file_rows = [file_values(staged, blob_paths[staged.sha256]) for _, staged in accepted]
+            result = await db.execute(
+                insert(FileModel).returning(
+                    FileModel.id, FileModel.created_at, FileModel.updated_at, sort_by_parameter_order=True
+                ),
+                file_rows
             )
+            inserted = result.all()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            for item, _ in accepted:
+                item.status = "error"
+                item.errors.append(f"Ошибка сохранения файла: {str(e)}")
+        else:
+            for (item, _), file_row, row in zip(accepted, file_rows, inserted):
+                item.file = FileSchema(
+                    id=row.id, created_at=row.created_at, updated_at=row.updated_at, **file_row
+                )
+            thumbnails.enqueue([
+                {"id": row.id, "path": file_row["path"], "sha256": file_row["sha256"]}
+                for file_row, row in zip(file_rows, inserted)
+            ])
+
+    created = sum(1 for item in items if item.status == "created")
+    return FileUploadReport(total=len(items), created=created, error=len(items) - created, items=items)
+
+def resumable_status(session: resumable_uploads.UploadSession, received) -> ResumableUploadStatus:
+    received_bytes = sum(end - start for start, end in received)
+    return ResumableUploadStatus(
+        upload_id=session.upload_id,
+        filename=session.name,
+        size=session.size,
+        chunk_size=resumable_uploads.RESUMABLE_CHUNK_SIZE,
+        max_chunk_size=resumable_uploads.RESUMABLE_MAX_CHUNK_SIZE,
+        received=[[start, end] for start, end in received],
+        received_bytes=received_bytes,
+        complete=received_bytes == session.size
+    )
 
-            uploaded_files.append(db_file)
+@router.post("/uploads", response_model=ResumableUploadStatus, status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(
+        data: ResumableUploadCreate,
+        current_user: User = Depends(require_auth)
+):
+    """
+    Создание сессии возобновляемой загрузки.
+    Дальше клиент отправляет части PUT /files/uploads/{upload_id}?offset=N в любом порядке,
+    после обрыва узнаёт полученные диапазоны через GET и завершает загрузку POST .../complete
+    """
+    file_extension = check_file_extension(data.filename)
+    session = await resumable_uploads.create_session(
+        current_user.id, data.filename, file_extension, data.size, data.sha256
+    )
+    return resumable_status(session, [])
 
-        except Exception as e:
-            # Пропускаем файл с ошибкой, продолжаем с остальными
-            continue
+@router.get("/uploads/{upload_id}", response_model=ResumableUploadStatus)
+async def get_resumable_upload(
+        upload_id: str,
+        current_user: User = Depends(require_auth)
+):
+    """Полученные диапазоны сессии загрузки"""
+    session, received = await resumable_uploads.get_session(upload_id, current_user.id)
+    return resumable_status(session, received)
+
+@router.put("/uploads/{upload_id}", response_model=ResumableUploadStatus)
+async def put_resumable_chunk(
+        upload_id: str,
+        request: Request,
+        offset: int = Query(..., ge=0, description="Смещение части в файле"),
+        current_user: User = Depends(require_auth)
+):
+    """Приём части файла (тело запроса — байты части); повторная отправка части безопасна"""
+    await resumable_uploads.write_chunk(upload_id, current_user.id, offset, request.stream())
+    session, received = await resumable_uploads.get_session(upload_id, current_user.id)
+    return resumable_status(session, received)
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileSchema, status_code=status.HTTP_201_CREATED)
+async def complete_resumable_upload(
+        upload_id: str,
+        current_user: User = Depends(require_auth),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Завершение загрузки: части собираются на сервере с подсчётом SHA-256,
+    файл атомарно переносится в хранилище блобов и создаётся запись в БД
+    """
+    session, claimed = await resumable_uploads.claim_session(upload_id, current_user.id)
+    try:
+        staged = await resumable_uploads.assemble_session(session, claimed)
+        blob_paths = await store_blobs(db, [staged])
 
-    await db.commit()
+        db_file = FileModel(**file_values(staged, blob_paths[staged.sha256]))
+        db.add(db_file)
+        await db.commit()
+        await db.refresh(db_file)
+    except Exception as e:
+        await db.rollback()
+        # Части остаются на месте: клиент может дозагрузить недостающие и повторить
+        await resumable_uploads.release_session(claimed)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при завершении загрузки: {str(e)}"
+        )
 
-    # Обновляем объекты из БД
-    for file in uploaded_files:
-        await db.refresh(file)
+    await resumable_uploads.delete_session(claimed)
+    thumbnails.enqueue([{"id": db_file.id, "path": db_file.path, "sha256": db_file.sha256}])
+    return db_file
 
-    return uploaded_files
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_resumable_upload(
+        upload_id: str,
+        current_user: User = Depends(require_auth)
+):
+    """Отмена загрузки и удаление полученных частей"""
+    session, claimed = await resumable_uploads.claim_session(upload_id, current_user.id)
+    await resumable_uploads.delete_session(claimed)
+    return None
 
 
+def check_direct_upload(data: DirectUploadCreate) -> str:
+    """Проверка запроса прямой загрузки, возвращает расширение"""
+    if not storage.supports_presigned:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Прямая загрузка доступна только с объектным хранилищем, используйте /files/uploads"
+        )
+    if data.size > resumable_uploads.RESUMABLE_MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Файл слишком большой. Максимальный размер: {resumable_uploads.RESUMABLE_MAX_FILE_SIZE // 1024 // 1024}MB"
+        )
+    return check_file_extension(data.filename)
+
+# Временные объекты прямых загрузок: staging/direct/<user_id>/<sha256>_<uuid><ext>
+DIRECT_UPLOAD_PREFIX = storage_key(str(STAGING_DIR / "direct"))
+_DIRECT_UPLOAD_KEY_RE = re.compile(r"^(\d+)/([0-9a-f]{64})_[0-9a-f]{32}(\.[0-9a-z]+)?$")
+
+
+def direct_upload_key(user_id: int, sha256: str, file_extension: str) -> str:
+    return f"{DIRECT_UPLOAD_PREFIX}/{user_id}/{sha256}_{uuid.uuid4().hex}{file_extension}"
+
+
+def check_direct_upload_key(key: str, user_id: int, sha256: str):
+    """Ключ выдан этому пользователю для этого содержимого, иначе 404"""
+    prefix = DIRECT_UPLOAD_PREFIX + "/"
+    match = _DIRECT_UPLOAD_KEY_RE.match(key[len(prefix):]) if key.startswith(prefix) else None
+    if match is None or int(match.group(1)) != user_id or match.group(2) != sha256:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Загрузка не найдена"
+        )
+
+@router.post("/direct-uploads", response_model=DirectUploadTicket)
+async def create_direct_upload(
+        data: DirectUploadCreate,
+        current_user: User = Depends(require_auth)
+):
+    """
+    Presigned URL для загрузки содержимого напрямую в объектное хранилище.
+    Содержимое всегда загружается во временный объект пользователя, даже если такой блоб
+    уже есть: подписанные размер и SHA-256 проверяет хранилище, поэтому загрузка доказывает,
+    что у клиента есть сами байты, а не только их хэш.
+    После загрузки клиент вызывает POST /files/direct-uploads/complete с полученным key
+    """
+    file_extension = check_direct_upload(data)
+    sha256 = data.sha256.lower()
+
+    key = direct_upload_key(current_user.id, sha256, file_extension)
+    content_type = data.content_type or sniff_mime_type(b"", data.filename)
+    upload = await storage.presigned_upload(key, data.size, sha256, content_type)
+    return DirectUploadTicket(key=key, upload=upload)
+
+@router.post("/direct-uploads/complete", response_model=FileSchema, status_code=status.HTTP_201_CREATED)
+async def complete_direct_upload(
+        data: DirectUploadComplete,
+        current_user: User = Depends(require_auth),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Регистрация файла, загруженного напрямую в хранилище: временный объект
+    переносится в блоб (если такого содержимого ещё нет) и удаляется
+    """
+    file_extension = check_direct_upload(data)
+    sha256 = data.sha256.lower()
+    check_direct_upload_key(data.key, current_user.id, sha256)
+
+    if await storage.size(data.key) != data.size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Файл не найден в хранилище или загружен не полностью"
+        )
+
+    rows = await upsert_blobs(db, [{"sha256": sha256, "size": data.size, "path": blob_path(sha256, file_extension)}])
+    path = rows[0].path
+    try:
+        if rows[0].inserted or not await storage.exists(storage_key(path)):
+            await storage.copy(data.key, storage_key(path))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при сохранении файла: {str(e)}"
+        )
+
+    db_file = FileModel(
+        name=data.filename,
+        format=file_extension.lstrip(".") or "unknown",
+        path=path,
+        url=upload_url(path),
+        sha256=sha256,
+        mime_type=data.content_type or sniff_mime_type(b"", data.filename)
+    )
+    db.add(db_file)
+    await db.commit()
+    await db.refresh(db_file)
+    await storage.delete(data.key)
+    thumbnails.enqueue([{"id": db_file.id, "path": db_file.path, "sha256": db_file.sha256}])
+    return db_file
 
 @router.get("/", response_model=PaginatedResponse)
 async def get_files(
@@ -278,6 +411,29 @@ async def get_files(
         items=items
     )
 
+@router.post("/gc", dependencies=[Depends(require_admin)])
+async def collect_orphan_files(
+        dry_run: bool = Query(True, description="Только посчитать, ничего не удалять"),
+        batch_size: int = Query(GC_BATCH_SIZE, ge=1, le=10000),
+        max_batches: Optional[int] = Query(None, ge=1, description="Ограничение пачек на каждом шаге"),
+):
+    """
+    Сборка мусора: записи файлов без связей, блобы без ссылок, файлы на диске без записей.
+    Возвращает количество удалённого и освобождённые байты
+    """
+    return await run_gc(dry_run=dry_run, batch_size=batch_size, max_batches=max_batches)
+
+@router.get("/cleanup/{job_id}", dependencies=[Depends(require_admin)])
+async def get_cleanup_job(job_id: str):
+    """Статус фонового удаления файлов: сколько удалено и сколько места освобождено"""
+    job = file_cleanup.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена"
+        )
+    return job
+
 @router.get("/{file_id}", response_model=FileSchema)
 async def get_file(
         file_id: int,
@@ -297,6 +453,40 @@ async def get_file(
 
     return file
 
+@router.get("/{file_id}/thumbnail/{size}")
+async def get_file_thumbnail(
+        file_id: int,
+        size: int,
+        request: Request,
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Редирект на превью изображения нужного размера.
+    Пока превью не готово (или файл не изображение) — редирект на оригинал
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый размер превью. Доступны: {', '.join(map(str, THUMBNAIL_SIZES))}"
+        )
+
+    result = await db.execute(
+        select(FileModel.url, FileModel.derivatives).where(FileModel.id == file_id)
+    )
+    file = result.one_or_none()
+    if not file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Файл не найден"
+        )
+
+    url = thumbnail_url(file.url, file.derivatives, size)
+    # Относительный Location: абсолютный url_for за nginx дал бы внутренние схему и хост
+    return RedirectResponse(
+        url=request.app.url_path_for("uploads", path=upload_key(url)),
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT
+    )
+
 @router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_file(
         file_id: int,
@@ -314,12 +504,12 @@ async def delete_file(
             detail="Файл не найден"
         )
 
-    # Удаляем файл с диска
-    if Path(file.path).exists():
-        Path(file.path).unlink()
-
-    # Удаляем запись из БД
+    # Удаляем запись из БД (счётчик ссылок блоба уменьшает триггер)
     await db.delete(file)
     await db.commit()
 
+    # Старые файлы удаляем с диска в фоне, блобы без ссылок — сборщиком мусора
+    if file.sha256 is None:
+        file_cleanup.enqueue([file.path])
+
     return None
\ No newline at end of file
@@ -0,0 +1,142 @@
+# routers/uploads.py
+import os
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, exists, or_, true
+
+from models.database import get_db
+from models.file import File as FileModel
+from models.contact import Contact, contact_file_association
+from models.user import User
+from services.auth import require_auth
+from services.blob_storage import UPLOAD_ROOT, BLOB_DIR
+from services.thumbnails import THUMBNAIL_DIR
+from services.storage_backends import storage
+
+router = APIRouter(tags=["Файлы"])
+
+# Внутренний location nginx (internal) с alias на каталог uploads.
+# Если задан, файл отдаёт nginx, а Python только проверяет доступ
+UPLOADS_ACCEL_REDIRECT = os.getenv("UPLOADS_ACCEL_REDIRECT", "").rstrip("/")
+
+# Блобы и их превью названы по хэшу содержимого, содержимое по URL не меняется.
+# private: ответ зависит от пользователя, общие кэши (прокси, CDN) его не хранят
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+# Старые файлы и их превью (file_<id>) — с проверкой актуальности по ETag/Last-Modified
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def resolve_upload_path(path: str) -> Path:
+    """Путь внутри uploads; выход за пределы каталога — 404"""
+    root = UPLOAD_ROOT.resolve()
+    full_path = (root / path).resolve()
+    if root not in full_path.parents:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Файл не найден"
+        )
+    return full_path
+
+
+def registered_file_condition(relative: Path):
+    """
+    Условие «файл зарегистрирован в БД»: отдаются только файлы из таблицы files
+    и превью их блобов, но не временные файлы и блобы без ссылок.
+    Файл ищется по files.path: он одинаков у старых строк (URL /uploads/contacts/...)
+    и у новых, а URL в разное время записывались в разном виде
+    """
+    if relative.parts[0] == THUMBNAIL_DIR.name:
+        # thumbs/[ab/cd/]<sha256>_<size>.<ext> или thumbs/[ab/cd/]file_<id>_<size>.<ext>
+        key = relative.stem.rpartition("_")[0]
+        if key.startswith("file_") and key[5:].isdigit():
+            return FileModel.id == int(key[5:])
+        return FileModel.sha256 == key
+    return FileModel.path == (UPLOAD_ROOT / relative).as_posix()
+
+
+def file_access_condition(user: User):
+    """
+    Права на файл: администратору — любой; остальным — файлы своих контактов
+    и файлы, не привязанные к контактам (превью выставок, отдельные загрузки)
+    """
+    if user.is_admin:
+        return true()
+    linked = exists().where(contact_file_association.c.file_id == FileModel.id)
+    own = exists().where(
+        contact_file_association.c.file_id == FileModel.id,
+        contact_file_association.c.contact_id == Contact.id,
+        Contact.author_id == user.id
+    )
+    return or_(~linked, own)
+
+
+def is_content_addressed(relative: Path) -> bool:
+    """Имя файла — SHA-256 содержимого: блобы и их превью, но не превью старых файлов file_<id>"""
+    return relative.parts[0] in (BLOB_DIR.name, THUMBNAIL_DIR.name) and not relative.name.startswith("file_")
+
+
+def upload_etag(relative: Path):
+    """Сильный ETag по хэшу содержимого для блобов и их превью"""
+    if is_content_addressed(relative):
+        return f'"{relative.stem}"'
+    return None
+
+
+@router.api_route("/uploads/{path:path}", methods=["GET", "HEAD"], name="uploads")
+async def serve_upload(
+        path: str,
+        request: Request,
+        current_user: User = Depends(require_auth),
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Отдача загруженных файлов с ETag и Range после проверки прав пользователя на файл;
+    долгое кэширование — только для файлов, названных по хэшу содержимого.
+    При UPLOADS_ACCEL_REDIRECT тело отдаёт nginx через X-Accel-Redirect,
+    при объектном хранилище — редирект на presigned URL
+    """
+    full_path = resolve_upload_path(path)
+    relative = full_path.relative_to(UPLOAD_ROOT.resolve())
+
+    result = await db.execute(select(exists().where(
+        registered_file_condition(relative),
+        file_access_condition(current_user)
+    )))
+    if not result.scalar():
+        # Чужой файл неотличим от отсутствующего
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Файл не найден"
+        )
+
+    content_addressed = is_content_addressed(relative)
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL if content_addressed else REVALIDATE_CACHE_CONTROL}
+
+    if not storage.is_local and content_addressed:
+        # Блобы и их превью лежат в объектном хранилище: клиент скачивает напрямую
+        return RedirectResponse(
+            url=await storage.download_url(relative.as_posix()),
+            status_code=status.HTTP_307_TEMPORARY_REDIRECT
+        )
+
+    if UPLOADS_ACCEL_REDIRECT:
+        # Range, ETag и условные запросы обрабатывает nginx
+        headers["X-Accel-Redirect"] = f"{UPLOADS_ACCEL_REDIRECT}/{relative.as_posix()}"
+        return Response(headers=headers)
+
+    etag = upload_etag(relative)
+    if etag is not None:
+        headers["ETag"] = etag
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if not full_path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Файл не найден"
+        )
+    # FileResponse сам обрабатывает Range и If-None-Match/If-Modified-Since
+    return FileResponse(full_path, headers=headers)
@@ -8,7 +8,8 @@ from models.database import get_db
 from models.user import User
 from schemas.user import User as UserSchema, UserUpdate, UserShort
 from schemas.base import PaginationParams, PaginatedResponse
-from services.auth import require_admin, get_optional_user
+from services.auth import require_admin, get_optional_user, get_current_user
+from services.user_cache import user_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -74,7 +75,7 @@ async def get_users(
 
 @router.get("/me", response_model=UserSchema)
 async def get_current_user_info(
-        current_user: Optional[User] = Depends(get_optional_user)
+        current_user: Optional[User] = Depends(get_current_user)
 ):
     """Получение информации о текущем пользователе"""
     if not current_user:
@@ -95,6 +96,13 @@ async def get_current_user_info(
 
     return {"is_admin" : current_user.is_admin}
 
+@router.get("/cache/stats")
+async def get_user_cache_stats(
+        _: User = Depends(require_admin)
+):
+    """Статистика кэша пользователей: размер, попадания, промахи, hit rate"""
+    return user_cache.stats()
+
 @router.get("/{user_id}", response_model=UserSchema)
 async def get_user(
         user_id: int,
@@ -140,8 +148,12 @@ async def update_user(
         if value is not None:
             setattr(user, field, value)
 
+    # Ранее выданные токены (с прежним признаком администратора) больше не действуют
+    user.token_version = (user.token_version or 0) + 1
+
     await db.commit()
     await db.refresh(user)
+    user_cache.invalidate_user(user_id)
 
     return user
 
@@ -163,7 +175,9 @@ async def delete_user(
             detail="Пользователь не найден"
         )
 
+    # Токены удалённого пользователя не проходят проверку версии: строки users больше нет
     await db.delete(user)
     await db.commit()
+    user_cache.invalidate_user(user_id)
 
     return None
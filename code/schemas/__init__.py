@@ -13,7 +13,13 @@ from .file import (
     FileUpdate,
     File,
     FileShort,
-    FileCreateRequest
+    FileCreateRequest,
+    FileUploadItemResult,
+    FileUploadReport,
+    ResumableUploadCreate,
+    ResumableUploadStatus,
+    DirectUploadCreate,
+    DirectUploadTicket
 )
 
 # Exhibition schemas
@@ -38,14 +44,32 @@ from .contact import (
     ContactShort,
     ContactList,
     ContactWithExhibition,
+    ContactWithFiles,
     ContactFilter,
     ContactSearch,
     ContactImport,
     ContactBatchCreate,
+    ContactBatchItemResult,
+    ContactBatchReport,
+    ContactImportRowError,
+    ContactImportReport,
     ContactExport,
     ContactStats,
     ContactDuplicateCheck,
-    ContactDuplicateResponse
+    ContactDuplicateResponse,
+    ContactAdminUpdate,
+    ContactBulkFilter,
+    ContactBulkSelection,
+    ContactBulkUpdate,
+    ContactBulkResult,
+    ContactBulkDeleteResult,
+    ContactFileInfo,
+    ContactDetail,
+    ContactSyncTombstone,
+    ContactSyncResponse,
+    ContactSyncUpload,
+    ContactSyncUploadItem,
+    ContactSyncUploadReport
 )
 
 # Для решения циклических зависимостей
@@ -81,6 +105,7 @@ class ContactShort(BaseSchema):
 # Обновляем Forward References
 ExhibitionWithContacts.model_rebuild()
 ContactWithExhibition.model_rebuild()
+ContactWithFiles.model_rebuild()
 
 __all__ = [
     # Base
@@ -96,6 +121,12 @@ __all__ = [
     "File",
     "FileShort",
     "FileCreateRequest",
+    "FileUploadItemResult",
+    "FileUploadReport",
+    "ResumableUploadCreate",
+    "ResumableUploadStatus",
+    "DirectUploadCreate",
+    "DirectUploadTicket",
 
     # Exhibition
     "ExhibitionBase",
@@ -117,12 +148,30 @@ __all__ = [
     "ContactShort",
     "ContactList",
     "ContactWithExhibition",
+    "ContactWithFiles",
     "ContactFilter",
     "ContactSearch",
     "ContactImport",
     "ContactBatchCreate",
+    "ContactBatchItemResult",
+    "ContactBatchReport",
+    "ContactImportRowError",
+    "ContactImportReport",
     "ContactExport",
     "ContactStats",
     "ContactDuplicateCheck",
     "ContactDuplicateResponse",
+    "ContactAdminUpdate",
+    "ContactBulkFilter",
+    "ContactBulkSelection",
+    "ContactBulkUpdate",
+    "ContactBulkResult",
+    "ContactBulkDeleteResult",
+    "ContactFileInfo",
+    "ContactDetail",
+    "ContactSyncTombstone",
+    "ContactSyncResponse",
+    "ContactSyncUpload",
+    "ContactSyncUploadItem",
+    "ContactSyncUploadReport",
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 # schemas/contact.py
-from pydantic import BaseModel, Field, ConfigDict, field_validator, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator, EmailStr
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 import re
@@ -109,6 +109,69 @@ class ContactAdminUpdate(BaseSchema):
 
     #     return v
 
+# Отбор контактов для массовых операций: список id или фильтр
+class ContactBulkFilter(BaseSchema):
+    exhibition_id: Optional[int] = None
+    author_id: Optional[int] = None
+    is_validated: Optional[bool] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class ContactBulkSelection(BaseSchema):
+    ids: Optional[List[int]] = Field(None, description="ID контактов")
+    filter: Optional[ContactBulkFilter] = Field(None, description="Фильтр, если id не указаны")
+
+    @model_validator(mode='after')
+    def check_selection(self):
+        if not self.ids and self.filter is None:
+            raise ValueError('Нужно указать ids или filter')
+        return self
+
+# Массовое административное обновление
+class ContactBulkUpdate(ContactBulkSelection):
+    changes: ContactAdminUpdate
+
+# Результат массовой операции
+class ContactBulkResult(BaseSchema):
+    affected: int
+
+# Результат массового удаления
+class ContactBulkDeleteResult(ContactBulkResult):
+    files_deleted: int = 0
+    cleanup_job_id: Optional[str] = Field(None, description="ID задачи удаления файлов с диска")
+
+# Файл контакта с типом из ассоциативной таблицы
+class ContactFileInfo(BaseSchema):
+    file_id: int
+    name: str
+    type: str
+    url: str
+    format: str
+    created_at: datetime
+    derivatives: Optional[Dict[str, Any]] = Field(None, description="Превью изображения по размерам")
+
+# Карточка контакта: контакт, ФИО автора и (опционально) файлы
+class ContactDetail(BaseSchema):
+    id: int
+    title: str
+    description: Optional[str] = None
+    full_name: str
+    position: str
+    email: str
+    phone_number: str
+    city: Optional[str] = None
+    questionnaire: Dict[str, Any] = Field(default_factory=dict)
+    exhibition_id: Optional[int] = None
+    author_id: Optional[int] = None
+    author: Optional[str] = Field(None, description="ФИО автора")
+    is_validated: bool = False
+    validated_by_id: Optional[int] = None
+    validated_at: Optional[datetime] = None
+    notes: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    files: Optional[List[ContactFileInfo]] = None
+
 # Облегченная схема контакта
 class ContactShort(BaseSchema):
     id: int
@@ -137,6 +200,10 @@ class ContactList(BaseSchema):
 class ContactWithExhibition(Contact):
     exhibition: Optional["ExhibitionShort"] = None
 
+# Схема контакта, созданного вместе с файлами
+class ContactWithFiles(ContactWithExhibition):
+    files: List[ContactFileInfo] = Field(default_factory=list)
+
 # Схема для фильтрации контактов
 class ContactFilter(BaseSchema):
     title: Optional[str] = None
@@ -209,7 +276,72 @@ class ContactImport(BaseSchema):
 # Схема для массового создания контактов
 class ContactBatchCreate(BaseSchema):
     #exhibition_id: int
-    contacts: List[ContactImport]
+    # Строки валидируются по ContactImport по отдельности, чтобы ошибка
+    # в одной строке не отклоняла всю пачку
+    contacts: List[Dict[str, Any]] = Field(..., description="Контакты в формате ContactImport")
+
+# Результат обработки одной строки при массовом создании/импорте
+class ContactBatchItemResult(BaseSchema):
+    index: int
+    status: str = Field(..., description="created / duplicate / error")
+    contact_id: Optional[int] = None
+    duplicate_fields: List[str] = Field(default_factory=list)
+    errors: List[str] = Field(default_factory=list)
+
+# Отчёт о массовом создании контактов
+class ContactBatchReport(BaseSchema):
+    total: int
+    created: int
+    duplicate: int
+    error: int
+    items: List[ContactBatchItemResult] = Field(default_factory=list)
+
+# Отметка об удалении контакта для синхронизации
+class ContactSyncTombstone(BaseSchema):
+    contact_id: int
+    exhibition_id: Optional[int] = None
+    deleted_at: datetime
+
+# Изменения с момента водяного знака
+class ContactSyncResponse(BaseSchema):
+    contacts: List[ContactDetail] = Field(default_factory=list)
+    tombstones: List[ContactSyncTombstone] = Field(default_factory=list)
+    watermark: str = Field(..., description="Передать в since при следующей синхронизации")
+    has_more: bool = Field(False, description="Есть ещё изменения, нужно повторить запрос")
+
+# Загрузка контактов, собранных на устройстве без сети
+class ContactSyncUpload(BaseSchema):
+    contacts: List[Dict[str, Any]] = Field(..., description="Контакты в формате ContactImport + client_id")
+
+class ContactSyncUploadItem(ContactBatchItemResult):
+    client_id: Optional[str] = Field(None, description="Локальный ID контакта на устройстве")
+
+class ContactSyncUploadReport(ContactBatchReport):
+    items: List[ContactSyncUploadItem] = Field(default_factory=list)
+
+# Ошибка/дубликат в строке импортируемого файла
+class ContactImportRowError(BaseSchema):
+    row: int = Field(..., description="Номер строки в файле")
+    status: str = Field(..., description="duplicate / error")
+    duplicate_fields: List[str] = Field(default_factory=list)
+    errors: List[str] = Field(default_factory=list)
+
+class ContactImportRowRange(BaseSchema):
+    from_row: int
+    to_row: Optional[int] = Field(None, description="None — конец диапазона неизвестен (файл не дочитан)")
+    detail: Optional[str] = None
+
+# Отчёт об импорте контактов из CSV/XLSX
+class ContactImportReport(BaseSchema):
+    total: int
+    created: int
+    duplicate: int
+    error: int
+    errors: List[ContactImportRowError] = Field(default_factory=list)
+    errors_truncated: bool = False
+    completed: bool = Field(True, description="False — импорт прерван, записаны только processed_rows")
+    processed_rows: Optional[ContactImportRowRange] = Field(None, description="Закоммиченные строки файла")
+    failed_rows: Optional[ContactImportRowRange] = Field(None, description="Строки, на которых импорт остановился")
 
 # Схема для экспорта контактов
 class ContactExport(BaseSchema):
@@ -1,6 +1,6 @@
 # schemas/file.py
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from .base import BaseSchema, TimestampSchema
 
@@ -25,6 +25,9 @@ class FileUpdate(BaseSchema):
 # Полная схема файла (для ответа)
 class File(FileBase, TimestampSchema):
     id: int
+    sha256: Optional[str] = Field(None, description="SHA-256 содержимого")
+    mime_type: Optional[str] = Field(None, description="MIME-тип по содержимому")
+    derivatives: Optional[Dict[str, Any]] = Field(None, description="Превью по размерам: {url, format, width, height}")
     model_config = ConfigDict(from_attributes=True)
 
 # Облегченная схема для вложений
@@ -38,4 +41,49 @@ class FileShort(BaseSchema):
 class FileCreateRequest(BaseModel):
     filename: str
     content_type: str
-    file_size: int
\ No newline at end of file
+    file_size: int
+
+# Результат загрузки одного файла при массовой загрузке
+class FileUploadItemResult(BaseModel):
+    index: int
+    filename: str
+    status: str = Field(..., description="created / error")
+    file: Optional[File] = None
+    errors: List[str] = Field(default_factory=list)
+
+# Отчёт о массовой загрузке файлов
+class FileUploadReport(BaseModel):
+    total: int
+    created: int
+    error: int
+    items: List[FileUploadItemResult] = Field(default_factory=list)
+
+# Прямая загрузка в объектное хранилище по presigned URL
+class DirectUploadCreate(BaseModel):
+    filename: str = Field(..., max_length=255, description="Имя файла с расширением")
+    size: int = Field(..., gt=0, description="Размер файла в байтах")
+    sha256: str = Field(..., pattern=r"^[0-9a-fA-F]{64}$", description="SHA-256 содержимого (проверяет хранилище)")
+    content_type: Optional[str] = Field(None, max_length=127)
+
+class DirectUploadTicket(BaseModel):
+    key: str = Field(..., description="Ключ временного объекта загрузки, передаётся в complete")
+    upload: Dict[str, Any] = Field(..., description="{method, url, headers, expires_in} для загрузки")
+
+class DirectUploadComplete(DirectUploadCreate):
+    key: str = Field(..., max_length=255, description="Ключ из DirectUploadTicket")
+
+# Возобновляемая загрузка по частям
+class ResumableUploadCreate(BaseModel):
+    filename: str = Field(..., max_length=255, description="Имя файла с расширением")
+    size: int = Field(..., gt=0, description="Полный размер файла в байтах")
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$", description="Ожидаемый SHA-256 (проверяется при завершении)")
+
+class ResumableUploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int = Field(..., description="Рекомендуемый размер части")
+    max_chunk_size: int
+    received: List[List[int]] = Field(..., description="Полученные диапазоны [start, end)")
+    received_bytes: int
+    complete: bool
\ No newline at end of file
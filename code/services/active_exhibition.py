@@ -1,4 +1,6 @@
 # dependencies/active_exhibition.py
+import asyncio
+import time
 from fastapi import Depends
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -7,20 +9,65 @@ from sqlalchemy import select
 from models.database import get_db
 from models.exhibition import Exhibition
 
-async def get_current_exhibition(
-        db: AsyncSession = Depends(get_db)
-) -> Optional[int]:
+# Страховка для нескольких воркеров: инвалидация действует только внутри процесса,
+# поэтому кэш другого воркера устаревает не дольше чем на этот интервал
+ACTIVE_EXHIBITION_TTL = 30  # секунд
+
+
+class ActiveExhibitionCache:
     """
-    Dependency для получения текущего пользователя из куки
+    Кэш ID активной выставки в памяти процесса.
+    При нескольких активных выставках берётся выставка с самой поздней
+    датой начала (при равенстве — с наибольшим ID).
+    Сбрасывается через invalidate() при создании, изменении и удалении выставок
     """
 
-    # Строим базовый запрос
-    result = await db.execute(
-            select(Exhibition).where(Exhibition.is_active == True)
+    def __init__(self, ttl: float = ACTIVE_EXHIBITION_TTL):
+        self.ttl = ttl
+        self._exhibition_id: Optional[int] = None
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._version += 1
+        self._expires_at = 0.0
+
+    async def _load(self, db: AsyncSession) -> Optional[int]:
+        result = await db.execute(
+            select(Exhibition.id)
+            .where(Exhibition.is_active == True)
+            .order_by(Exhibition.start_date.desc(), Exhibition.id.desc())
+            .limit(1)
         )
-    exhibition_active = result.scalar_one_or_none()
+        return result.scalar_one_or_none()
+
+    async def get(self, db: AsyncSession) -> Optional[int]:
+        if time.monotonic() < self._expires_at:
+            return self._exhibition_id
+
+        # Одновременные промахи ждут один запрос
+        async with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._exhibition_id
 
-    if exhibition_active is None:
-        return None
+            version = self._version
+            exhibition_id = await self._load(db)
+            # Если во время запроса кэш сбросили, результат мог устареть — не сохраняем
+            if version == self._version:
+                self._exhibition_id = exhibition_id
+                self._expires_at = time.monotonic() + self.ttl
+            return exhibition_id
 
-    return exhibition_active.id
\ No newline at end of file
+
+# Общий экземпляр
+active_exhibition = ActiveExhibitionCache()
+
+
+async def get_current_exhibition(
+        db: AsyncSession = Depends(get_db)
+) -> Optional[int]:
+    """
+    Dependency для получения ID активной выставки (из кэша)
+    """
+    return await active_exhibition.get(db)
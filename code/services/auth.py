@@ -1,47 +1,79 @@
 # dependencies/auth.py
-from fastapi import Depends, HTTPException, status, Cookie, Request
-from typing import Optional
+from fastapi import Depends, HTTPException, status, Cookie, Request, Response
+from typing import Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from models.database import get_db
 from models.user import User
+from services.user_cache import user_cache
+from services.auth_service import auth_service
+from services.session_tokens import (
+    SESSION_TOKEN_COOKIE,
+    SESSION_TOKEN_HEADER,
+    verify_session_token,
+    issue_session_token,
+    set_session_token_cookie
+)
 
-async def get_current_user(
+def read_credentials(
         request: Request,
-        session_id: Optional[str] = Cookie(None, alias="session_id"),
-        current_user_id: Optional[int] = Cookie(None, alias="user_id"),
-        db: AsyncSession = Depends(get_db)
-) -> Optional[User]:
+        session_id: Optional[str],
+        current_user_id: Optional[int]
+) -> Tuple[Optional[int], Optional[str]]:
     """
-    Dependency для получения текущего пользователя из куки
+    user_id и session_id из куки, а если их нет — из заголовков
     """
-    
     if not current_user_id or not session_id:
         #пытаемся получить из headers
-        print(request.headers)
         current_user_id = request.headers.get("user_id")
-        session_id = request.headers.get("session_id") 
+        session_id = request.headers.get("session_id")
 
         if not current_user_id or not session_id:
-            return None
-        
-        current_user_id = int(current_user_id)
-    print(f"session_id: {session_id}, current_user_id: {current_user_id}")
+            return None, None
 
     try:
-        
-        # Ищем пользователя в БД
-        result = await db.execute(
-            select(User).where(User.id == current_user_id)
-        )
-        user = result.scalar_one_or_none()
+        return int(current_user_id), session_id
+    except (TypeError, ValueError):
+        return None, None
+
+async def fetch_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    """Пользователь по id из БД"""
+    result = await db.execute(
+        select(User).where(User.id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+async def load_current_user(
+        request: Request,
+        session_id: Optional[str],
+        current_user_id: Optional[int],
+        db: AsyncSession
+) -> Optional[User]:
+    """
+    Поиск пользователя по куки/заголовкам.
+    Пользователь берётся из кэша по (user_id, session_id). При промахе session_id
+    проверяется во внешней системе (кэш и общий пул AuthService), затем пользователь читается из БД
+    """
+    current_user_id, session_id = read_credentials(request, session_id, current_user_id)
+    if not current_user_id:
+        return None
+
+    user = user_cache.get(current_user_id, session_id)
+    if user is not None:
+        return user
 
-        print(user)
+    if not await auth_service.verify_session(session_id, current_user_id):
+        return None
+
+    try:
+        # Ищем пользователя в БД
+        user = await fetch_user(db, current_user_id)
 
         if not user:
             return None
 
+        user_cache.put(session_id, user)
         return user
 
     except Exception as e:
@@ -50,8 +82,123 @@ async def get_current_user(
         print(f"Ошибка при получении пользователя: {e}")
         return None
 
+def read_session_token(request: Request, session_token: Optional[str]) -> Optional[str]:
+    """Подписанный токен из куки, заголовка session_token или Authorization: Bearer"""
+    if session_token:
+        return session_token
+    token = request.headers.get(SESSION_TOKEN_HEADER)
+    if token:
+        return token
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return None
+
+async def fetch_token_version(db: AsyncSession, user_id: int) -> Optional[int]:
+    """users.token_version по первичному ключу; None — пользователя нет"""
+    result = await db.execute(
+        select(User.token_version).where(User.id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+async def load_token_user(
+        request: Request,
+        session_token: Optional[str],
+        db: AsyncSession
+) -> Optional[User]:
+    """
+    Пользователь по подписанному токену: id и признак администратора берутся из подписанных
+    утверждений. Подпись и срок проверяются без БД, версия — по кэшу версий с коротким TTL
+    (запрос к БД не чаще раза в TOKEN_VERSION_TTL на пользователя). Выход, изменение и удаление
+    пользователя сбрасывают кэш, поэтому в этом воркере токен перестаёт действовать сразу,
+    в остальных — не позже чем через TTL
+    """
+    claims = verify_session_token(read_session_token(request, session_token))
+    if claims is None:
+        return None
+
+    version = user_cache.get_token_version(claims.id)
+    if version is None:
+        try:
+            version = await fetch_token_version(db, claims.id)
+        except Exception as e:
+            await db.rollback()
+            print(f"Ошибка при проверке токена: {e}")
+            return None
+        if version is None:
+            return None
+        user_cache.put_token_version(claims.id, version)
+
+    if version != claims.version:
+        return None
+    # Объект только с утверждениями токена; полный профиль — через get_current_user
+    return User(id=claims.id, is_admin=claims.is_admin, token_version=claims.version)
+
+async def revoke_session_tokens(db: AsyncSession, user_id: int):
+    """
+    Все выданные пользователю токены перестают действовать (версия +1).
+    На других устройствах пользователь остаётся в системе по session_id и получает новый токен
+    """
+    await db.execute(
+        update(User).where(User.id == user_id).values(token_version=User.token_version + 1)
+    )
+
+async def get_current_identity(
+        request: Request,
+        response: Response,
+        session_token: Optional[str] = Cookie(None, alias=SESSION_TOKEN_COOKIE),
+        session_id: Optional[str] = Cookie(None, alias="session_id"),
+        current_user_id: Optional[int] = Cookie(None, alias="user_id"),
+        db: AsyncSession = Depends(get_db)
+) -> Optional[User]:
+    """
+    Единый резолвер текущего пользователя, через него идут все зависимости авторизации.
+    Сначала подписанный токен (версия из кэша, без проверки сессии во внешней системе), иначе пользователь
+    по user_id/session_id, после чего выпускается новый токен.
+    Результат сохраняется в request.state, поэтому в одном запросе пользователь ищется один раз
+    """
+    if hasattr(request.state, "identity"):
+        return request.state.identity
+
+    identity = await load_token_user(request, session_token, db)
+    request.state.token_identity = identity is not None
+    if identity is None:
+        identity = await load_current_user(request, session_id, current_user_id, db)
+        if identity is not None:
+            set_session_token_cookie(response, issue_session_token(identity))
+
+    request.state.identity = identity
+    return identity
+
+async def get_current_user_id(
+        current_user: Optional[User] = Depends(get_current_identity)
+) -> Optional[int]:
+    """
+    Dependency: ID проверенного пользователя или None. Идёт через общий резолвер,
+    поэтому сессия проверена, а при попадании в кэш запросов к БД нет
+    """
+    return current_user.id if current_user else None
+
+async def get_current_user(
+        request: Request,
+        current_user: Optional[User] = Depends(get_current_identity),
+        db: AsyncSession = Depends(get_db)
+) -> Optional[User]:
+    """
+    Dependency для получения текущего пользователя (полный профиль).
+    Пользователь из токена содержит только id и признак администратора,
+    его профиль читается из БД один раз за запрос
+    """
+    if current_user is None or not request.state.token_identity:
+        return current_user
+
+    profile = await fetch_user(db, current_user.id)
+    request.state.identity = profile
+    request.state.token_identity = False
+    return profile
+
 async def require_admin(
-        current_user: Optional[User] = Depends(get_current_user)
+        current_user: Optional[User] = Depends(get_current_identity)
 ) -> User:
     """
     Требует, чтобы пользователь был администратором
@@ -70,7 +217,7 @@ async def require_admin(
     return current_user
 
 async def require_auth(
-        current_user: Optional[User] = Depends(get_current_user)
+        current_user: Optional[User] = Depends(get_current_identity)
 ) -> User:
     """
     Требует авторизации (любой пользователь)
@@ -83,21 +230,10 @@ async def require_auth(
     return current_user
 
 async def get_optional_user(
-        request: Request,
-        session_id: Optional[str] = Cookie(None, alias="session_id"),
-        current_user_id: Optional[int] = Cookie(None, alias="user_id"),
-        db: AsyncSession = Depends(get_db)
+        current_user: Optional[User] = Depends(get_current_identity)
 ) -> Optional[User]:
     """
     Dependency для получения пользователя (опционально)
     Возвращает пользователя или None если не авторизован
     """
-    try:
-        # ваш запрос к БД
-        result = await get_current_user(request, session_id, current_user_id, db)
-        return result
-    except Exception as e:
-        await db.rollback()  # обязательно откатываем транзакцию
-        # В случае ошибки возвращаем None
-        print(f"Ошибка при получении пользователя: {e}")
-        return None
\ No newline at end of file
+    return current_user
\ No newline at end of file
@@ -1,35 +1,164 @@
 # services/auth_service.py
 import requests
 import json
+import os
 from typing import Optional, Dict, Any
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
 import aiohttp
 import asyncio
+import time
+from collections import OrderedDict
 
-from models.user import User
 from schemas.user import ExternalUserInfo
 
+# Пул соединений к внешней системе авторизации
+AUTH_CONNECTION_LIMIT = 20
+AUTH_REQUEST_TIMEOUT = 5  # секунд
+AUTH_KEEPALIVE_TIMEOUT = 30  # секунд
+
+# Кэш проверенных сессий
+SESSION_CACHE_TTL = 60  # секунд для действительных сессий
+SESSION_NEGATIVE_TTL = 10  # секунд для недействительных
+SESSION_CACHE_MAX_SIZE = 10000
+# Ответы, которые не говорят о недействительности сессии: повторяем, а не кэшируем отказ
+RETRYABLE_STATUSES = (408, 429)
+
+EXTERNAL_AUTH_URL = os.getenv("EXTERNAL_AUTH_URL", "https://intranet.emk.ru/api/auth_router/check")
+# Проверка session_id во внешней системе; 0 — только для локальной разработки без интранета
+EXTERNAL_AUTH_CHECK = os.getenv("EXTERNAL_AUTH_CHECK", "1") == "1"
+
+
+def external_user_id(user_info: Dict[str, Any]) -> Optional[int]:
+    """ID пользователя из ответа внешней системы"""
+    try:
+        return int(user_info.get("ID") or user_info.get("id"))
+    except (TypeError, ValueError):
+        return None
+
+
 class AuthService:
-    def __init__(self, external_auth_url: str = "https://intranet.emk.ru/api/auth_router/check"):
+    def __init__(self, external_auth_url: str = EXTERNAL_AUTH_URL, enabled: bool = EXTERNAL_AUTH_CHECK):
         self.external_auth_url = external_auth_url
+        self.enabled = enabled
+        self._http: Optional[aiohttp.ClientSession] = None
+        # session_id -> (истекает, данные пользователя или None)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # Запросы, которые уже выполняются: параллельные проверки одной сессии ждут один ответ
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        """Общий HTTP-клиент с keep-alive; создаётся при старте приложения"""
+        if self._http is not None and not self._http.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=AUTH_CONNECTION_LIMIT,
+            keepalive_timeout=AUTH_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        self._http = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=AUTH_REQUEST_TIMEOUT)
+        )
+
+    async def stop(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    def invalidate(self, session_id: str):
+        self._cache.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _cache_get(self, session_id: str):
+        entry = self._cache.get(session_id)
+        if entry is None:
+            return False, None
+        expires_at, user_info = entry
+        if expires_at <= time.monotonic():
+            del self._cache[session_id]
+            return False, None
+        self._cache.move_to_end(session_id)
+        return True, user_info
+
+    def _cache_put(self, session_id: str, user_info: Optional[Dict[str, Any]]):
+        ttl = SESSION_CACHE_TTL if user_info is not None else SESSION_NEGATIVE_TTL
+        self._cache[session_id] = (time.monotonic() + ttl, user_info)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > SESSION_CACHE_MAX_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _fetch_user_info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Запрос к внешней системе; ответ кэшируется, сетевые ошибки — нет"""
+        if self._http is None or self._http.closed:
+            await self.start()
 
-    async def get_user_info(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """
-        Получение информации о пользователе из внешней системы
-        """
         cookies = {'session_id': session_id}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.external_auth_url, cookies=cookies) as response:
-                    if response.status == 200:
-                        return await response.json()
+            async with self._http.get(self.external_auth_url, cookies=cookies) as response:
+                if response.status == 200:
+                    user_info = await response.json()
+                    self._cache_put(session_id, user_info)
+                    return user_info
+                if response.status < 500 and response.status not in RETRYABLE_STATUSES:
+                    # Сессия недействительна — кэшируем отказ на короткое время
+                    self._cache_put(session_id, None)
         except Exception as e:
             print(f"Ошибка при запросе к внешнему API: {e}")
 
         return None
 
+    async def get_user_info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Получение информации о пользователе из внешней системы
+        (через кэш и общий пул соединений)
+        """
+        found, user_info = self._cache_get(session_id)
+        if found:
+            self.hits += 1
+            return user_info
+        self.misses += 1
+
+        inflight = self._inflight.get(session_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(self._fetch_user_info(session_id))
+        self._inflight[session_id] = future
+
+        def forget(_):
+            if self._inflight.get(session_id) is future:
+                del self._inflight[session_id]
+
+        # Запрос доводится до конца, даже если первый ожидающий отменён
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
+
+    async def verify_session(self, session_id: Optional[str], user_id: Any) -> bool:
+        """
+        Сессия действительна во внешней системе и принадлежит пользователю user_id.
+        Без проверки (EXTERNAL_AUTH_CHECK=0) любая пара user_id/session_id принимается как раньше
+        """
+        if not self.enabled:
+            return True
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return False
+        if not session_id:
+            return False
+        user_info = await self.get_user_info(session_id)
+        return user_info is not None and external_user_id(user_info) == user_id
+
     def parse_user_info(self, user_info: Dict[str, Any]) -> ExternalUserInfo:
         """
         Парсинг информации о пользователе из внешней системы
@@ -54,53 +183,5 @@ class AuthService:
             department=user_info.get('uf_department') or user_info.get('UF_DEPARTMENT')
         )
 
-    async def get_or_create_user(
-            self,
-            db: AsyncSession,
-            session_id: str
-    ) -> Optional[User]:
-        """
-        Получение или создание пользователя на основе session_id
-        """
-        # Получаем информацию из внешней системы
-        user_info = await self.get_user_info(session_id)
-        if not user_info:
-            return None
-
-        # Парсим информацию
-        parsed_info = self.parse_user_info(user_info)
-
-        if not parsed_info.external_id:
-            return None
-
-        # Ищем пользователя в нашей БД
-        result = await db.execute(
-            select(User).where(User.id == parsed_info.id)
-        )
-        user = result.scalar_one_or_none()
-
-        if user:
-            # Обновляем последний логин
-            user.last_login = func.now()
-            await db.commit()
-            await db.refresh(user)
-            return user
-
-        # Создаем нового пользователя
-        new_user = User(
-            id=parsed_info.id,
-            full_name=parsed_info.full_name,
-            position=parsed_info.position,
-            department=parsed_info.department,
-            is_admin=False,
-            last_login=func.now()
-        )
-
-        db.add(new_user)
-        await db.commit()
-        await db.refresh(new_user)
-
-        return new_user
-
 # Создаем экземпляр сервиса
 auth_service = AuthService()
\ No newline at end of file
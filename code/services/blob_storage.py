@@ -0,0 +1,217 @@
+# services/blob_storage.py
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Dict, Any, BinaryIO
+
+from fastapi import UploadFile, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+
+from models.blob import Blob
+from services.storage_backends import UPLOAD_ROOT, storage, storage_key
+
+try:
+    import magic
+except ImportError:  # libmagic недоступен — MIME определяется по расширению
+    magic = None
+
+BLOB_DIR = UPLOAD_ROOT / "blobs"
+# Префикс URL файлов: фронтенд добавляет к нему базу API (VITE_API_URL),
+# получается /api/uploads/..., который отдаёт роут uploads
+UPLOAD_URL_PREFIX = "/uploads"
+# Временные файлы загрузок; тот же раздел, что и блобы, чтобы перенос был переименованием
+STAGING_DIR = UPLOAD_ROOT / "staging"
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Предел размера файла /files для любого способа загрузки (обычной, возобновляемой, прямой)
+MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+MIME_SNIFF_SIZE = 2048
+_HEX_PREFIX_RE = re.compile(r"^[0-9a-f]{64}")
+
+
+@dataclass
+class StagedUpload:
+    """
+    Загруженный файл, уже записанный во временный файл в staging,
+    с посчитанными за тот же проход SHA-256, размером и MIME-типом
+    """
+    name: str
+    extension: str
+    sha256: str
+    size: int
+    mime_type: str
+    staged_path: Path
+
+
+def upload_url(path: str) -> str:
+    """URL файла по пути внутри uploads: /uploads/<путь>, как у старых файлов контактов и выставок"""
+    return f"{UPLOAD_URL_PREFIX}/{Path(path).relative_to(UPLOAD_ROOT).as_posix()}"
+
+
+def upload_key(url: str) -> str:
+    """Путь внутри uploads по URL файла (обратное к upload_url)"""
+    return url.removeprefix(UPLOAD_URL_PREFIX + "/").lstrip("/")
+
+
+def sniff_mime_type(head: bytes, name: str) -> str:
+    """MIME-тип по первым байтам (libmagic), без него — по расширению"""
+    if magic is not None and head:
+        try:
+            return magic.from_buffer(head, mime=True)
+        except Exception:
+            pass
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _stage_fileobj(fileobj: BinaryIO, name: str, max_size: int):
+    """
+    Один проход по файлу (выполняется в потоке): чтение частями по STREAM_CHUNK_SIZE,
+    SHA-256, MIME по первой части, проверка размера и запись во временный файл.
+    В памяти одновременно находится не больше одной части
+    """
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    staged_path = STAGING_DIR / f"{uuid.uuid4().hex}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+    fileobj.seek(0)
+    try:
+        with open(staged_path, "wb") as buffer:
+            while True:
+                chunk = fileobj.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    staged_path.unlink()
+                    return None
+                if mime_type is None:
+                    mime_type = sniff_mime_type(chunk[:MIME_SNIFF_SIZE], name)
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        staged_path.unlink(missing_ok=True)
+        raise
+    return digest.hexdigest(), size, mime_type or sniff_mime_type(b"", name), staged_path
+
+
+async def stage_upload(upload: UploadFile, extension: str, max_size: int, name: str = None) -> StagedUpload:
+    """
+    Потоковое сохранение загруженного файла во временный файл с хэшем и MIME-типом,
+    не блокируя event loop; превышение max_size — 400.
+    Временный файл забирает store_blobs (или discard_staged при ошибке)
+    """
+    name = name or upload.filename or "unnamed"
+    staged = await asyncio.to_thread(_stage_fileobj, upload.file, name, max_size)
+    if staged is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Файл слишком большой. Максимальный размер: {max_size // 1024 // 1024}MB"
+        )
+    sha256, size, mime_type, staged_path = staged
+    return StagedUpload(
+        name=name,
+        extension=extension,
+        sha256=sha256,
+        size=size,
+        mime_type=mime_type,
+        staged_path=staged_path
+    )
+
+
+def _discard(paths: List[Path]):
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+async def discard_staged(staged: List[StagedUpload]):
+    """Удаление временных файлов, которые не попали в хранилище"""
+    await asyncio.to_thread(_discard, [item.staged_path for item in staged])
+
+
+async def upsert_blobs(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """
+    Регистрация блобов {sha256, size, path} одним INSERT ... ON CONFLICT.
+    Возвращает строки (sha256, path, inserted): inserted — блоб новый
+    """
+    stmt = insert(Blob).values([{**row, "ref_count": 0} for row in rows])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"updated_at": func.now()}
+    ).returning(Blob.sha256, Blob.path, literal_column("xmax = 0").label("inserted"))
+    return (await db.execute(stmt)).all()
+
+
+def shard_path(directory: Path, filename: str) -> Path:
+    """
+    Двухуровневая раскладка directory/ab/cd/filename, чтобы в одном каталоге
+    не копились сотни тысяч файлов. Уровни берутся из SHA-256 в начале имени
+    (блобы, превью), для остальных имён — из SHA-256 самого имени
+    """
+    match = _HEX_PREFIX_RE.match(filename)
+    digest = match.group(0) if match else hashlib.sha256(filename.encode()).hexdigest()
+    return directory / digest[:2] / digest[2:4] / filename
+
+
+def is_sharded(path: str) -> bool:
+    """Файл уже лежит в раскладке directory/ab/cd/filename"""
+    relative = Path(path).relative_to(UPLOAD_ROOT)
+    return len(relative.parts) >= 4 and shard_path(UPLOAD_ROOT / relative.parts[0], relative.name) == Path(path)
+
+
+def blob_path(sha256: str, extension: str) -> str:
+    return str(shard_path(BLOB_DIR, f"{sha256}{extension}"))
+
+
+async def store_blobs(db: AsyncSession, staged: List[StagedUpload]) -> Dict[str, str]:
+    """
+    Регистрация блобов одним INSERT ... ON CONFLICT; новые блобы переносятся
+    из staging в хранилище (локально — переименованием, без повторного копирования),
+    дубликаты удаляются. Возвращает sha256 -> путь блоба. Коммит выполняет вызывающий код.
+    Строка блоба остаётся заблокированной до коммита, поэтому сборщик мусора
+    не удалит блоб, на который вот-вот сошлётся новая строка files
+    """
+    unique: Dict[str, StagedUpload] = {}
+    for item in staged:
+        unique.setdefault(item.sha256, item)
+    if not unique:
+        return {}
+
+    to_place = []
+    try:
+        rows = await upsert_blobs(db, [
+            {"sha256": item.sha256, "size": item.size, "path": blob_path(item.sha256, item.extension)}
+            for item in unique.values()
+        ])
+        paths = {}
+        for row in rows:
+            paths[row.sha256] = row.path
+            # Повторная загрузка тех же байтов в хранилище не пишется
+            if row.inserted or not await storage.exists(storage_key(row.path)):
+                to_place.append((unique[row.sha256], row.path))
+
+        await asyncio.gather(*[
+            storage.put_file(item.staged_path, storage_key(path), item.mime_type)
+            for item, path in to_place
+        ])
+    finally:
+        await discard_staged(staged)
+    return paths
+
+
+def file_values(item: StagedUpload, blob_path: str) -> Dict[str, Any]:
+    """Значения строки files для загруженного блоба"""
+    return {
+        "name": item.name,
+        "format": item.extension.lstrip(".") or "unknown",
+        "path": blob_path,
+        "url": upload_url(blob_path),
+        "sha256": item.sha256,
+        "mime_type": item.mime_type,
+    }
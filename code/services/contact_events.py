@@ -0,0 +1,255 @@
+# services/contact_events.py
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from typing import List, Optional, Dict, Any, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, any_, bindparam, text, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from models.database import engine
+from models.contact import Contact
+from models.user import User
+from schemas.contact import ContactDetail
+
+EVENT_CREATED = "created"
+EVENT_UPDATED = "updated"
+EVENT_VALIDATED = "validated"
+EVENT_DELETED = "deleted"
+
+SUBSCRIBER_QUEUE_SIZE = 100
+NOTIFY_CHANNEL = "contact_events"
+NOTIFY_MAX_PAYLOAD = 7900  # лимит pg_notify — 8000 байт
+# Для больших массовых операций в событие попадают только ID
+EVENT_MAX_CONTACTS = 100
+# Соединение LISTEN проверяется запросом; при обрыве — переподключение с нарастающей паузой
+LISTEN_KEEPALIVE_INTERVAL = 15  # секунд
+LISTEN_KEEPALIVE_TIMEOUT = 5  # секунд
+LISTEN_RECONNECT_MIN_DELAY = 1  # секунд
+LISTEN_RECONNECT_MAX_DELAY = 60  # секунд
+
+# Все части события уходят одним запросом; NOTIFY доставляется при коммите
+NOTIFY_SQL = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload"
+).bindparams(bindparam("payloads", type_=ARRAY(Text)))
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class ContactEventBroadcaster:
+    """
+    Рассылка событий по контактам подписчикам (SSE-ленты админки) внутри процесса.
+    При CONTACT_EVENTS_PG_NOTIFY=1 события дополнительно передаются через
+    Postgres LISTEN/NOTIFY, чтобы их получали подписчики всех воркеров.
+    NOTIFY отправляется через пул соединений приложения, а отдельное соединение
+    только слушает канал: asyncpg не выполняет две операции на одном соединении одновременно
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE, channel: str = NOTIFY_CHANNEL):
+        self.queue_size = queue_size
+        self.channel = channel
+        # exhibition_id -> очереди подписчиков; None — подписка на все выставки
+        self._subscribers: Dict[Optional[int], Set[asyncio.Queue]] = defaultdict(set)
+        self._origin = uuid.uuid4().hex
+        self._notify_enabled = False
+        self._listen_task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        """Есть ли кому доставлять события (локальные подписчики или другие воркеры)"""
+        return bool(self._subscribers) or self._notify_enabled
+
+    def subscribe(self, exhibition_id: Optional[int] = None) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[exhibition_id].add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, exhibition_id: Optional[int] = None):
+        subscribers = self._subscribers.get(exhibition_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[exhibition_id]
+
+    def _deliver(self, event: Dict[str, Any]):
+        targets = set(self._subscribers.get(event.get("exhibition_id"), ()))
+        if event.get("exhibition_id") is not None:
+            targets |= self._subscribers.get(None, set())
+
+        for queue in targets:
+            if queue.full():
+                # Медленный подписчик теряет самые старые события, а не блокирует запись
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    async def publish(
+            self,
+            event_type: str,
+            exhibition_id: Optional[int],
+            contact_ids: List[int],
+            contacts: Optional[List[Dict[str, Any]]] = None
+    ):
+        """Отправка события подписчикам; вызывается после коммита"""
+        if not contact_ids:
+            return
+
+        event = jsonable_encoder({
+            "type": event_type,
+            "exhibition_id": exhibition_id,
+            "contact_ids": contact_ids,
+            "contacts": contacts or [],
+        })
+        self._deliver(event)
+
+        if self._notify_enabled:
+            try:
+                async with engine.begin() as connection:
+                    await connection.execute(
+                        NOTIFY_SQL,
+                        {"channel": self.channel, "payloads": self._notify_payloads(event)}
+                    )
+            except Exception as e:
+                print(f"❌ Ошибка отправки события в Postgres: {e}")
+
+    def _notify_payloads(self, event: Dict[str, Any]) -> List[str]:
+        """
+        Событие для NOTIFY в пределах NOTIFY_MAX_PAYLOAD байт: целиком, если помещается,
+        иначе только ID, разбитые на столько уведомлений, сколько нужно
+        """
+        payload = _dumps({**event, "origin": self._origin})
+        if len(payload.encode()) <= NOTIFY_MAX_PAYLOAD:
+            return [payload]
+
+        base = {**event, "contacts": [], "origin": self._origin}
+        base_size = len(_dumps({**base, "contact_ids": []}).encode())
+        payloads = []
+        chunk: List[int] = []
+        size = base_size
+        for contact_id in event["contact_ids"]:
+            item_size = len(str(contact_id)) + 1  # число и запятая
+            if chunk and size + item_size > NOTIFY_MAX_PAYLOAD:
+                payloads.append(_dumps({**base, "contact_ids": chunk}))
+                chunk, size = [], base_size
+            chunk.append(contact_id)
+            size += item_size
+        if chunk:
+            payloads.append(_dumps({**base, "contact_ids": chunk}))
+        return payloads
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        # Свои события уже доставлены локально
+        if event.pop("origin", None) == self._origin:
+            return
+        self._deliver(event)
+
+    async def _listen(self, dsn: str):
+        """
+        Соединение LISTEN с переподключением: обрыв обнаруживается проверочным запросом,
+        после чего канал слушается заново. События, отправленные во время обрыва, теряются
+        """
+        import asyncpg
+
+        delay = LISTEN_RECONNECT_MIN_DELAY
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(self.channel, self._on_notify)
+                print("✅ События контактов: LISTEN/NOTIFY подключен")
+                delay = LISTEN_RECONNECT_MIN_DELAY
+                while True:
+                    await asyncio.sleep(LISTEN_KEEPALIVE_INTERVAL)
+                    await asyncio.wait_for(connection.execute("SELECT 1"), LISTEN_KEEPALIVE_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Соединение LISTEN для событий контактов потеряно, повтор через {delay} с: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTEN_RECONNECT_MAX_DELAY)
+
+    async def start(self, dsn: Optional[str] = None):
+        """Подключение к LISTEN/NOTIFY, если оно включено"""
+        if os.getenv("CONTACT_EVENTS_PG_NOTIFY", "0") != "1" or not dsn:
+            return
+
+        self._notify_enabled = True
+        self._listen_task = asyncio.create_task(self._listen(dsn))
+
+    async def stop(self):
+        self._notify_enabled = False
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            await asyncio.gather(self._listen_task, return_exceptions=True)
+            self._listen_task = None
+
+
+def group_by_exhibition(rows) -> Dict[Optional[int], List[int]]:
+    """(contact_id, exhibition_id) -> {exhibition_id: [contact_id, ...]}"""
+    grouped: Dict[Optional[int], List[int]] = defaultdict(list)
+    for contact_id, exhibition_id in rows:
+        grouped[exhibition_id].append(contact_id)
+    return grouped
+
+
+# Общий экземпляр
+contact_events = ContactEventBroadcaster()
+
+
+async def publish_contacts(db: AsyncSession, event_type: str, contact_ids: List[int]):
+    """
+    Событие по созданным / изменённым контактам после коммита.
+    Строки с ФИО автора читаются одним запросом и только если есть подписчики
+    """
+    contact_ids = [contact_id for contact_id in contact_ids if contact_id is not None]
+    if not contact_ids or not contact_events.active:
+        return
+
+    ids_param = bindparam("event_contact_ids", contact_ids, type_=ARRAY(Integer))
+
+    if len(contact_ids) > EVENT_MAX_CONTACTS:
+        result = await db.execute(
+            select(Contact.id, Contact.exhibition_id).where(Contact.id == any_(ids_param))
+        )
+        for exhibition_id, ids in group_by_exhibition(result.all()).items():
+            await contact_events.publish(event_type, exhibition_id, ids)
+        return
+
+    result = await db.execute(
+        select(*Contact.__table__.columns, User.full_name.label("author"))
+        .outerjoin(User, User.id == Contact.author_id)
+        .where(Contact.id == any_(ids_param))
+        .order_by(Contact.id)
+    )
+    contacts_by_exhibition: Dict[Optional[int], List[Dict[str, Any]]] = defaultdict(list)
+    for row in result.all():
+        contact = ContactDetail.model_validate(dict(row._mapping)).model_dump(mode="json", exclude={"files"})
+        contacts_by_exhibition[contact["exhibition_id"]].append(contact)
+
+    for exhibition_id, contacts in contacts_by_exhibition.items():
+        await contact_events.publish(
+            event_type, exhibition_id, [contact["id"] for contact in contacts], contacts
+        )
+
+
+async def publish_deleted(rows):
+    """Событие об удалении по строкам (contact_id, exhibition_id)"""
+    for exhibition_id, ids in group_by_exhibition(rows).items():
+        await contact_events.publish(EVENT_DELETED, exhibition_id, ids)
@@ -0,0 +1,194 @@
+# services/contact_import.py
+import asyncio
+import codecs
+import csv
+import io
+from itertools import islice
+from typing import List, Optional, Dict, Any, Iterator, Tuple, BinaryIO
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.contact_ingest import ingest_contacts, created_contact_ids, STATUS_DUPLICATE, STATUS_ERROR
+from services.contact_events import publish_contacts, EVENT_CREATED
+
+IMPORT_CHUNK_SIZE = 1000  # строк на одну вставку/коммит
+MAX_REPORTED_ERRORS = 1000  # ограничиваем размер отчёта
+CSV_SNIFF_SIZE = 64 * 1024
+
+# Заголовки колонок -> поля ContactImport
+HEADER_ALIASES = {
+    "title": "title", "компания": "title", "организация": "title", "название": "title",
+    "description": "description", "описание": "description", "комментарий": "description",
+    "full_name": "full_name", "фио": "full_name", "имя": "full_name",
+    "position": "position", "должность": "position",
+    "email": "email", "e-mail": "email", "почта": "email",
+    "phone_number": "phone_number", "phone": "phone_number", "телефон": "phone_number",
+    "city": "city", "город": "city",
+    "exhibition_id": "exhibition_id",
+}
+
+
+def _map_header(header: List[Any]) -> List[Optional[str]]:
+    return [
+        HEADER_ALIASES.get(str(name).strip().lower()) if name is not None else None
+        for name in header
+    ]
+
+
+def _cell_to_str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    # Телефоны в XLSX часто хранятся числами: 79120000000.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _build_row(fields: List[Optional[str]], values) -> Dict[str, Any]:
+    row = {}
+    for field, value in zip(fields, values):
+        value = _cell_to_str(value)
+        if field and value is not None:
+            row[field] = value
+    return row
+
+
+def detect_csv_encoding(fileobj: BinaryIO) -> str:
+    """
+    Кодировка CSV: UTF-8 (с BOM или без), иначе cp1251 — так сохраняет CSV русский Excel.
+    Файл проверяется целиком потоковым декодером, после проверки позиция возвращается в начало
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            data = fileobj.read(CSV_SNIFF_SIZE)
+            if not data:
+                decoder.decode(b"", final=True)
+                return "utf-8-sig"
+            decoder.decode(data)
+    except UnicodeDecodeError:
+        return "cp1251"
+    finally:
+        fileobj.seek(0)
+
+
+def iter_csv_rows(fileobj: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Потоковое чтение CSV, возвращает (номер строки, данные)"""
+    text = io.TextIOWrapper(fileobj, encoding=detect_csv_encoding(fileobj), newline="")
+    sample = text.read(CSV_SNIFF_SIZE)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    fields = _map_header(header)
+
+    for row_number, values in enumerate(reader, start=2):
+        row = _build_row(fields, values)
+        if row:
+            yield row_number, row
+
+
+def iter_xlsx_rows(fileobj: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Потоковое чтение XLSX (openpyxl read_only), возвращает (номер строки, данные)"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        fields = _map_header(list(header))
+
+        for row_number, values in enumerate(rows, start=2):
+            row = _build_row(fields, values)
+            if row:
+                yield row_number, row
+    finally:
+        wb.close()
+
+
+def _next_chunk(rows: Iterator, size: int) -> List[Tuple[int, Dict[str, Any]]]:
+    return list(islice(rows, size))
+
+
+async def import_contacts(
+        db: AsyncSession,
+        fileobj: BinaryIO,
+        file_format: str,
+        default_exhibition_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Импорт контактов из CSV/XLSX пачками по chunk_size строк.
+    Разбор файла выполняется в потоке, в памяти держится только текущая пачка.
+
+    Каждая пачка коммитится отдельно. Если пачка не записалась или файл дальше
+    не читается, импорт останавливается: уже закоммиченные строки остаются,
+    а отчёт содержит обработанный диапазон (processed_rows) и место сбоя (failed_rows)
+    """
+    rows = iter_xlsx_rows(fileobj) if file_format == "xlsx" else iter_csv_rows(fileobj)
+
+    report = {"total": 0, "created": 0, "duplicate": 0, "error": 0,
+              "errors": [], "errors_truncated": False,
+              "completed": False, "processed_rows": None, "failed_rows": None}
+    # Последняя строка файла в последней закоммиченной пачке
+    last_committed_row = 1
+
+    while True:
+        chunk = None
+        try:
+            chunk = await asyncio.to_thread(_next_chunk, rows, chunk_size)
+            if not chunk:
+                break
+
+            items = await ingest_contacts(
+                db,
+                [row for _, row in chunk],
+                default_exhibition_id=default_exhibition_id,
+                author_id=author_id
+            )
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            if report["processed_rows"] is None:
+                # Ничего не записано — обычная ошибка запроса
+                raise
+            report["failed_rows"] = {
+                "from_row": last_committed_row + 1,
+                # Пачка не прочиталась целиком — известно только начало
+                "to_row": chunk[-1][0] if chunk else None,
+                "detail": str(e),
+            }
+            return report
+
+        row_numbers = [row_number for row_number, _ in chunk]
+        last_committed_row = row_numbers[-1]
+        report["processed_rows"] = {"from_row": 2, "to_row": last_committed_row}
+        await publish_contacts(db, EVENT_CREATED, created_contact_ids(items))
+
+        for item in items:
+            report["total"] += 1
+            report[item["status"]] += 1
+            if item["status"] not in (STATUS_ERROR, STATUS_DUPLICATE):
+                continue
+            if len(report["errors"]) >= MAX_REPORTED_ERRORS:
+                report["errors_truncated"] = True
+                continue
+            report["errors"].append({
+                "row": row_numbers[item["index"]],
+                "status": item["status"],
+                "duplicate_fields": item["duplicate_fields"],
+                "errors": item["errors"],
+            })
+
+    report["completed"] = True
+    return report
@@ -0,0 +1,198 @@
+# services/contact_ingest.py
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, or_, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import String, Integer
+
+from models.contact import Contact
+from models.exhibition import Exhibition
+from schemas.contact import ContactImport
+from services.normalization import normalized_contact_fields
+
+# Поля, которые вставляются при массовом создании (у всех строк одинаковый набор ключей)
+INSERT_FIELDS = (
+    "title", "description", "full_name", "position", "email", "phone_number",
+    "city", "questionnaire", "exhibition_id", "author_id",
+    "email_normalized", "phone_normalized",
+)
+
+STATUS_CREATED = "created"
+STATUS_DUPLICATE = "duplicate"
+STATUS_ERROR = "error"
+
+
+def _validation_errors(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(loc) for loc in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    ]
+
+
+def _duplicate_keys(contact: Dict[str, Any]) -> List[Tuple[str, Tuple[Any, str]]]:
+    keys = []
+    if contact["email_normalized"]:
+        keys.append(("email", (contact["exhibition_id"], contact["email_normalized"])))
+    if contact["phone_normalized"]:
+        keys.append(("phone_number", (contact["exhibition_id"], contact["phone_normalized"])))
+    return keys
+
+
+async def _find_existing_keys(
+        db: AsyncSession,
+        contacts: List[Dict[str, Any]]
+) -> Dict[Tuple[str, Tuple[Any, str]], Optional[int]]:
+    """Один запрос на поиск дубликатов для всей пачки, возвращает ключ -> ID существующего контакта"""
+    exhibition_ids = {c["exhibition_id"] for c in contacts if c["exhibition_id"] is not None}
+    emails = list({c["email_normalized"] for c in contacts if c["email_normalized"]})
+    phones = list({c["phone_normalized"] for c in contacts if c["phone_normalized"]})
+
+    if not emails and not phones:
+        return {}
+
+    value_conditions = []
+    if emails:
+        value_conditions.append(
+            Contact.email_normalized == any_(bindparam("emails", emails, type_=ARRAY(String)))
+        )
+    if phones:
+        value_conditions.append(
+            Contact.phone_normalized == any_(bindparam("phones", phones, type_=ARRAY(String)))
+        )
+
+    exhibition_conditions = []
+    if exhibition_ids:
+        exhibition_conditions.append(
+            Contact.exhibition_id == any_(bindparam("exhibition_ids", list(exhibition_ids), type_=ARRAY(Integer)))
+        )
+    if any(c["exhibition_id"] is None for c in contacts):
+        exhibition_conditions.append(Contact.exhibition_id.is_(None))
+
+    result = await db.execute(
+        select(Contact.id, Contact.exhibition_id, Contact.email_normalized, Contact.phone_normalized)
+        .where(or_(*exhibition_conditions), or_(*value_conditions))
+        .order_by(Contact.id)
+    )
+
+    existing = {}
+    for row in result.all():
+        if row.email_normalized:
+            existing.setdefault(("email", (row.exhibition_id, row.email_normalized)), row.id)
+        if row.phone_normalized:
+            existing.setdefault(("phone_number", (row.exhibition_id, row.phone_normalized)), row.id)
+    return existing
+
+
+async def _find_missing_exhibitions(db: AsyncSession, exhibition_ids: set) -> set:
+    if not exhibition_ids:
+        return set()
+    result = await db.execute(
+        select(Exhibition.id).where(Exhibition.id.in_(exhibition_ids))
+    )
+    return exhibition_ids - set(result.scalars().all())
+
+
+async def ingest_contacts(
+        db: AsyncSession,
+        rows: Iterable[Dict[str, Any]],
+        default_exhibition_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+        start_index: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Массовое создание контактов без запросов на каждую строку:
+    валидация по ContactImport, один запрос на дубликаты для всей пачки
+    и многострочный INSERT ... RETURNING.
+    Возвращает отчёт по каждой строке (created / duplicate / error).
+    Коммит выполняет вызывающий код.
+    """
+    report: List[Dict[str, Any]] = []
+    candidates: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+
+    # Валидация и подготовка строк
+    for index, row in enumerate(rows, start=start_index):
+        item = {"index": index, "status": STATUS_CREATED, "contact_id": None,
+                "duplicate_fields": [], "errors": []}
+        report.append(item)
+        try:
+            contact_data = ContactImport.model_validate(row)
+        except ValidationError as e:
+            item["status"] = STATUS_ERROR
+            item["errors"] = _validation_errors(e)
+            continue
+
+        contact = contact_data.model_dump()
+        contact["email"] = contact["email"].lower()
+        if contact["exhibition_id"] is None:
+            contact["exhibition_id"] = default_exhibition_id
+        contact["author_id"] = author_id
+        contact.update(normalized_contact_fields(contact))
+        candidates.append((item, {field: contact.get(field) for field in INSERT_FIELDS}))
+
+    if not candidates:
+        return report
+
+    # Проверяем существование указанных выставок
+    missing_exhibitions = await _find_missing_exhibitions(
+        db, {c["exhibition_id"] for _, c in candidates if c["exhibition_id"] is not None}
+    )
+
+    # Дубликаты в БД и внутри самой пачки
+    existing_keys = await _find_existing_keys(db, [c for _, c in candidates])
+
+    to_insert: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    duplicate_of: List[Tuple[Dict[str, Any], Tuple[str, Tuple[Any, str]]]] = []
+    for item, contact in candidates:
+        if contact["exhibition_id"] in missing_exhibitions:
+            item["status"] = STATUS_ERROR
+            item["errors"] = [f"Выставка {contact['exhibition_id']} не найдена"]
+            continue
+
+        keys = _duplicate_keys(contact)
+        duplicate_fields = [field for field, key in keys if (field, key) in existing_keys]
+        if duplicate_fields:
+            item["status"] = STATUS_DUPLICATE
+            item["duplicate_fields"] = duplicate_fields
+            # ID существующего контакта (для дубликатов внутри пачки он известен после вставки)
+            matched_key = (duplicate_fields[0], dict(keys)[duplicate_fields[0]])
+            item["contact_id"] = existing_keys[matched_key]
+            duplicate_of.append((item, matched_key))
+            continue
+
+        for key in keys:
+            existing_keys[key] = None
+        to_insert.append((item, contact))
+
+    if not to_insert:
+        return report
+
+    # Многострочная вставка, id возвращаются в порядке параметров
+    result = await db.execute(
+        insert(Contact).returning(Contact.id, sort_by_parameter_order=True),
+        [contact for _, contact in to_insert]
+    )
+    for (item, contact), contact_id in zip(to_insert, result.scalars().all()):
+        item["contact_id"] = contact_id
+        for key in _duplicate_keys(contact):
+            existing_keys[key] = contact_id
+
+    # Дубликаты строк этой же пачки ссылаются на только что созданные контакты
+    for item, key in duplicate_of:
+        if item["contact_id"] is None:
+            item["contact_id"] = existing_keys.get(key)
+
+    return report
+
+
+def created_contact_ids(items: List[Dict[str, Any]]) -> List[int]:
+    """ID контактов, созданных по отчёту"""
+    return [item["contact_id"] for item in items if item["status"] == STATUS_CREATED]
+
+
+def summarize_report(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Счётчики по статусам отчёта"""
+    summary = {"total": len(items), STATUS_CREATED: 0, STATUS_DUPLICATE: 0, STATUS_ERROR: 0}
+    for item in items:
+        summary[item["status"]] += 1
+    return summary
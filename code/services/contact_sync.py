@@ -0,0 +1,144 @@
+# services/contact_sync.py
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, tuple_, text
+
+from models.contact import Contact, ContactTombstone
+from models.user import User
+
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 5000
+# Строки моложе этого интервала не отдаются: транзакция, начатая раньше,
+# может закоммитить более ранний updated_at уже после выдачи водяного знака
+SYNC_SAFETY_LAG = timedelta(seconds=5)
+
+# Верхняя граница окна по часам БД, а не приложения: updated_at ставит now() БД
+# (время начала транзакции). Граница не позже начала самой старой открытой транзакции
+# других сессий — она ещё может закоммитить строки с более ранним updated_at
+SYNC_UPPER_BOUND_SQL = text("""
+    SELECT LEAST(
+        clock_timestamp() - :lag,
+        (
+            SELECT min(xact_start) FROM pg_stat_activity
+            WHERE datname = current_database()
+              AND pid <> pg_backend_pid()
+              AND backend_type = 'client backend'
+              AND xact_start IS NOT NULL
+        )
+    )
+""")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+Position = Tuple[datetime, int]
+
+
+class InvalidWatermark(ValueError):
+    pass
+
+
+def encode_watermark(contacts_position: Position, tombstones_position: Position) -> str:
+    """Непрозрачный для клиента водяной знак: позиции (updated_at, id) обоих потоков"""
+    payload = {
+        "c": [contacts_position[0].isoformat(), contacts_position[1]],
+        "t": [tombstones_position[0].isoformat(), tombstones_position[1]],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_watermark(watermark: Optional[str]) -> Tuple[Position, Position]:
+    if not watermark:
+        return (_EPOCH, 0), (_EPOCH, 0)
+    try:
+        padded = watermark + "=" * (-len(watermark) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (
+            (datetime.fromisoformat(payload["c"][0]), int(payload["c"][1])),
+            (datetime.fromisoformat(payload["t"][0]), int(payload["t"][1])),
+        )
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise InvalidWatermark(str(e))
+
+
+async def fetch_changes(
+        db: AsyncSession,
+        watermark: Optional[str],
+        limit: int = SYNC_DEFAULT_LIMIT,
+        exhibition_id: Optional[int] = None,
+        author_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Контакты и отметки об удалении, изменившиеся после водяного знака.
+    author_id ограничивает выборку контактами пользователя (не администратора)
+    """
+    contacts_position, tombstones_position = decode_watermark(watermark)
+    upper_bound = (await db.execute(SYNC_UPPER_BOUND_SQL, {"lag": SYNC_SAFETY_LAG})).scalar_one()
+
+    # Изменённые контакты
+    query = (
+        select(*Contact.__table__.columns, User.full_name.label("author"))
+        .outerjoin(User, User.id == Contact.author_id)
+        .where(
+            tuple_(Contact.updated_at, Contact.id) > tuple_(*contacts_position),
+            Contact.updated_at < upper_bound
+        )
+        .order_by(Contact.updated_at, Contact.id)
+        .limit(limit + 1)
+    )
+    if exhibition_id:
+        query = query.where(Contact.exhibition_id == exhibition_id)
+    if author_id is not None:
+        query = query.where(Contact.author_id == author_id)
+
+    contact_rows = (await db.execute(query)).all()
+    contacts_more = len(contact_rows) > limit
+    contact_rows = contact_rows[:limit]
+    if contact_rows:
+        contacts_position = (contact_rows[-1].updated_at, contact_rows[-1].id)
+
+    # Удалённые контакты
+    tombstone_query = (
+        select(ContactTombstone)
+        .where(
+            tuple_(ContactTombstone.deleted_at, ContactTombstone.id) > tuple_(*tombstones_position),
+            ContactTombstone.deleted_at < upper_bound
+        )
+        .order_by(ContactTombstone.deleted_at, ContactTombstone.id)
+        .limit(limit + 1)
+    )
+    if exhibition_id:
+        tombstone_query = tombstone_query.where(ContactTombstone.exhibition_id == exhibition_id)
+    if author_id is not None:
+        tombstone_query = tombstone_query.where(ContactTombstone.author_id == author_id)
+
+    tombstones = (await db.execute(tombstone_query)).scalars().all()
+    tombstones_more = len(tombstones) > limit
+    tombstones = tombstones[:limit]
+    if tombstones:
+        tombstones_position = (tombstones[-1].deleted_at, tombstones[-1].id)
+
+    return {
+        "contacts": [dict(row._mapping) for row in contact_rows],
+        "tombstones": [
+            {
+                "contact_id": tombstone.contact_id,
+                "exhibition_id": tombstone.exhibition_id,
+                "deleted_at": tombstone.deleted_at,
+            }
+            for tombstone in tombstones
+        ],
+        "watermark": encode_watermark(contacts_position, tombstones_position),
+        "has_more": contacts_more or tombstones_more,
+    }
+
+
+def tombstones_from_select(conditions: list):
+    """INSERT ... SELECT отметок об удалении для контактов, подходящих под условия"""
+    return insert(ContactTombstone).from_select(
+        ["contact_id", "exhibition_id", "author_id"],
+        select(Contact.id, Contact.exhibition_id, Contact.author_id).where(*conditions)
+    )
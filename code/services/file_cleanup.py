@@ -0,0 +1,135 @@
+# services/file_cleanup.py
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterable
+
+CLEANUP_BATCH_SIZE = 100
+CLEANUP_MAX_RETRIES = 3
+CLEANUP_RETRY_DELAY = 2.0  # секунд, растёт с каждой попыткой
+MAX_STORED_JOBS = 1000
+
+
+def _unlink_batch(paths: List[str]) -> Dict[str, Any]:
+    """Удаление пачки файлов (выполняется в потоке, не блокирует event loop)"""
+    result = {"deleted": 0, "missing": 0, "reclaimed_bytes": 0, "failed": []}
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+            os.unlink(path)
+        except FileNotFoundError:
+            result["missing"] += 1
+        except OSError:
+            result["failed"].append(path)
+        else:
+            result["deleted"] += 1
+            result["reclaimed_bytes"] += size
+    return result
+
+
+class FileCleanupWorker:
+    """
+    Фоновое удаление файлов с диска.
+    Роуты ставят пути в очередь и сразу отвечают, удаление идёт пачками
+    в отдельном потоке с повторами при ошибках
+    """
+
+    def __init__(
+            self,
+            batch_size: int = CLEANUP_BATCH_SIZE,
+            max_retries: int = CLEANUP_MAX_RETRIES,
+            retry_delay: float = CLEANUP_RETRY_DELAY
+    ):
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def enqueue(self, paths: Iterable[str]) -> Optional[str]:
+        """Поставить файлы в очередь на удаление, возвращает id задачи"""
+        paths = [str(path) for path in paths if path]
+        if not paths:
+            return None
+
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "id": job_id,
+            "status": "queued",
+            "total": len(paths),
+            "deleted": 0,
+            "missing": 0,
+            "failed": 0,
+            "reclaimed_bytes": 0,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+        }
+        while len(self._jobs) > MAX_STORED_JOBS:
+            self._jobs.popitem(last=False)
+
+        self._get_queue().put_nowait((job_id, paths))
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def _process(self, job_id: str, paths: List[str]):
+        job = self._jobs.get(job_id, {})
+        job["status"] = "running"
+
+        for start in range(0, len(paths), self.batch_size):
+            pending = paths[start:start + self.batch_size]
+            for attempt in range(self.max_retries + 1):
+                result = await asyncio.to_thread(_unlink_batch, pending)
+                job["deleted"] = job.get("deleted", 0) + result["deleted"]
+                job["missing"] = job.get("missing", 0) + result["missing"]
+                job["reclaimed_bytes"] = job.get("reclaimed_bytes", 0) + result["reclaimed_bytes"]
+                pending = result["failed"]
+                if not pending or attempt == self.max_retries:
+                    break
+                await asyncio.sleep(self.retry_delay * (attempt + 1))
+
+            if pending:
+                job["failed"] = job.get("failed", 0) + len(pending)
+                print(f"❌ Не удалось удалить файлы: {pending}")
+
+        job["status"] = "done"
+        job["finished_at"] = datetime.now().isoformat()
+
+    async def _run(self):
+        queue = self._get_queue()
+        while True:
+            job_id, paths = await queue.get()
+            try:
+                await self._process(job_id, paths)
+            except Exception as e:
+                print(f"❌ Ошибка фоновой очистки файлов: {e}")
+            finally:
+                queue.task_done()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Дожидаемся обработки очереди и останавливаем воркер"""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._get_queue().join(), timeout)
+        except asyncio.TimeoutError:
+            print("⚠️ Очередь удаления файлов не обработана до конца")
+        self._task.cancel()
+        self._task = None
+
+
+# Общий экземпляр воркера
+file_cleanup = FileCleanupWorker()
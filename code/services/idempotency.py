@@ -0,0 +1,161 @@
+# services/idempotency.py
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Any, Dict
+
+from fastapi import Request, UploadFile, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+
+from models.database import AsyncSessionLocal
+from models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_TTL = timedelta(hours=24)
+PURGE_INTERVAL = 60 * 60  # секунд
+
+# Заголовок ответа, по которому клиент видит, что ответ взят из сохранённых
+REPLAY_HEADER = "Idempotent-Replayed"
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def idempotency_scope(request: Request, user_id: Optional[int] = None) -> str:
+    """
+    Область действия ключа: метод, путь и пользователь.
+    Тот же ключ другого пользователя — другая запись, чужой ответ не возвращается
+    """
+    return f"{request.method} {request.url.path} user:{user_id or '-'}"
+
+
+def request_hash(body: Any) -> str:
+    """SHA-256 канонического JSON тела запроса (порядок ключей не важен)"""
+    data = json.dumps(jsonable_encoder(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _file_digest(upload: UploadFile) -> str:
+    digest = hashlib.sha256()
+    upload.file.seek(0)
+    while True:
+        data = upload.file.read(HASH_CHUNK_SIZE)
+        if not data:
+            break
+        digest.update(data)
+    upload.file.seek(0)
+    return digest.hexdigest()
+
+
+async def multipart_request_hash(fields: Dict[str, Any], files: Dict[str, Optional[UploadFile]]) -> str:
+    """
+    Хэш multipart-запроса: поля формы и SHA-256 содержимого файлов.
+    Сырое тело не подходит — граница multipart меняется при каждом повторе
+    """
+    digests = {}
+    for name, upload in files.items():
+        if upload is not None:
+            digests[name] = await asyncio.to_thread(_file_digest, upload)
+    return request_hash({"fields": fields, "files": digests})
+
+
+async def get_idempotent_response(
+        db: AsyncSession,
+        key: Optional[str],
+        scope: str,
+        body_hash: Optional[str] = None
+) -> Optional[JSONResponse]:
+    """
+    Сохранённый ответ по ключу (один запрос по уникальному индексу).
+    Ключ, повторённый с другим телом запроса, — 422
+    """
+    if not key:
+        return None
+
+    result = await db.execute(
+        select(IdempotencyKey.status_code, IdempotencyKey.response_body, IdempotencyKey.request_hash)
+        .where(
+            IdempotencyKey.key == key,
+            IdempotencyKey.scope == scope,
+            IdempotencyKey.expires_at > func.now()
+        )
+    )
+    stored = result.first()
+    if stored is None:
+        return None
+
+    # Записи, сохранённые до появления хэша, сравнить не с чем
+    if stored.request_hash is not None and stored.request_hash != body_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key уже использован для запроса с другим телом"
+        )
+
+    return JSONResponse(
+        status_code=stored.status_code,
+        content=stored.response_body,
+        headers={REPLAY_HEADER: "true"}
+    )
+
+
+async def store_idempotent_response(
+        db: AsyncSession,
+        key: Optional[str],
+        scope: str,
+        status_code: int,
+        body: Any,
+        body_hash: Optional[str] = None
+) -> bool:
+    """
+    Сохранение ответа в той же транзакции, что и сама запись.
+    Возвращает False, если ключ уже занят параллельным запросом —
+    тогда вызывающий код должен откатить транзакцию и вернуть сохранённый ответ
+    """
+    if not key:
+        return True
+
+    stmt = insert(IdempotencyKey).values(
+        key=key,
+        scope=scope,
+        request_hash=body_hash,
+        status_code=status_code,
+        response_body=jsonable_encoder(body),
+        expires_at=datetime.now(timezone.utc) + IDEMPOTENCY_TTL
+    )
+    # Просроченный ключ можно переиспользовать
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_idempotency_keys_key_scope",
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": stmt.excluded.status_code,
+            "response_body": stmt.excluded.response_body,
+            "created_at": func.now(),
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=IdempotencyKey.expires_at <= func.now()
+    ).returning(IdempotencyKey.id)
+
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none() is not None
+
+
+async def purge_expired_keys() -> int:
+    """Удаление просроченных ключей"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now())
+        )
+        await session.commit()
+        return result.rowcount
+
+
+async def purge_expired_keys_periodically(interval: float = PURGE_INTERVAL):
+    """Фоновая задача: периодическая очистка просроченных ключей"""
+    while True:
+        try:
+            await purge_expired_keys()
+        except Exception as e:
+            print(f"❌ Ошибка очистки ключей идемпотентности: {e}")
+        await asyncio.sleep(interval)
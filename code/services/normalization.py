@@ -0,0 +1,48 @@
+# services/normalization.py
+import re
+from typing import Optional, Dict, Any
+
+DEFAULT_COUNTRY_CODE = "7"  # Россия: 8XXXXXXXXXX и XXXXXXXXXX приводятся к +7XXXXXXXXXX
+E164_MAX_DIGITS = 15
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Email в нижнем регистре без пробелов по краям"""
+    if not email:
+        return None
+    email = email.strip().lower()
+    return email or None
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    Приведение номера телефона к формату E.164 (+79120000000)
+    "+7 (912) 000-00-00" и "89120000000" дают одинаковый результат
+    """
+    if not phone:
+        return None
+
+    digits = _NON_DIGITS.sub("", phone)
+    if not digits:
+        return None
+
+    has_plus = phone.lstrip().startswith("+")
+    if not has_plus:
+        if len(digits) == 11 and digits.startswith("8"):
+            digits = DEFAULT_COUNTRY_CODE + digits[1:]
+        elif len(digits) == 10:
+            digits = DEFAULT_COUNTRY_CODE + digits
+
+    return "+" + digits[:E164_MAX_DIGITS]
+
+
+def normalized_contact_fields(contact_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Нормализованные поля для сохранения вместе с контактом"""
+    fields = {}
+    if "email" in contact_data:
+        fields["email_normalized"] = normalize_email(contact_data["email"])
+    if "phone_number" in contact_data:
+        fields["phone_normalized"] = normalize_phone(contact_data["phone_number"])
+    return fields
@@ -0,0 +1,469 @@
+# services/orphan_gc.py
+"""
+Сборщик мусора файлов: сверяет записи files, связи contact_file_associations,
+блобы и дерево uploads и удаляет то, на что больше ничего не ссылается.
+
+Работает пачками по GC_BATCH_SIZE: записи перебираются окнами по первичному ключу,
+дерево uploads обходится потоково в порядке путей, поэтому за один шаг не читается
+больше одной пачки. Позиция каждого шага сохраняется в orphan_gc_cursors: следующий
+запуск продолжает с неё, дойдя до конца — проходит от начала до точки старта,
+поэтому запуски с --max-batches вместе обходят всё.
+Объекты моложе GC_GRACE_PERIOD не трогаются: файл мог быть только что загружен
+и ещё не привязан к контакту или выставке.
+
+Запуск вручную (из каталога code):
+    python -m services.orphan_gc --dry-run
+    python -m services.orphan_gc --batch-size 500 --max-batches 20
+"""
+import argparse
+import asyncio
+import os
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from itertools import islice, takewhile
+from pathlib import Path
+from typing import List, Tuple, Dict, Any, Iterator, AsyncIterator, Optional
+
+from sqlalchemy import select, delete, exists, and_, or_, func, any_, bindparam, text, Integer, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import AsyncSessionLocal
+from models.file import File as FileModel
+from models.blob import Blob
+from models.contact import contact_file_association
+from models.exhibition import Exhibition
+from services.blob_storage import UPLOAD_ROOT, BLOB_DIR, STAGING_DIR, shard_path, upload_url, upload_key
+from services.storage_backends import storage, storage_key
+from services.thumbnails import THUMBNAIL_DIR, THUMBNAIL_SIZES
+
+GC_BATCH_SIZE = 1000
+GC_GRACE_PERIOD = timedelta(hours=int(os.getenv("ORPHAN_GC_GRACE_HOURS", str(7 * 24))))
+# Периодический запуск из приложения; 0 — только вручную
+ORPHAN_GC_INTERVAL = int(os.getenv("ORPHAN_GC_INTERVAL", "0"))  # секунд
+# Каталоги uploads с собственной очисткой
+SKIP_DIRS = {"resumable"}
+THUMBNAIL_EXTENSIONS = (".webp", ".jpg")
+
+
+@dataclass
+class GCReport:
+    dry_run: bool
+    associations: int = 0
+    files: int = 0
+    blobs: int = 0
+    disk_files: int = 0
+    reclaimed_bytes: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def unreferenced_file_condition():
+    """Файл не привязан ни к контакту, ни к выставке"""
+    return and_(
+        ~exists().where(contact_file_association.c.file_id == FileModel.id),
+        ~exists().where(Exhibition.preview_file_id == FileModel.id)
+    )
+
+
+async def delete_unreferenced_files(db: AsyncSession, file_ids: List[int]) -> Tuple[int, List[str]]:
+    """
+    Удаление записей файлов из file_ids, которые больше ни к чему не привязаны.
+    Возвращает количество удалённых записей и пути старых (не блобовых) файлов
+    для фоновой очистки диска; счётчики ссылок блобов уменьшает триггер
+    """
+    file_ids = [file_id for file_id in file_ids if file_id is not None]
+    if not file_ids:
+        return 0, []
+
+    result = await db.execute(
+        delete(FileModel)
+        .where(
+            FileModel.id == any_(bindparam("file_ids", file_ids, type_=ARRAY(Integer))),
+            unreferenced_file_condition()
+        )
+        .returning(FileModel.path, FileModel.sha256)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    return len(rows), [row.path for row in rows if row.sha256 is None]
+
+
+def _remove_paths(paths: List[str], dry_run: bool) -> Tuple[int, int]:
+    """Удаление файлов с диска (выполняется в потоке): количество и освобождённые байты"""
+    removed = 0
+    reclaimed = 0
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+            if not dry_run:
+                os.unlink(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        reclaimed += size
+    return removed, reclaimed
+
+
+def blob_storage_keys(sha256: str, path: str) -> List[str]:
+    """Ключи содержимого блоба и всех его возможных превью (в плоской и шардированной раскладке)"""
+    keys = [storage_key(path)]
+    for size in THUMBNAIL_SIZES:
+        for extension in THUMBNAIL_EXTENSIONS:
+            filename = f"{sha256}_{size}{extension}"
+            keys.append(storage_key(str(THUMBNAIL_DIR / filename)))
+            keys.append(storage_key(str(shard_path(THUMBNAIL_DIR, filename))))
+    return keys
+
+
+async def load_cursor(name: str) -> Optional[str]:
+    """Сохранённая позиция шага сборки мусора или None — с начала"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("SELECT value FROM orphan_gc_cursors WHERE name = :name"), {"name": name})
+        return result.scalar_one_or_none()
+
+
+async def store_cursor(name: str, value: Optional[str]):
+    """Сохранение позиции шага; None — следующий запуск начнёт с начала"""
+    async with AsyncSessionLocal() as db:
+        if value is None:
+            await db.execute(text("DELETE FROM orphan_gc_cursors WHERE name = :name"), {"name": name})
+        else:
+            await db.execute(
+                text(
+                    "INSERT INTO orphan_gc_cursors (name, value) VALUES (:name, :value) "
+                    "ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, updated_at = now()"
+                ),
+                {"name": name, "value": value}
+            )
+        await db.commit()
+
+
+async def key_windows(
+        name: str,
+        column,
+        initial,
+        batch_size: int,
+        max_batches: Optional[int],
+        save: bool
+) -> AsyncIterator[list]:
+    """
+    Окна значений column по batch_size, начиная с сохранённой позиции шага name.
+    Дойдя до конца, обход идёт от начала до точки старта и позиция сбрасывается.
+    Позиция сохраняется после обработки каждого окна (если save)
+    """
+    saved = await load_cursor(name)
+    start = initial if saved is None else type(initial)(saved)
+    cursor, upper = start, None
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        conditions = [column > cursor]
+        if upper is not None:
+            conditions.append(column <= upper)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(column).where(*conditions).order_by(column).limit(batch_size))
+            window = result.scalars().all()
+        if not window:
+            if upper is None and start != initial:
+                cursor, upper = initial, start
+                continue
+            if save:
+                await store_cursor(name, None)
+            return
+
+        yield window
+        cursor = window[-1]
+        batches += 1
+        if save:
+            await store_cursor(name, str(cursor))
+
+
+async def collect_associations(report: GCReport):
+    """Связи без контакта или без файла (колонки допускают NULL)"""
+    condition = or_(
+        contact_file_association.c.contact_id.is_(None),
+        contact_file_association.c.file_id.is_(None)
+    )
+    async with AsyncSessionLocal() as db:
+        if report.dry_run:
+            result = await db.execute(select(func.count()).select_from(contact_file_association).where(condition))
+            report.associations += result.scalar() or 0
+        else:
+            result = await db.execute(contact_file_association.delete().where(condition))
+            await db.commit()
+            report.associations += result.rowcount or 0
+
+
+async def collect_files(report: GCReport, cutoff: datetime, batch_size: int, max_batches: Optional[int]):
+    """Записи files, не привязанные ни к чему, окнами по id"""
+    async for window in key_windows("files", FileModel.id, 0, batch_size, max_batches, not report.dry_run):
+        async with AsyncSessionLocal() as db:
+            conditions = [
+                FileModel.id == any_(bindparam("window_ids", window, type_=ARRAY(Integer))),
+                FileModel.created_at < cutoff,
+                unreferenced_file_condition()
+            ]
+            if report.dry_run:
+                result = await db.execute(select(FileModel.path, FileModel.sha256).where(*conditions))
+            else:
+                result = await db.execute(
+                    delete(FileModel)
+                    .where(*conditions)
+                    .returning(FileModel.path, FileModel.sha256)
+                    .execution_options(synchronize_session=False)
+                )
+            rows = result.all()
+            await db.commit()
+
+        # Содержимое блобов освобождается на шаге блобов, здесь — только старые файлы
+        legacy_paths = [row.path for row in rows if row.sha256 is None]
+        _, reclaimed = await asyncio.to_thread(_remove_paths, legacy_paths, report.dry_run)
+        report.files += len(rows)
+        report.reclaimed_bytes += reclaimed
+
+
+async def collect_blobs(report: GCReport, cutoff: datetime, batch_size: int, max_batches: Optional[int]):
+    """
+    Блобы без ссылок (ref_count = 0) окнами по sha256.
+    Содержимое удаляется до коммита, пока строки блобов заблокированы удалением:
+    параллельная загрузка тех же байтов ждёт коммита и затем пишет блоб заново
+    """
+    async for window in key_windows("blobs", Blob.sha256, "", batch_size, max_batches, not report.dry_run):
+        async with AsyncSessionLocal() as db:
+            conditions = [
+                Blob.sha256 == any_(bindparam("window_shas", window, type_=ARRAY(String))),
+                Blob.ref_count == 0,
+                Blob.updated_at < cutoff
+            ]
+            if report.dry_run:
+                result = await db.execute(select(Blob.sha256, Blob.path, Blob.size).where(*conditions))
+                rows = result.all()
+            else:
+                result = await db.execute(
+                    delete(Blob).where(*conditions).returning(Blob.sha256, Blob.path, Blob.size)
+                )
+                rows = result.all()
+                try:
+                    await asyncio.gather(*[
+                        storage.delete(key)
+                        for row in rows
+                        for key in blob_storage_keys(row.sha256, row.path)
+                    ])
+                except Exception as e:
+                    await db.rollback()
+                    report.errors.append(f"Не удалось удалить содержимое блобов: {e}")
+                    rows = []
+                else:
+                    await db.commit()
+
+        report.blobs += len(rows)
+        report.reclaimed_bytes += sum(row.size for row in rows)
+
+
+def _walk_uploads(
+        directory: Path,
+        parts: Tuple[str, ...] = (),
+        after: Tuple[str, ...] = ()
+) -> Iterator[Tuple[os.DirEntry, Tuple[str, ...]]]:
+    """
+    Потоковый обход дерева uploads в порядке путей: (файл, части пути внутри uploads).
+    Файлы до after (включительно) пропускаются вместе с целыми каталогами.
+    В памяти — только список одного каталога (каталоги шардированы)
+    """
+    try:
+        with os.scandir(directory) as iterator:
+            entries = sorted(iterator, key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        entry_parts = parts + (entry.name,)
+        if entry.is_dir(follow_symlinks=False):
+            if (not parts and entry.name in SKIP_DIRS) or entry_parts < after[:len(entry_parts)]:
+                continue
+            yield from _walk_uploads(Path(entry.path), entry_parts, after)
+        elif entry.is_file(follow_symlinks=False) and entry_parts > after:
+            yield entry, entry_parts
+
+
+def _next_entries(
+        iterator: Iterator[Tuple[os.DirEntry, Tuple[str, ...]]],
+        count: int,
+        cutoff_ts: float
+) -> Tuple[List[Tuple[Path, int]], Optional[Tuple[str, ...]]]:
+    """
+    Следующая пачка файлов старше cutoff (выполняется в потоке):
+    [(путь, размер)] и части пути последнего просмотренного файла (None — обход закончен)
+    """
+    batch = []
+    last = None
+    for entry, parts in islice(iterator, count):
+        last = parts
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime < cutoff_ts:
+            batch.append((Path(entry.path), stat.st_size))
+    return batch, last
+
+
+async def find_unregistered(db: AsyncSession, entries: List[Tuple[Path, int]]) -> List[Tuple[Path, int]]:
+    """
+    Файлы пачки, которых нет в БД: три запроса на пачку (блобы, id и пути файлов).
+    Прочие файлы сверяются с files.path и с URL в обоих видах, которые встречаются
+    в старых строках (/uploads/contacts/... и /<тип>/...).
+    Временные файлы загрузок в staging и .tmp удаляются без проверки
+    """
+    orphans = []
+    by_sha: Dict[str, List[Tuple[Path, int]]] = {}
+    by_id: Dict[int, List[Tuple[Path, int]]] = {}
+    by_key: Dict[str, List[Tuple[Path, int]]] = {}
+    for path, size in entries:
+        relative = path.relative_to(UPLOAD_ROOT)
+        top = relative.parts[0] if len(relative.parts) > 1 else None
+        if top == STAGING_DIR.name or relative.name.endswith(".tmp"):
+            orphans.append((path, size))
+        elif top == BLOB_DIR.name:
+            by_sha.setdefault(relative.stem, []).append((path, size))
+        elif top == THUMBNAIL_DIR.name:
+            key = relative.stem.rpartition("_")[0]
+            if key.startswith("file_") and key[5:].isdigit():
+                by_id.setdefault(int(key[5:]), []).append((path, size))
+            else:
+                by_sha.setdefault(key, []).append((path, size))
+        else:
+            by_key.setdefault(relative.as_posix(), []).append((path, size))
+
+    known_shas, known_ids, known_keys = set(), set(), set()
+    if by_sha:
+        result = await db.execute(
+            select(Blob.sha256).where(Blob.sha256 == any_(bindparam("shas", list(by_sha), type_=ARRAY(String))))
+        )
+        known_shas = set(result.scalars().all())
+    if by_id:
+        result = await db.execute(
+            select(FileModel.id).where(FileModel.id == any_(bindparam("ids", list(by_id), type_=ARRAY(Integer))))
+        )
+        known_ids = set(result.scalars().all())
+    if by_key:
+        paths = [(UPLOAD_ROOT / key).as_posix() for key in by_key]
+        urls = [upload_url(path) for path in paths] + ["/" + key for key in by_key]
+        result = await db.execute(
+            select(FileModel.path, FileModel.url).where(or_(
+                FileModel.path == any_(bindparam("paths", paths, type_=ARRAY(String))),
+                FileModel.url == any_(bindparam("urls", urls, type_=ARRAY(String)))
+            ))
+        )
+        for row in result.all():
+            known_keys.add(upload_key(row.url))
+            if Path(row.path).parts[:1] == UPLOAD_ROOT.parts:
+                known_keys.add(Path(row.path).relative_to(UPLOAD_ROOT).as_posix())
+
+    for sha256, items in by_sha.items():
+        if sha256 not in known_shas:
+            orphans.extend(items)
+    for file_id, items in by_id.items():
+        if file_id not in known_ids:
+            orphans.extend(items)
+    for key, items in by_key.items():
+        if key not in known_keys:
+            orphans.extend(items)
+    return orphans
+
+
+async def collect_disk(report: GCReport, cutoff: datetime, batch_size: int, max_batches: Optional[int]):
+    """Файлы в uploads без записей в БД: недописанные загрузки, блобы и превью без строк"""
+    if not UPLOAD_ROOT.exists():
+        return
+    saved = await load_cursor("disk")
+    start = tuple(saved.split("/")) if saved else ()
+    # Круг от сохранённой позиции до конца, затем от начала до неё
+    laps = [(start, None)] + ([((), start)] if start else [])
+    cutoff_ts = cutoff.timestamp()
+    batches = 0
+    for after, upper in laps:
+        iterator = _walk_uploads(UPLOAD_ROOT, after=after)
+        if upper is not None:
+            iterator = takewhile(lambda item, upper=upper: item[1] <= upper, iterator)
+        while max_batches is None or batches < max_batches:
+            entries, last = await asyncio.to_thread(_next_entries, iterator, batch_size, cutoff_ts)
+            if last is None:
+                break
+            if entries:
+                async with AsyncSessionLocal() as db:
+                    orphans = await find_unregistered(db, entries)
+                removed, reclaimed = await asyncio.to_thread(
+                    _remove_paths, [str(path) for path, _ in orphans], report.dry_run
+                )
+                report.disk_files += removed
+                report.reclaimed_bytes += reclaimed
+            batches += 1
+            if not report.dry_run:
+                await store_cursor("disk", "/".join(last))
+        else:
+            # Лимит пачек исчерпан: следующий запуск продолжит с сохранённой позиции
+            return
+
+    if not report.dry_run:
+        await store_cursor("disk", None)
+
+
+async def run_gc(
+        dry_run: bool = False,
+        batch_size: int = GC_BATCH_SIZE,
+        max_batches: Optional[int] = None,
+        grace_period: timedelta = GC_GRACE_PERIOD
+) -> Dict[str, Any]:
+    """
+    Проход: связи -> файлы -> блобы -> диск. Порядок важен: удаление
+    записей files уменьшает ref_count, и блобы освобождаются в том же проходе.
+    max_batches ограничивает число пачек на каждом шаге; шаги продолжают
+    с позиций, сохранённых прошлым запуском (dry-run позиции не сдвигает)
+    """
+    report = GCReport(dry_run=dry_run)
+    cutoff = datetime.now(timezone.utc) - grace_period
+
+    await collect_associations(report)
+    await collect_files(report, cutoff, batch_size, max_batches)
+    await collect_blobs(report, cutoff, batch_size, max_batches)
+    await collect_disk(report, cutoff, batch_size, max_batches)
+
+    print(
+        f"🧹 Сборка мусора{' (dry-run)' if dry_run else ''}: связей {report.associations}, "
+        f"файлов {report.files}, блобов {report.blobs}, файлов на диске {report.disk_files}, "
+        f"освобождено {report.reclaimed_bytes / 1024 / 1024:.1f}MB"
+    )
+    return asdict(report)
+
+
+async def run_gc_periodically(interval: float = ORPHAN_GC_INTERVAL):
+    """Фоновая задача: периодическая сборка мусора (если задан ORPHAN_GC_INTERVAL)"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_gc()
+        except Exception as e:
+            print(f"❌ Ошибка сборки мусора файлов: {e}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не удалять")
+    parser.add_argument("--batch-size", type=int, default=GC_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None, help="ограничение пачек на каждом шаге")
+    parser.add_argument("--grace-hours", type=float, default=GC_GRACE_PERIOD.total_seconds() / 3600)
+    args = parser.parse_args()
+
+    from models.database import engine
+    try:
+        await run_gc(
+            dry_run=args.dry_run,
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+            grace_period=timedelta(hours=args.grace_hours)
+        )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,352 @@
+# services/resumable_uploads.py
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Optional, Tuple, AsyncIterator
+
+from fastapi import HTTPException, status
+
+from services.blob_storage import (
+    UPLOAD_ROOT, STREAM_CHUNK_SIZE, MIME_SNIFF_SIZE, MAX_FILE_SIZE, StagedUpload, sniff_mime_type
+)
+
+# Сессии лежат в том же разделе, что и блобы, чтобы финализация была переименованием
+RESUMABLE_DIR = UPLOAD_ROOT / "resumable"
+# Переменная окружения может только уменьшить общий предел MAX_FILE_SIZE
+RESUMABLE_MAX_FILE_SIZE = min(int(os.getenv("RESUMABLE_MAX_FILE_SIZE", str(MAX_FILE_SIZE))), MAX_FILE_SIZE)
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024  # рекомендуемый размер части
+RESUMABLE_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Сессия без новых частей дольше этого срока удаляется
+RESUMABLE_UPLOAD_TTL = int(os.getenv("RESUMABLE_UPLOAD_TTL", str(24 * 60 * 60)))  # секунд
+RESUMABLE_PURGE_INTERVAL = 60 * 60  # секунд
+
+WRITE_BUFFER_SIZE = 1024 * 1024  # 1MB
+FINALIZING_SUFFIX = ".finalizing"
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_PART_RE = re.compile(r"^(\d+)-(\d+)\.part$")
+
+
+@dataclass
+class UploadSession:
+    """Метаданные сессии загрузки (meta.json в каталоге сессии)"""
+    upload_id: str
+    name: str
+    extension: str
+    size: int
+    sha256: Optional[str]
+    created_at: float
+    # Создатель сессии: части, статус и финализация доступны только ему
+    owner_id: Optional[int] = None
+
+
+def _not_found():
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Сессия загрузки не найдена или истекла"
+    )
+
+
+def session_dir(upload_id: str) -> Path:
+    if not _UPLOAD_ID_RE.match(upload_id):
+        raise _not_found()
+    return RESUMABLE_DIR / upload_id
+
+
+def _write_meta(directory: Path, session: UploadSession):
+    directory.mkdir(parents=True)
+    (directory / "meta.json").write_text(json.dumps(asdict(session)))
+
+
+def _read_meta(directory: Path) -> Optional[UploadSession]:
+    try:
+        return UploadSession(**json.loads((directory / "meta.json").read_text()))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+async def _owned_session(directory: Path, owner_id: int) -> UploadSession:
+    """Метаданные сессии; чужая сессия неотличима от отсутствующей"""
+    session = await asyncio.to_thread(_read_meta, directory)
+    if session is None or session.owner_id != owner_id:
+        raise _not_found()
+    return session
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Объединение полуинтервалов [start, end)"""
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _list_parts(directory: Path) -> List[Tuple[int, int]]:
+    """
+    Полученные части по именам файлов <start>-<end>.part.
+    Каждая часть пишется во временный файл и переименовывается, поэтому
+    одновременные PUT из разных воркеров не требуют блокировок.
+    Части не перекрываются (кроме повтора той же части), поэтому
+    на диске сессии не больше объявленного размера файла
+    """
+    parts = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = _PART_RE.match(entry.name)
+            if match:
+                parts.append((int(match.group(1)), int(match.group(2))))
+    return parts
+
+
+def _overlaps(parts: List[Tuple[int, int]], start: int, end: int) -> bool:
+    """Пересекается ли [start, end) с полученной частью, отличной от неё самой"""
+    return any(
+        part_start < end and start < part_end
+        for part_start, part_end in parts
+        if (part_start, part_end) != (start, end)
+    )
+
+
+async def create_session(
+        owner_id: int,
+        name: str,
+        extension: str,
+        size: int,
+        sha256: Optional[str] = None
+) -> UploadSession:
+    if size <= 0 or size > RESUMABLE_MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый размер файла. Максимальный размер: {RESUMABLE_MAX_FILE_SIZE // 1024 // 1024}MB"
+        )
+    session = UploadSession(
+        upload_id=uuid.uuid4().hex,
+        name=name,
+        extension=extension,
+        size=size,
+        sha256=sha256.lower() if sha256 else None,
+        created_at=time.time(),
+        owner_id=owner_id
+    )
+    await asyncio.to_thread(_write_meta, session_dir(session.upload_id), session)
+    return session
+
+
+async def get_session(upload_id: str, owner_id: int) -> Tuple[UploadSession, List[Tuple[int, int]]]:
+    """Сессия и объединённые полученные диапазоны"""
+    directory = session_dir(upload_id)
+    session = await _owned_session(directory, owner_id)
+    parts = await asyncio.to_thread(_list_parts, directory)
+    return session, merge_ranges(parts)
+
+
+async def write_chunk(upload_id: str, owner_id: int, offset: int, body: AsyncIterator[bytes]) -> Tuple[int, int]:
+    """
+    Запись части, начинающейся с offset. Размер проверяется по мере чтения тела,
+    за пределы объявленного размера файла записать нельзя
+    """
+    directory = session_dir(upload_id)
+    session = await _owned_session(directory, owner_id)
+    if offset < 0 or offset >= session.size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Смещение за пределами файла"
+        )
+
+    limit = min(session.size - offset, RESUMABLE_MAX_CHUNK_SIZE)
+    tmp_path = directory / f".{uuid.uuid4().hex}.tmp"
+    written = 0
+    buffer = bytearray()
+    try:
+        with open(tmp_path, "wb") as part_file:
+            async for data in body:
+                written += len(data)
+                if written > limit:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Часть выходит за пределы файла или превышает максимальный размер части"
+                    )
+                buffer += data
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    await asyncio.to_thread(part_file.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await asyncio.to_thread(part_file.write, bytes(buffer))
+
+        if written == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Пустая часть"
+            )
+        # Повтор той же части заменяет её; пересечение с другой частью — 409,
+        # иначе части с разными концами копились бы без ограничения
+        parts = await asyncio.to_thread(_list_parts, directory)
+        if _overlaps(parts, offset, offset + written):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Часть пересекается с уже полученными; продолжите с границы полученных диапазонов"
+            )
+        # Пока финализация не забрала каталог, часть появляется атомарно
+        await asyncio.to_thread(os.replace, tmp_path, directory / f"{offset}-{offset + written}.part")
+    except FileNotFoundError:
+        raise _not_found()
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    return offset, offset + written
+
+
+def _assemble(directory: Path, session: UploadSession, target: Path) -> Tuple[str, str]:
+    """
+    Сборка частей по порядку в target с подсчётом SHA-256 и MIME-типа (выполняется в потоке).
+    Перекрытие возможно только при гонке одновременных PUT: из каждой части берётся
+    только ещё не записанный хвост
+    """
+    parts = sorted(_list_parts(directory))
+    digest = hashlib.sha256()
+    mime_type = None
+    position = 0
+    with open(target, "wb") as output:
+        for start, end in parts:
+            if end <= position:
+                continue
+            if start > position:
+                break
+            with open(directory / f"{start}-{end}.part", "rb") as part_file:
+                part_file.seek(position - start)
+                while True:
+                    data = part_file.read(STREAM_CHUNK_SIZE)
+                    if not data:
+                        break
+                    if mime_type is None:
+                        mime_type = sniff_mime_type(data[:MIME_SNIFF_SIZE], session.name)
+                    output.write(data)
+                    digest.update(data)
+            position = end
+    if position != session.size:
+        raise ValueError("incomplete")
+    return digest.hexdigest(), mime_type
+
+
+async def claim_session(upload_id: str, owner_id: int) -> Tuple[UploadSession, Path]:
+    """
+    Захват сессии для финализации переименованием каталога: повторная или
+    одновременная финализация получает 404, новые части больше не принимаются.
+    Владелец проверяется до переименования, чужая сессия остаётся нетронутой
+    """
+    directory = session_dir(upload_id)
+    await _owned_session(directory, owner_id)
+    claimed = directory.with_name(directory.name + FINALIZING_SUFFIX)
+    try:
+        await asyncio.to_thread(os.rename, directory, claimed)
+    except FileNotFoundError:
+        raise _not_found()
+    session = await asyncio.to_thread(_read_meta, claimed)
+    if session is None:
+        raise _not_found()
+    return session, claimed
+
+
+async def release_session(claimed: Path):
+    """Возврат сессии после неудачной финализации, чтобы клиент мог дозагрузить части"""
+    await asyncio.to_thread(os.rename, claimed, claimed.with_name(claimed.name[:-len(FINALIZING_SUFFIX)]))
+
+
+async def assemble_session(session: UploadSession, claimed: Path) -> StagedUpload:
+    """
+    Собранный файл, готовый для store_blobs; неполная загрузка или несовпадение хэша — 400
+    """
+    target = claimed / "assembled"
+    try:
+        sha256, mime_type = await asyncio.to_thread(_assemble, claimed, session, target)
+    except ValueError:
+        await asyncio.to_thread(target.unlink, True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Получены не все части файла"
+        )
+    if session.sha256 and session.sha256 != sha256:
+        await asyncio.to_thread(target.unlink, True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="SHA-256 собранного файла не совпадает с заявленным"
+        )
+    return StagedUpload(
+        name=session.name,
+        extension=session.extension,
+        sha256=sha256,
+        size=session.size,
+        mime_type=mime_type,
+        staged_path=target
+    )
+
+
+async def delete_session(directory: Path):
+    await asyncio.to_thread(shutil.rmtree, directory, True)
+
+
+def _finalizing_activity(path: str) -> float:
+    """
+    Время последней активности захваченной сессии: захват (переименование меняет ctime
+    каталога) или запись собираемого файла
+    """
+    stat = os.stat(path)
+    activity = max(stat.st_mtime, stat.st_ctime)
+    try:
+        activity = max(activity, os.stat(os.path.join(path, "assembled")).st_mtime)
+    except FileNotFoundError:
+        pass
+    return activity
+
+
+def _purge_stale_sessions(ttl: float) -> int:
+    """
+    Удаление сессий без активности дольше ttl (выполняется в потоке).
+    Захваченные (.finalizing) сессии собираются прямо сейчас и пропускаются;
+    удаляется только захват воркера, упавшего больше ttl назад
+    """
+    if not RESUMABLE_DIR.exists():
+        return 0
+    deadline = time.time() - ttl
+    removed = 0
+    with os.scandir(RESUMABLE_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                if entry.name.endswith(FINALIZING_SUFFIX):
+                    if _finalizing_activity(entry.path) >= deadline:
+                        continue
+                # Новая часть обновляет mtime каталога (rename внутри него)
+                elif entry.stat().st_mtime >= deadline:
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+            except FileNotFoundError:
+                continue
+    return removed
+
+
+async def purge_stale_sessions_periodically(
+        interval: float = RESUMABLE_PURGE_INTERVAL,
+        ttl: float = RESUMABLE_UPLOAD_TTL
+):
+    """Фоновая задача: периодическая очистка брошенных сессий загрузки"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(_purge_stale_sessions, ttl)
+            if removed:
+                print(f"🧹 Удалено брошенных сессий загрузки: {removed}")
+        except Exception as e:
+            print(f"❌ Ошибка очистки сессий загрузки: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,101 @@
+# services/session_tokens.py
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Response
+
+from models.user import User
+
+SESSION_TOKEN_COOKIE = "session_token"
+SESSION_TOKEN_HEADER = "session_token"
+# Срок жизни токена; после него пользователь один раз проверяется по БД и токен выпускается заново
+SESSION_TOKEN_TTL = 60 * 60  # секунд
+
+# Без секрета токены не выпускаются и авторизация работает как раньше, через БД
+_SECRET = os.getenv("SESSION_TOKEN_SECRET", "").encode()
+
+
+@dataclass(frozen=True)
+class SessionIdentity:
+    """Утверждения подписанного токена; версия сверяется с кэшем users.token_version"""
+    id: int
+    is_admin: bool
+    version: int
+    expires_at: int
+
+
+def tokens_enabled() -> bool:
+    return bool(_SECRET)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_SECRET, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_session_token(user: User, ttl: int = SESSION_TOKEN_TTL) -> Optional[str]:
+    """Токен вида payload.signature с user id, признаком администратора, сроком и версией"""
+    if not tokens_enabled():
+        return None
+    claims = {
+        "uid": user.id,
+        "adm": bool(user.is_admin),
+        "exp": int(time.time()) + ttl,
+        "ver": user.token_version or 0,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_session_token(token: Optional[str]) -> Optional[SessionIdentity]:
+    """
+    Проверка подписи и срока. Версию токена вызывающий код сверяет
+    с users.token_version (services.auth.load_token_user)
+    """
+    if not token or not tokens_enabled():
+        return None
+
+    payload, _, signature = token.partition(".")
+    if not payload or not signature or not hmac.compare_digest(signature, _sign(payload)):
+        return None
+
+    try:
+        claims = json.loads(_b64decode(payload))
+        identity = SessionIdentity(
+            id=int(claims["uid"]),
+            is_admin=bool(claims["adm"]),
+            version=int(claims["ver"]),
+            expires_at=int(claims["exp"])
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    if identity.expires_at <= time.time():
+        return None
+    return identity
+
+
+def set_session_token_cookie(response: Response, token: Optional[str]):
+    if token is None:
+        return
+    response.set_cookie(
+        key=SESSION_TOKEN_COOKIE,
+        value=token,
+        httponly=True,
+        secure=False,  # В продакшене установите True
+        samesite="lax",
+        max_age=SESSION_TOKEN_TTL
+    )
@@ -0,0 +1,309 @@
+# services/shard_migration.py
+"""
+Онлайн-перенос загруженных файлов из плоских каталогов (uploads/blobs/<имя>,
+uploads/contacts/<имя>, uploads/thumbs/<имя>, ...) в двухуровневую раскладку
+uploads/<каталог>/ab/cd/<имя>, в которой новые файлы сохраняются сразу.
+
+Работает пачками без остановки приложения. Для каждой пачки:
+1. содержимое копируется на новое место (локально — жёсткой ссылкой), старый путь остаётся валиден;
+2. в одной транзакции обновляются blobs.path, files.path/url или files.derivatives;
+3. после коммита старые файлы удаляются.
+Уже перенесённые записи в выборку не попадают, поэтому прерванный запуск
+можно просто повторить.
+
+Запуск (из каталога code):
+    python -m services.shard_migration --dry-run
+    python -m services.shard_migration --batch-size 500 --max-batches 20 --pause 0.5
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import select, update, bindparam
+
+from models.database import AsyncSessionLocal
+from models.file import File as FileModel
+from models.blob import Blob
+from services.blob_storage import UPLOAD_ROOT, shard_path, is_sharded, upload_url, upload_key
+from services.storage_backends import StorageBackend, LocalStorageBackend, storage, storage_key
+
+MIGRATION_BATCH_SIZE = 500
+# Пауза между пачками, чтобы перенос не отнимал диск у рабочих запросов
+MIGRATION_PAUSE = 0.2  # секунд
+
+files_table = FileModel.__table__
+blobs_table = Blob.__table__
+
+# Старые файлы без sha256 и их превью всегда лежат на локальном диске
+local_storage = LocalStorageBackend()
+
+
+@dataclass
+class MigrationReport:
+    dry_run: bool
+    blobs: int = 0
+    files: int = 0
+    derivatives: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+def sharded_path(path: str) -> Optional[str]:
+    """Новый путь для файла из плоского каталога uploads/<каталог>/<имя>, иначе None"""
+    relative = Path(path).relative_to(UPLOAD_ROOT)
+    if len(relative.parts) != 2 or is_sharded(path):
+        return None
+    return str(shard_path(UPLOAD_ROOT / relative.parts[0], relative.name))
+
+
+def sharded_derivatives(derivatives: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """derivatives с URL превью в новой раскладке или None, если переносить нечего"""
+    changed = False
+    result = {}
+    for size, derivative in derivatives.items():
+        new_path = sharded_path(str(UPLOAD_ROOT / upload_key(derivative["url"])))
+        if new_path is not None:
+            derivative = {**derivative, "url": upload_url(new_path)}
+            changed = True
+        result[size] = derivative
+    return result if changed else None
+
+
+async def copy_all(backend: StorageBackend, moves: List[tuple], report: MigrationReport) -> List[tuple]:
+    """Копирование (old_path, new_path, ...) на новое место; возвращает успешно скопированные"""
+    results = await asyncio.gather(*[
+        backend.copy(storage_key(move[0]), storage_key(move[1])) for move in moves
+    ], return_exceptions=True)
+
+    copied = []
+    for move, result in zip(moves, results):
+        if isinstance(result, Exception):
+            report.errors.append(f"{move[0]}: {result}")
+        else:
+            copied.append(move)
+    return copied
+
+
+async def delete_old(backend: StorageBackend, paths: List[str]):
+    await asyncio.gather(*[backend.delete(storage_key(path)) for path in paths], return_exceptions=True)
+
+
+async def migrate_blobs(report: MigrationReport, batch_size: int, max_batches: Optional[int], pause: float):
+    """Блобы: blobs.path и files.path/url всех файлов с этим содержимым"""
+    cursor = ""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Blob.sha256, Blob.path).where(Blob.sha256 > cursor).order_by(Blob.sha256).limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        cursor = rows[-1].sha256
+
+        moves = [
+            (row.path, new_path, row.sha256)
+            for row in rows
+            if (new_path := sharded_path(row.path)) is not None
+        ]
+        if report.dry_run or not moves:
+            report.blobs += len(moves)
+            continue
+
+        moves = await copy_all(storage, moves, report)
+        if not moves:
+            continue
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(blobs_table)
+                .where(blobs_table.c.sha256 == bindparam("b_sha256"))
+                .values(path=bindparam("b_path")),
+                [{"b_sha256": sha256, "b_path": new_path} for _, new_path, sha256 in moves]
+            )
+            await db.execute(
+                update(files_table)
+                .where(files_table.c.sha256 == bindparam("b_sha256"))
+                .values(path=bindparam("b_path"), url=bindparam("b_url")),
+                [
+                    {"b_sha256": sha256, "b_path": new_path, "b_url": upload_url(new_path)}
+                    for _, new_path, sha256 in moves
+                ]
+            )
+            await db.commit()
+
+        await delete_old(storage, [old_path for old_path, _, _ in moves])
+        report.blobs += len(moves)
+        await asyncio.sleep(pause)
+
+
+async def migrate_legacy_files(report: MigrationReport, batch_size: int, max_batches: Optional[int], pause: float):
+    """Старые файлы без sha256 (uploads/contacts, uploads/<тип>): files.path/url по id"""
+    cursor = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(FileModel.id, FileModel.path, FileModel.sha256)
+                .where(FileModel.id > cursor)
+                .order_by(FileModel.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        cursor = rows[-1].id
+
+        moves = [
+            (row.path, new_path, row.id)
+            for row in rows
+            if row.sha256 is None and (new_path := sharded_path(row.path)) is not None
+        ]
+        if report.dry_run or not moves:
+            report.files += len(moves)
+            continue
+
+        moves = await copy_all(local_storage, moves, report)
+        if not moves:
+            continue
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(files_table)
+                .where(files_table.c.id == bindparam("b_id"))
+                .values(path=bindparam("b_path"), url=bindparam("b_url")),
+                [
+                    {"b_id": file_id, "b_path": new_path, "b_url": upload_url(new_path)}
+                    for _, new_path, file_id in moves
+                ]
+            )
+            await db.commit()
+
+        await delete_old(local_storage, [old_path for old_path, _, _ in moves])
+        report.files += len(moves)
+        await asyncio.sleep(pause)
+
+
+async def migrate_derivatives(report: MigrationReport, batch_size: int, max_batches: Optional[int], pause: float):
+    """
+    Превью: файлы превью и files.derivatives. Превью блоба общие для всех его файлов,
+    поэтому derivatives обновляются сразу у всех строк с тем же sha256
+    """
+    cursor = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(FileModel.id, FileModel.sha256, FileModel.derivatives)
+                .where(FileModel.id > cursor, FileModel.derivatives.isnot(None))
+                .order_by(FileModel.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            break
+        cursor = rows[-1].id
+
+        # ключ -> (старые derivatives, новые derivatives)
+        by_sha: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        by_id: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        for row in rows:
+            new_derivatives = sharded_derivatives(row.derivatives)
+            if new_derivatives is None:
+                continue
+            if row.sha256:
+                by_sha.setdefault(row.sha256, (row.derivatives, new_derivatives))
+            else:
+                by_id[row.id] = (row.derivatives, new_derivatives)
+
+        if report.dry_run or not (by_sha or by_id):
+            report.derivatives += len(by_sha) + len(by_id)
+            continue
+
+        # Превью блобов лежат в хранилище блобов, превью старых файлов — на диске
+        moved_paths = {storage: [], local_storage: []}
+        for backend, groups in ((storage, by_sha), (local_storage, by_id)):
+            for key in list(groups):
+                old_derivatives, new_derivatives = groups[key]
+                moves = [
+                    (str(UPLOAD_ROOT / upload_key(old["url"])), str(UPLOAD_ROOT / upload_key(new["url"])))
+                    for old, new in zip(old_derivatives.values(), new_derivatives.values())
+                    if old["url"] != new["url"]
+                ]
+                copied = await copy_all(backend, moves, report)
+                if len(copied) != len(moves):
+                    del groups[key]
+                    continue
+                moved_paths[backend].extend(old_path for old_path, _ in moves)
+
+        async with AsyncSessionLocal() as db:
+            if by_sha:
+                await db.execute(
+                    update(files_table)
+                    .where(files_table.c.sha256 == bindparam("b_sha256"))
+                    .values(derivatives=bindparam("b_derivatives")),
+                    [{"b_sha256": sha256, "b_derivatives": new} for sha256, (_, new) in by_sha.items()]
+                )
+            if by_id:
+                await db.execute(
+                    update(files_table)
+                    .where(files_table.c.id == bindparam("b_id"))
+                    .values(derivatives=bindparam("b_derivatives")),
+                    [{"b_id": file_id, "b_derivatives": new} for file_id, (_, new) in by_id.items()]
+                )
+            await db.commit()
+
+        for backend, paths in moved_paths.items():
+            await delete_old(backend, paths)
+        report.derivatives += len(by_sha) + len(by_id)
+        await asyncio.sleep(pause)
+
+
+async def run_migration(
+        dry_run: bool = False,
+        batch_size: int = MIGRATION_BATCH_SIZE,
+        max_batches: Optional[int] = None,
+        pause: float = MIGRATION_PAUSE
+) -> Dict[str, Any]:
+    report = MigrationReport(dry_run=dry_run)
+    await migrate_blobs(report, batch_size, max_batches, pause)
+    await migrate_legacy_files(report, batch_size, max_batches, pause)
+    await migrate_derivatives(report, batch_size, max_batches, pause)
+
+    print(
+        f"📦 Перенос в шардированную раскладку{' (dry-run)' if dry_run else ''}: "
+        f"блобов {report.blobs}, старых файлов {report.files}, наборов превью {report.derivatives}, "
+        f"ошибок {len(report.errors)}"
+    )
+    for error in report.errors:
+        print(f"❌ {error}")
+    return asdict(report)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать, ничего не переносить")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None, help="ограничение пачек на каждом шаге")
+    parser.add_argument("--pause", type=float, default=MIGRATION_PAUSE, help="пауза между пачками, с")
+    args = parser.parse_args()
+
+    from models.database import engine
+    try:
+        await run_migration(
+            dry_run=args.dry_run,
+            batch_size=args.batch_size,
+            max_batches=args.max_batches,
+            pause=args.pause
+        )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
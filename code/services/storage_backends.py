@@ -0,0 +1,269 @@
+# services/storage_backends.py
+"""
+Хранилище содержимого блобов и превью: локальный каталог uploads или S3-совместимое
+объектное хранилище (AWS S3, MinIO, moto).
+
+Выбор через переменные окружения:
+    STORAGE_BACKEND=local            — по умолчанию, файлы в ./uploads
+    STORAGE_BACKEND=s3               — объектное хранилище
+    S3_BUCKET, S3_ENDPOINT_URL (для MinIO/moto), S3_REGION,
+    S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_PRESIGN_TTL
+
+Ключ объекта — путь относительно uploads (blobs/<sha256>.<ext>, thumbs/...),
+поэтому Blob.path и File.url одинаковы для обоих вариантов.
+
+Ограничение: в хранилище лежат только блобы и их превью. С STORAGE_BACKEND=s3
+API по-прежнему нужен локальный каталог uploads, общий для всех воркеров и реплик:
+    uploads/staging   — загрузки через API пишутся сюда до put_file, здесь же временные
+                        оригиналы при генерации превью;
+    uploads/resumable — части возобновляемых загрузок (/files/uploads), их собирает
+                        тот воркер, который получил complete;
+    старые файлы без sha256 (uploads/contacts, uploads/exhibitions, ...) и их превью.
+Без общего диска файлы загружаются только напрямую (/files/direct-uploads).
+Временные объекты прямых загрузок (staging/direct/...), для которых клиент не вызвал
+complete, удаляет правило жизненного цикла бакета на префикс staging/
+"""
+import asyncio
+import base64
+import os
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+try:
+    import boto3
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 нужен только для STORAGE_BACKEND=s3
+    boto3 = None
+
+UPLOAD_ROOT = Path("uploads")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+S3_PRESIGN_TTL = int(os.getenv("S3_PRESIGN_TTL", "900"))  # секунд
+
+
+def storage_key(path: str) -> str:
+    """Ключ в хранилище по пути внутри uploads"""
+    return Path(path).relative_to(UPLOAD_ROOT).as_posix()
+
+
+class StorageBackend(ABC):
+    """Интерфейс хранилища; ключи — пути относительно uploads"""
+
+    # Файлы лежат на диске API и отдаются роутом /api/uploads
+    is_local: bool = True
+    # Клиент может загружать и скачивать содержимое напрямую по presigned URL
+    supports_presigned: bool = False
+
+    @abstractmethod
+    async def put_file(self, source: Path, key: str, content_type: Optional[str] = None):
+        """Перенос готового локального файла в хранилище (source после вызова не существует)"""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Есть ли объект с таким ключом"""
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """Размер объекта или None, если его нет"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Удаление объекта; отсутствующий объект — не ошибка"""
+
+    @abstractmethod
+    async def copy(self, source_key: str, target_key: str):
+        """Копия объекта под новым ключом; источник остаётся доступен"""
+
+    @abstractmethod
+    async def download_to(self, key: str, target: Path):
+        """Локальная копия объекта (для обработки, например генерации превью)"""
+
+    async def download_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        """Presigned URL для скачивания мимо API"""
+        return None
+
+    async def presigned_upload(self, key: str, size: int, sha256: str, content_type: str) -> Optional[Dict[str, Any]]:
+        """Параметры прямой загрузки мимо API: {method, url, headers, expires_in}"""
+        return None
+
+
+class LocalStorageBackend(StorageBackend):
+    """Файлы в каталоге uploads; отдаёт их роут /api/uploads (или nginx)"""
+
+    is_local = True
+    supports_presigned = False
+
+    def __init__(self, root: Path = UPLOAD_ROOT):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def _put_file(self, source: Path, key: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, path)
+
+    async def put_file(self, source: Path, key: str, content_type: Optional[str] = None):
+        """Перенос готового файла в хранилище (source после вызова не существует)"""
+        await asyncio.to_thread(self._put_file, source, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).exists)
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return (await asyncio.to_thread(self._path(key).stat)).st_size
+        except FileNotFoundError:
+            return None
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._path(key).unlink, True)
+
+    def _copy(self, source_key: str, target_key: str):
+        source, target = self._path(source_key), self._path(target_key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # Жёсткая ссылка: без копирования данных, оба пути валидны до удаления старого
+            os.link(source, target)
+        except FileExistsError:
+            pass
+        except OSError:
+            tmp_path = target.with_name(f".{target.name}.copy.tmp")
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+
+    async def copy(self, source_key: str, target_key: str):
+        await asyncio.to_thread(self._copy, source_key, target_key)
+
+    def _download_to(self, key: str, target: Path):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self._path(key), target)
+
+    async def download_to(self, key: str, target: Path):
+        await asyncio.to_thread(self._download_to, key, target)
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-совместимое хранилище. boto3 синхронный, поэтому вызовы идут в потоках.
+    Клиенты загружают и скачивают содержимое напрямую по presigned URL
+    """
+
+    is_local = False
+    supports_presigned = True
+
+    def __init__(
+            self,
+            bucket: str,
+            endpoint_url: Optional[str] = None,
+            region: Optional[str] = None,
+            access_key_id: Optional[str] = None,
+            secret_access_key: Optional[str] = None,
+            presign_ttl: int = S3_PRESIGN_TTL
+    ):
+        if boto3 is None:
+            raise RuntimeError("Для STORAGE_BACKEND=s3 установите boto3")
+        self.bucket = bucket
+        self.presign_ttl = presign_ttl
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            # path-style нужен MinIO и moto; s3v4 — для подписи checksum-заголовков
+            config=BotoConfig(signature_version="s3v4", s3={"addressing_style": "path"})
+        )
+
+    def _put_file(self, source: Path, key: str, content_type: Optional[str]):
+        extra_args = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(str(source), self.bucket, key, ExtraArgs=extra_args)
+        source.unlink(missing_ok=True)
+
+    async def put_file(self, source: Path, key: str, content_type: Optional[str] = None):
+        """Загрузка файла в бакет (multipart для больших файлов); локальная копия удаляется"""
+        await asyncio.to_thread(self._put_file, source, key, content_type)
+
+    def _head(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._head, key) is not None
+
+    async def size(self, key: str) -> Optional[int]:
+        head = await asyncio.to_thread(self._head, key)
+        return head["ContentLength"] if head else None
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def copy(self, source_key: str, target_key: str):
+        await asyncio.to_thread(
+            self.client.copy,
+            {"Bucket": self.bucket, "Key": source_key},
+            self.bucket,
+            target_key
+        )
+
+    async def download_to(self, key: str, target: Path):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self.client.download_file, self.bucket, key, str(target))
+
+    async def download_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = f'inline; filename="{filename}"'
+        # Подпись считается локально, без запроса к хранилищу
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.presign_ttl)
+
+    async def presigned_upload(self, key: str, size: int, sha256: str, content_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Presigned PUT с подписанными размером и SHA-256: хранилище само отклонит
+        тело другой длины или с другим хэшем, поэтому ключ по хэшу остаётся честным
+        """
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentLength": size,
+                "ContentType": content_type,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=self.presign_ttl
+        )
+        return {
+            "method": "PUT",
+            "url": url,
+            "headers": {
+                "Content-Type": content_type,
+                "Content-Length": str(size),
+                "x-amz-checksum-sha256": checksum,
+            },
+            "expires_in": self.presign_ttl,
+        }
+
+
+def create_storage_backend() -> StorageBackend:
+    if STORAGE_BACKEND == "s3":
+        return S3StorageBackend(
+            bucket=os.environ["S3_BUCKET"],
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            region=os.getenv("S3_REGION") or None,
+            access_key_id=os.getenv("S3_ACCESS_KEY_ID") or None,
+            secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY") or None
+        )
+    return LocalStorageBackend()
+
+
+# Общий экземпляр
+storage = create_storage_backend()
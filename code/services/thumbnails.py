@@ -0,0 +1,179 @@
+# services/thumbnails.py
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Iterable
+
+from sqlalchemy import update
+
+from models.database import AsyncSessionLocal
+from models.file import File as FileModel
+from services.blob_storage import UPLOAD_ROOT, STAGING_DIR, upload_url, upload_key, shard_path
+from services.storage_backends import storage, storage_key
+
+THUMBNAIL_DIR = UPLOAD_ROOT / "thumbs"
+# Максимальная сторона превью, px
+THUMBNAIL_SIZES = (160, 480, 1024)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tiff"}
+
+
+def is_image(path: str) -> bool:
+    return Path(path).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def generate_thumbnails(source_path: str, key: str, sizes: Iterable[int]) -> Dict[str, Dict[str, Any]]:
+    """
+    Генерация превью в процессе пула: WebP, а если Pillow собран без WebP — JPEG.
+    Уже существующие превью (тот же блоб у другого файла) не пересоздаются.
+    Возвращает {размер: {url, format, width, height}}
+    """
+    from PIL import Image, ImageOps, features
+
+    image_format, extension = ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+    derivatives = {}
+    with Image.open(source_path) as source:
+        source = ImageOps.exif_transpose(source)
+        if image_format == "JPEG" or source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGB")
+
+        for size in sorted(sizes):
+            path = shard_path(THUMBNAIL_DIR, f"{key}_{size}{extension}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                with Image.open(path) as existing:
+                    width, height = existing.size
+            else:
+                thumbnail = source.copy()
+                # Превью не бывает больше оригинала
+                thumbnail.thumbnail((size, size), Image.LANCZOS)
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                thumbnail.save(tmp_path, image_format, quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, path)
+                width, height = thumbnail.size
+
+            derivatives[str(size)] = {
+                "url": upload_url(str(path)),
+                "format": extension.lstrip("."),
+                "width": width,
+                "height": height,
+            }
+    return derivatives
+
+
+class ThumbnailWorker:
+    """
+    Фоновая генерация превью изображений после загрузки.
+    Ресайз выполняется в пуле процессов, результат записывается в files.derivatives
+    для всех файлов с тем же блобом
+    """
+
+    def __init__(self, workers: int = THUMBNAIL_WORKERS, sizes: Iterable[int] = THUMBNAIL_SIZES):
+        self.workers = workers
+        self.sizes = tuple(sizes)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def enqueue(self, files: Iterable[Dict[str, Any]]):
+        """Поставить в очередь файлы вида {id, path, sha256}; не изображения пропускаются"""
+        queue = self._get_queue()
+        for file in files:
+            if file.get("path") and is_image(file["path"]):
+                queue.put_nowait(file)
+
+    async def _generate(self, file: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        key = file.get("sha256") or f"file_{file['id']}"
+        loop = asyncio.get_running_loop()
+
+        # Старые файлы (без sha256) и блобы локального хранилища читаются по месту
+        if storage.is_local or not file.get("sha256"):
+            return await loop.run_in_executor(
+                self._pool, generate_thumbnails, file["path"], key, self.sizes
+            )
+
+        # Объектное хранилище: оригинал скачивается во временный файл,
+        # готовые превью загружаются в хранилище и удаляются с диска
+        source = STAGING_DIR / f"{uuid.uuid4().hex}{Path(file['path']).suffix}"
+        try:
+            await storage.download_to(storage_key(file["path"]), source)
+            derivatives = await loop.run_in_executor(
+                self._pool, generate_thumbnails, str(source), key, self.sizes
+            )
+        finally:
+            await asyncio.to_thread(source.unlink, True)
+
+        await asyncio.gather(*[
+            storage.put_file(UPLOAD_ROOT / upload_key(derivative["url"]), upload_key(derivative["url"]),
+                             f"image/{derivative['format'].replace('jpg', 'jpeg')}")
+            for derivative in derivatives.values()
+        ])
+        return derivatives
+
+    async def _process(self, file: Dict[str, Any]):
+        derivatives = await self._generate(file)
+
+        condition = (
+            FileModel.sha256 == file["sha256"] if file.get("sha256") else FileModel.id == file["id"]
+        )
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(FileModel)
+                .where(condition)
+                .values(derivatives=derivatives)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    async def _run(self):
+        queue = self._get_queue()
+        while True:
+            file = await queue.get()
+            try:
+                await self._process(file)
+            except Exception as e:
+                print(f"❌ Ошибка генерации превью для {file.get('path')}: {e}")
+            finally:
+                queue.task_done()
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._get_queue().join(), timeout)
+            except asyncio.TimeoutError:
+                print("⚠️ Очередь генерации превью не обработана до конца")
+            self._task.cancel()
+            self._task = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def thumbnail_url(file_url: str, derivatives: Optional[Dict[str, Any]], size: int) -> str:
+    """URL превью ближайшего размера не меньше запрошенного, иначе оригинала"""
+    if not derivatives:
+        return file_url
+    available = sorted(int(key) for key in derivatives)
+    for available_size in available:
+        if available_size >= size:
+            return derivatives[str(available_size)]["url"]
+    return derivatives[str(available[-1])]["url"]
+
+
+# Общий экземпляр воркера
+thumbnails = ThumbnailWorker()
@@ -0,0 +1,121 @@
+# services/user_cache.py
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional, Dict, Any, Tuple, Set
+
+from models.user import User
+
+USER_CACHE_TTL = 60  # секунд
+USER_CACHE_MAX_SIZE = 10000
+# Версия токенов пользователя (users.token_version): в других воркерах
+# отзыв токенов вступает в силу не позже чем через этот срок
+TOKEN_VERSION_TTL = 10  # секунд
+
+# Колонки пользователя, которые хранятся в кэше
+USER_CACHE_FIELDS = tuple(column.name for column in User.__table__.columns)
+
+CacheKey = Tuple[int, str]
+
+
+class UserCache:
+    """
+    TTL/LRU-кэш пользователей по (user_id, session_id) в памяти процесса.
+    Хранит снимок колонок и на каждое попадание отдаёт новый объект User,
+    не привязанный к сессии БД, — его можно безопасно читать в любом запросе.
+    Рядом с коротким TTL хранятся версии токенов пользователей для проверки подписанных токенов.
+    Сбрасывается через invalidate_user() при изменении, удалении, входе и выходе пользователя
+    """
+
+    def __init__(
+            self,
+            ttl: float = USER_CACHE_TTL,
+            max_size: int = USER_CACHE_MAX_SIZE,
+            token_version_ttl: float = TOKEN_VERSION_TTL
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.token_version_ttl = token_version_ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[CacheKey]] = defaultdict(set)
+        self._token_versions: "OrderedDict[int, Tuple[float, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _remove(self, key: CacheKey):
+        self._entries.pop(key, None)
+        user_keys = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
+
+    def get(self, user_id: int, session_id: str) -> Optional[User]:
+        key = (user_id, session_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return User(**entry[1])
+
+    def put(self, session_id: str, user: User):
+        key = (user.id, session_id)
+        snapshot = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+        self._entries[key] = (time.monotonic() + self.ttl, snapshot)
+        self._entries.move_to_end(key)
+        self._keys_by_user[user.id].add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def get_token_version(self, user_id: int) -> Optional[int]:
+        entry = self._token_versions.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._token_versions[user_id]
+            return None
+        return entry[1]
+
+    def put_token_version(self, user_id: int, version: int):
+        self._token_versions[user_id] = (time.monotonic() + self.token_version_ttl, version)
+        self._token_versions.move_to_end(user_id)
+        while len(self._token_versions) > self.max_size:
+            self._token_versions.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Сброс всех сессий пользователя и версии его токенов"""
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._remove(key)
+        self._token_versions.pop(user_id, None)
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+        self._token_versions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "token_versions": len(self._token_versions),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Общий экземпляр
+user_cache = UserCache()
@@ -0,0 +1,200 @@
+# tests/test_auth.py
+import pytest
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+
+from models.database import get_db
+from models.user import User
+from services import auth, session_tokens
+from services.auth import require_auth, require_admin, get_optional_user, get_current_user, get_current_user_id
+from services.auth_service import auth_service
+from services.user_cache import user_cache
+
+USERS = {
+    1: {"id": 1, "full_name": "Иванов Иван", "is_admin": False, "token_version": 0},
+    2: {"id": 2, "full_name": "Петров Пётр", "is_admin": True, "token_version": 0},
+}
+
+
+@pytest.fixture
+def version_lookups():
+    """Запросы версии токенов к БД за время теста (id пользователей)"""
+    return []
+
+
+@pytest.fixture
+def lookups(monkeypatch, version_lookups):
+    """Поиски пользователя в БД за время теста (id пользователей)"""
+    calls = []
+
+    async def fetch_user(db, user_id):
+        calls.append(user_id)
+        data = USERS.get(user_id)
+        return User(**data) if data else None
+
+    async def fetch_token_version(db, user_id):
+        version_lookups.append(user_id)
+        data = USERS.get(user_id)
+        return data["token_version"] if data else None
+
+    monkeypatch.setattr(auth, "fetch_user", fetch_user)
+    monkeypatch.setattr(auth, "fetch_token_version", fetch_token_version)
+    # Проверка сессии во внешней системе — в tests/test_auth_service.py
+    monkeypatch.setattr(auth_service, "enabled", False)
+    user_cache.clear()
+    yield calls
+    user_cache.clear()
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    monkeypatch.setattr(session_tokens, "_SECRET", b"test-secret")
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_db] = no_db
+
+    # Как get_contacts / update_contact: require_auth в dependencies и get_optional_user в параметрах
+    @app.get("/stacked", dependencies=[Depends(require_auth)])
+    async def stacked(current_user=Depends(get_optional_user)):
+        return {"id": current_user.id, "is_admin": current_user.is_admin}
+
+    @app.get("/admin", dependencies=[Depends(require_admin)])
+    async def admin(current_user=Depends(require_admin), optional_user=Depends(get_optional_user)):
+        return {"id": current_user.id, "same": current_user is optional_user}
+
+    @app.get("/profile", dependencies=[Depends(require_auth)])
+    async def profile(current_user=Depends(get_current_user)):
+        return {"full_name": current_user.full_name}
+
+    # Как create_contact: автор и область ключа идемпотентности
+    @app.get("/author")
+    async def author(current_user_id=Depends(get_current_user_id)):
+        return {"author_id": current_user_id}
+
+    return TestClient(app)
+
+
+def credentials(user_id: int):
+    return {"user_id": str(user_id), "session_id": f"session-{user_id}"}
+
+
+def test_stacked_dependencies_look_up_user_once(client, lookups):
+    response = client.get("/stacked", headers=credentials(1))
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "is_admin": False}
+    assert lookups == [1]
+
+
+def test_admin_and_optional_user_share_one_lookup(client, lookups):
+    client.cookies.update(credentials(2))
+    response = client.get("/admin")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 2, "same": True}
+    assert lookups == [2]
+
+
+def test_non_admin_is_forbidden_after_one_lookup(client, lookups):
+    response = client.get("/admin", headers=credentials(1))
+
+    assert response.status_code == 403
+    assert lookups == [1]
+
+
+def test_anonymous_request_is_rejected(client, lookups):
+    response = client.get("/stacked")
+
+    assert response.status_code == 401
+    assert lookups == []
+
+
+def bearer(user_data: dict) -> dict:
+    return {"Authorization": f"Bearer {session_tokens.issue_session_token(User(**user_data))}"}
+
+
+def test_token_identity_comes_from_signed_claims(client, lookups, version_lookups, tokens):
+    headers = bearer(USERS[2])
+
+    for _ in range(3):
+        response = client.get("/stacked", headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {"id": 2, "is_admin": True}
+
+    # Профиль не читается, версия токена запрашивается один раз за TTL кэша
+    assert lookups == []
+    assert version_lookups == [2]
+
+
+def test_profile_for_token_identity_is_loaded_once(client, lookups, tokens):
+    token = session_tokens.issue_session_token(User(**USERS[1]))
+
+    response = client.get("/profile", headers={"session_token": token})
+
+    assert response.status_code == 200
+    assert response.json() == {"full_name": "Иванов Иван"}
+    assert lookups == [1]
+
+
+def test_revoked_token_is_rejected_after_invalidation(client, lookups, tokens, monkeypatch):
+    headers = bearer(USERS[1])
+    assert client.get("/stacked", headers=headers).status_code == 200
+
+    # Выход и изменение пользователя увеличивают users.token_version и сбрасывают кэш
+    monkeypatch.setitem(USERS, 1, {**USERS[1], "token_version": 1})
+    user_cache.invalidate_user(1)
+
+    response = client.get("/stacked", headers=headers)
+
+    assert response.status_code == 401
+
+
+def test_token_of_deleted_user_is_rejected(client, lookups, tokens, monkeypatch):
+    headers = bearer(USERS[1])
+    monkeypatch.delitem(USERS, 1)
+    user_cache.invalidate_user(1)
+
+    response = client.get("/stacked", headers=headers)
+
+    assert response.status_code == 401
+
+
+def test_cached_token_version_expires(client, lookups, version_lookups, tokens, monkeypatch):
+    headers = bearer(USERS[1])
+    assert client.get("/stacked", headers=headers).status_code == 200
+
+    # Другой воркер отозвал токены: здесь кэш не сброшен, но его TTL истёк
+    monkeypatch.setitem(USERS, 1, {**USERS[1], "token_version": 1})
+    monkeypatch.setattr(user_cache, "token_version_ttl", 0)
+    user_cache.put_token_version(1, 0)
+
+    response = client.get("/stacked", headers=headers)
+
+    assert response.status_code == 401
+    assert version_lookups == [1, 1]
+
+
+def test_author_id_requires_verified_session(client, lookups, monkeypatch):
+    async def reject(session_id, user_id):
+        return False
+
+    # Сессия не подтверждена внешней системой: голый user_id в куки не делает клиента автором
+    monkeypatch.setattr(auth_service, "verify_session", reject)
+    response = client.get("/author", headers=credentials(2))
+
+    assert response.json() == {"author_id": None}
+    assert lookups == []
+
+
+def test_author_id_of_verified_session(client, lookups):
+    response = client.get("/author", headers=credentials(1))
+
+    assert response.json() == {"author_id": 1}
+    assert lookups == [1]
@@ -0,0 +1,110 @@
+# tests/test_auth_service.py
+import asyncio
+import socket
+from collections import Counter
+
+from aiohttp import web
+
+from services.auth_service import AuthService
+
+# session_id -> (HTTP-статус, тело ответа)
+SESSIONS = {
+    "valid": (200, {"ID": 7, "full_name": "Иванов Иван"}),
+    "expired": (401, {"error": "unauthorized"}),
+    "throttled": (429, {"error": "too many requests"}),
+    "broken": (500, {"error": "internal"}),
+}
+
+
+async def run_with_stub(scenario, delay: float = 0):
+    """Локальная заглушка /api/auth_router/check; scenario(service, hits) выполняется против неё"""
+    hits = Counter()
+
+    async def check(request: web.Request):
+        session_id = request.cookies.get("session_id")
+        hits[session_id] += 1
+        if delay:
+            await asyncio.sleep(delay)
+        status, body = SESSIONS.get(session_id, (401, {}))
+        return web.json_response(body, status=status)
+
+    app = web.Application()
+    app.router.add_get("/api/auth_router/check", check)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    await web.SockSite(runner, sock).start()
+
+    service = AuthService(f"http://127.0.0.1:{port}/api/auth_router/check", enabled=True)
+    await service.start()
+    try:
+        await scenario(service, hits)
+    finally:
+        await service.stop()
+        await runner.cleanup()
+
+
+def test_valid_session_is_cached():
+    async def scenario(service, hits):
+        first = await service.get_user_info("valid")
+        second = await service.get_user_info("valid")
+
+        assert first == second == {"ID": 7, "full_name": "Иванов Иван"}
+        assert hits["valid"] == 1
+        assert service.stats()["hits"] == 1
+
+    asyncio.run(run_with_stub(scenario))
+
+
+def test_concurrent_checks_share_one_request():
+    async def scenario(service, hits):
+        results = await asyncio.gather(*[service.get_user_info("valid") for _ in range(20)])
+
+        assert all(result == {"ID": 7, "full_name": "Иванов Иван"} for result in results)
+        assert hits["valid"] == 1
+
+    asyncio.run(run_with_stub(scenario, delay=0.05))
+
+
+def test_rejected_session_is_cached_negatively():
+    async def scenario(service, hits):
+        assert await service.get_user_info("expired") is None
+        assert await service.get_user_info("expired") is None
+        assert hits["expired"] == 1
+
+    asyncio.run(run_with_stub(scenario))
+
+
+def test_throttled_and_failed_checks_are_not_cached():
+    async def scenario(service, hits):
+        for session_id in ("throttled", "broken"):
+            assert await service.get_user_info(session_id) is None
+            assert await service.get_user_info(session_id) is None
+            assert hits[session_id] == 2
+
+    asyncio.run(run_with_stub(scenario))
+
+
+def test_invalidate_forces_a_new_check():
+    async def scenario(service, hits):
+        await service.get_user_info("valid")
+        service.invalidate("valid")
+        await service.get_user_info("valid")
+
+        assert hits["valid"] == 2
+
+    asyncio.run(run_with_stub(scenario))
+
+
+def test_verify_session_checks_the_owner():
+    async def scenario(service, hits):
+        assert await service.verify_session("valid", 7)
+        assert await service.verify_session("valid", "7")
+        assert not await service.verify_session("valid", 8)
+        assert not await service.verify_session("expired", 7)
+        assert not await service.verify_session(None, 7)
+        assert hits["valid"] == 1
+
+    asyncio.run(run_with_stub(scenario))
@@ -0,0 +1,22 @@
+# tests/test_contact_import.py
+import io
+
+import pytest
+
+from services.contact_import import iter_csv_rows
+
+CSV_TEXT = "ФИО;Телефон;Компания\nИванов Иван;79120000000;ООО Ромашка\n"
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "cp1251"])
+def test_csv_is_read_in_utf8_and_excel_cp1251(encoding):
+    rows = list(iter_csv_rows(io.BytesIO(CSV_TEXT.encode(encoding))))
+    assert rows == [(2, {"full_name": "Иванов Иван", "phone_number": "79120000000", "title": "ООО Ромашка"})]
+
+
+def test_cp1251_is_detected_after_utf8_prefix():
+    # Первые строки — ASCII, кириллица в cp1251 только дальше первой порции чтения
+    lines = ["email;city"] + [f"user{i}@example.com;Moscow" for i in range(5000)] + ["last@example.com;Пермь"]
+    data = "\n".join(lines).encode("cp1251")
+    rows = list(iter_csv_rows(io.BytesIO(data)))
+    assert rows[-1][1] == {"email": "last@example.com", "city": "Пермь"}
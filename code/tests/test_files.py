@@ -0,0 +1,82 @@
+# tests/test_files.py
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from models.database import get_db
+from routers.files import router
+from routers.uploads import router as uploads_router
+
+UPLOAD = {"filename": "photo.jpg", "size": 4, "sha256": "0" * 64}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_db] = no_db
+    app.include_router(router, prefix="/api")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("method, path", [
+    ("post", "/api/files/direct-uploads"),
+    ("post", "/api/files/direct-uploads/complete"),
+    ("post", "/api/files/uploads"),
+    ("get", "/api/files/uploads/" + "a" * 32),
+    ("put", "/api/files/uploads/" + "a" * 32 + "?offset=0"),
+    ("post", "/api/files/uploads/" + "a" * 32 + "/complete"),
+    ("delete", "/api/files/uploads/" + "a" * 32),
+])
+def test_upload_endpoints_require_auth(client, method, path):
+    kwargs = {"json": UPLOAD} if method == "post" else {}
+    response = client.request(method.upper(), path, **kwargs)
+    assert response.status_code == 401
+
+
+class FakeResult:
+    def __init__(self, row):
+        self.row = row
+
+    def one_or_none(self):
+        return self.row
+
+
+class FakeSession:
+    """Сессия, которая на любой запрос возвращает одну строку"""
+
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, *args, **kwargs):
+        return FakeResult(self.row)
+
+
+@pytest.mark.parametrize("url, derivatives, location", [
+    # Старый файл контакта без превью
+    ("/uploads/contacts/contact_1_front.jpg", None, "/api/uploads/contacts/contact_1_front.jpg"),
+    # Блоб с готовыми превью
+    (
+        "/uploads/blobs/ab/cd/abcd.jpg",
+        {"160": {"url": "/uploads/thumbs/ab/cd/abcd_160.webp"}},
+        "/api/uploads/thumbs/ab/cd/abcd_160.webp",
+    ),
+])
+def test_thumbnail_redirect_keeps_single_uploads_prefix(url, derivatives, location):
+    app = FastAPI()
+
+    async def fake_db():
+        yield FakeSession(SimpleNamespace(url=url, derivatives=derivatives))
+
+    app.dependency_overrides[get_db] = fake_db
+    app.include_router(router, prefix="/api")
+    app.include_router(uploads_router, prefix="/api")
+
+    response = TestClient(app).get("/api/files/1/thumbnail/160", follow_redirects=False)
+    assert response.status_code == 307
+    assert response.headers["location"] == location
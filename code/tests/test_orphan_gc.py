@@ -0,0 +1,127 @@
+# tests/test_orphan_gc.py
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from services import orphan_gc
+from services.orphan_gc import GCReport, collect_disk, find_unregistered, _walk_uploads
+
+OLD_MTIME = 1_000_000_000
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Сессия, которая на запрос по путям и URL возвращает заданные строки files"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, *args, **kwargs):
+        return FakeResult(self.rows)
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """Дерево uploads в рабочем каталоге теста (UPLOAD_ROOT относительный)"""
+    monkeypatch.chdir(tmp_path)
+
+    def make(*relatives):
+        for relative in relatives:
+            path = Path("uploads") / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x")
+            os.utime(path, (OLD_MTIME, OLD_MTIME))
+    return make
+
+
+def test_walk_is_ordered_and_resumes_after_cursor(uploads):
+    uploads("contacts/b.jpg", "contacts/a.jpg", "blobs/ab/cd/abcd.jpg", "resumable/x/meta.json", "thumbs/t.webp")
+
+    walked = [parts for _, parts in _walk_uploads(Path("uploads"))]
+    assert walked == [
+        ("blobs", "ab", "cd", "abcd.jpg"),
+        ("contacts", "a.jpg"),
+        ("contacts", "b.jpg"),
+        ("thumbs", "t.webp"),
+    ]
+    resumed = [parts for _, parts in _walk_uploads(Path("uploads"), after=("contacts", "a.jpg"))]
+    assert resumed == walked[2:]
+
+
+def test_legacy_files_are_matched_by_path_and_url():
+    entries = [
+        (Path("uploads/contacts/contact_1_front.jpg"), 1),
+        (Path("uploads/exhibitions/1_preview.jpg"), 1),
+        (Path("uploads/general/report.pdf"), 1),
+        (Path("uploads/contacts/orphan.jpg"), 1),
+    ]
+    rows = [
+        SimpleNamespace(path="uploads/contacts/contact_1_front.jpg", url="/uploads/contacts/contact_1_front.jpg"),
+        SimpleNamespace(path="uploads/exhibitions/1_preview.jpg", url="/uploads/exhibitions/1_preview.jpg"),
+        # Старая загрузка через /files/upload: URL без префикса /uploads
+        SimpleNamespace(path="uploads/general/report.pdf", url="/general/report.pdf"),
+    ]
+    orphans = asyncio.run(find_unregistered(FakeSession(rows), entries))
+    assert orphans == [(Path("uploads/contacts/orphan.jpg"), 1)]
+
+
+def test_disk_step_resumes_between_runs(uploads, monkeypatch):
+    uploads("contacts/a.jpg", "contacts/b.jpg", "contacts/c.jpg")
+    cursors = {}
+
+    async def load_cursor(name):
+        return cursors.get(name)
+
+    async def store_cursor(name, value):
+        if value is None:
+            cursors.pop(name, None)
+        else:
+            cursors[name] = value
+
+    class NoSession:
+        async def __aenter__(self):
+            return None
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def everything_orphaned(db, entries):
+        return entries
+
+    monkeypatch.setattr(orphan_gc, "load_cursor", load_cursor)
+    monkeypatch.setattr(orphan_gc, "store_cursor", store_cursor)
+    monkeypatch.setattr(orphan_gc, "AsyncSessionLocal", NoSession)
+    monkeypatch.setattr(orphan_gc, "find_unregistered", everything_orphaned)
+
+    def run(max_batches):
+        report = GCReport(dry_run=False)
+        asyncio.run(collect_disk(report, datetime.now(timezone.utc), 1, max_batches))
+        return report.disk_files
+
+    def remaining():
+        return sorted(path.name for path in Path("uploads/contacts").iterdir())
+
+    assert run(1) == 1
+    assert remaining() == ["b.jpg", "c.jpg"]
+    assert cursors["disk"] == "contacts/a.jpg"
+
+    # Следующий запуск продолжает, а не начинает с первой пачки
+    assert run(1) == 1
+    assert remaining() == ["c.jpg"]
+
+    # Дойдя до конца, проход начинается сначала
+    uploads("contacts/0.jpg")
+    assert run(None) == 2
+    assert remaining() == []
+    assert "disk" not in cursors
@@ -0,0 +1,108 @@
+# tests/test_resumable_uploads.py
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from services import resumable_uploads
+
+OWNER_ID = 1
+STRANGER_ID = 2
+
+
+async def body(data: bytes):
+    yield data
+
+
+@pytest.fixture(autouse=True)
+def resumable_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(resumable_uploads, "RESUMABLE_DIR", tmp_path / "resumable")
+
+
+def create_session(size: int = 4) -> resumable_uploads.UploadSession:
+    return asyncio.run(resumable_uploads.create_session(OWNER_ID, "photo.jpg", ".jpg", size))
+
+
+def test_owner_uploads_and_claims_session():
+    session = create_session()
+
+    async def scenario():
+        await resumable_uploads.write_chunk(session.upload_id, OWNER_ID, 0, body(b"data"))
+        stored, received = await resumable_uploads.get_session(session.upload_id, OWNER_ID)
+        assert stored.owner_id == OWNER_ID
+        assert received == [(0, 4)]
+        claimed_session, claimed = await resumable_uploads.claim_session(session.upload_id, OWNER_ID)
+        staged = await resumable_uploads.assemble_session(claimed_session, claimed)
+        assert staged.staged_path.read_bytes() == b"data"
+
+    asyncio.run(scenario())
+
+
+def test_stranger_gets_not_found():
+    session = create_session()
+
+    async def scenario():
+        for call in (
+                resumable_uploads.get_session(session.upload_id, STRANGER_ID),
+                resumable_uploads.write_chunk(session.upload_id, STRANGER_ID, 0, body(b"data")),
+                resumable_uploads.claim_session(session.upload_id, STRANGER_ID),
+        ):
+            with pytest.raises(HTTPException) as error:
+                await call
+            assert error.value.status_code == 404
+
+        # Чужой запрос не захватил сессию и не записал частей
+        _, received = await resumable_uploads.get_session(session.upload_id, OWNER_ID)
+        assert received == []
+
+    asyncio.run(scenario())
+
+
+def test_session_size_is_capped_by_files_limit():
+    assert resumable_uploads.RESUMABLE_MAX_FILE_SIZE <= resumable_uploads.MAX_FILE_SIZE
+    with pytest.raises(HTTPException) as error:
+        create_session(resumable_uploads.MAX_FILE_SIZE + 1)
+    assert error.value.status_code == 400
+
+
+def test_overlapping_parts_are_rejected():
+    session = create_session(8)
+
+    async def scenario():
+        await resumable_uploads.write_chunk(session.upload_id, OWNER_ID, 0, body(b"data"))
+        # Повтор той же части безопасен
+        await resumable_uploads.write_chunk(session.upload_id, OWNER_ID, 0, body(b"data"))
+        for offset, data in ((0, b"da"), (0, b"data12"), (2, b"ta12"), (3, b"a")):
+            with pytest.raises(HTTPException) as error:
+                await resumable_uploads.write_chunk(session.upload_id, OWNER_ID, offset, body(data))
+            assert error.value.status_code == 409
+        await resumable_uploads.write_chunk(session.upload_id, OWNER_ID, 4, body(b"1234"))
+
+        directory = resumable_uploads.session_dir(session.upload_id)
+        assert sorted(path.name for path in directory.glob("*.part")) == ["0-4.part", "4-8.part"]
+        _, received = await resumable_uploads.get_session(session.upload_id, OWNER_ID)
+        assert received == [(0, 8)]
+
+    asyncio.run(scenario())
+
+
+def test_purge_skips_claimed_sessions():
+    stale = create_session()
+    claimed = create_session()
+    old = time.time() - 10
+
+    async def scenario():
+        _, directory = await resumable_uploads.claim_session(claimed.upload_id, OWNER_ID)
+        return directory
+
+    claimed_dir = asyncio.run(scenario())
+    stale_dir = resumable_uploads.session_dir(stale.upload_id)
+    for directory in (stale_dir, claimed_dir):
+        os.utime(directory, (old, old))
+
+    # Захват только что произошёл: сессия собирается, её не трогают
+    assert resumable_uploads._purge_stale_sessions(ttl=5) == 1
+    assert not stale_dir.exists()
+    assert claimed_dir.exists()
@@ -0,0 +1,212 @@
+# tests/test_storage_backends.py
+import asyncio
+import base64
+import hashlib
+import socket
+import urllib.request
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+moto_server = pytest.importorskip("moto.server")
+
+from services.blob_storage import blob_path
+from services.storage_backends import S3StorageBackend, storage_key
+
+BUCKET = "uploads-test"
+CONTENT = b"\xff\xd8\xff\xe0 jpeg content"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def endpoint_url():
+    """S3 API moto в отдельном потоке: presigned URL проверяются настоящими HTTP-запросами"""
+    port = free_port()
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def backend(endpoint_url):
+    backend = S3StorageBackend(
+        bucket=BUCKET,
+        endpoint_url=endpoint_url,
+        region="us-east-1",
+        access_key_id="test",
+        secret_access_key="test"
+    )
+    backend.client.create_bucket(Bucket=BUCKET)
+    yield backend
+    for item in backend.client.list_objects_v2(Bucket=BUCKET).get("Contents", []):
+        backend.client.delete_object(Bucket=BUCKET, Key=item["Key"])
+    backend.client.delete_bucket(Bucket=BUCKET)
+
+
+def test_put_exists_size_copy_delete(backend, tmp_path):
+    source = tmp_path / "staged"
+    source.write_bytes(CONTENT)
+
+    async def scenario():
+        await backend.put_file(source, "blobs/ab/cd/abcd.jpg", "image/jpeg")
+        assert not source.exists()
+        assert await backend.exists("blobs/ab/cd/abcd.jpg")
+        assert await backend.size("blobs/ab/cd/abcd.jpg") == len(CONTENT)
+        assert await backend.size("blobs/missing.jpg") is None
+
+        await backend.copy("blobs/ab/cd/abcd.jpg", "blobs/copy.jpg")
+        assert await backend.exists("blobs/ab/cd/abcd.jpg")
+
+        target = tmp_path / "downloaded" / "copy.jpg"
+        await backend.download_to("blobs/copy.jpg", target)
+        assert target.read_bytes() == CONTENT
+
+        await backend.delete("blobs/ab/cd/abcd.jpg")
+        assert not await backend.exists("blobs/ab/cd/abcd.jpg")
+
+    asyncio.run(scenario())
+
+
+def test_presigned_upload_and_download(backend):
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+
+    async def scenario():
+        upload = await backend.presigned_upload(f"blobs/{sha256}.jpg", len(CONTENT), sha256, "image/jpeg")
+        assert upload["method"] == "PUT"
+        request = urllib.request.Request(upload["url"], data=CONTENT, headers=upload["headers"], method="PUT")
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 200
+
+        assert await backend.size(f"blobs/{sha256}.jpg") == len(CONTENT)
+        url = await backend.download_url(f"blobs/{sha256}.jpg", filename="photo.jpg")
+        with urllib.request.urlopen(url) as response:
+            assert response.read() == CONTENT
+            assert 'filename="photo.jpg"' in response.headers["Content-Disposition"]
+
+    asyncio.run(scenario())
+
+
+def test_presigned_upload_signs_length_and_checksum(backend):
+    """
+    S3 и MinIO отклоняют тело, не совпадающее с подписанными заголовками
+    (moto подпись presigned URL не проверяет), поэтому проверяется набор подписанных заголовков
+    """
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    upload = asyncio.run(backend.presigned_upload(f"blobs/{sha256}.jpg", len(CONTENT), sha256, "image/jpeg"))
+
+    query = parse_qs(urlsplit(upload["url"]).query)
+    signed_headers = query["X-Amz-SignedHeaders"][0].split(";")
+    assert {"content-length", "content-type", "x-amz-checksum-sha256"} <= set(signed_headers)
+    assert upload["headers"]["x-amz-checksum-sha256"] == base64.b64encode(hashlib.sha256(CONTENT).digest()).decode()
+
+
+
+class FakeDB:
+    """Сессия для complete: запись файла получает id и время создания"""
+
+    def add(self, obj):
+        obj.id = 1
+        obj.created_at = obj.updated_at = datetime.now(timezone.utc)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def direct_client(backend, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from models.database import get_db
+    from models.user import User
+    from routers import files
+    from services.auth import require_auth
+
+    async def upsert_blobs(db, rows):
+        key = storage_key(rows[0]["path"])
+        exists = await backend.exists(key)
+        return [SimpleNamespace(sha256=rows[0]["sha256"], path=rows[0]["path"], inserted=not exists)]
+
+    async def fake_db():
+        yield FakeDB()
+
+    monkeypatch.setattr(files, "storage", backend)
+    monkeypatch.setattr(files, "upsert_blobs", upsert_blobs)
+    monkeypatch.setattr(files.thumbnails, "enqueue", lambda items: None)
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = fake_db
+    app.dependency_overrides[require_auth] = lambda: User(id=1, is_admin=False)
+    app.include_router(files.router, prefix="/api")
+    return TestClient(app)
+
+
+def direct_upload_body(content: bytes) -> dict:
+    return {"filename": "card.jpg", "size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+
+
+def put_presigned(upload: dict, content: bytes):
+    request = urllib.request.Request(upload["url"], data=content, headers=upload["headers"], method="PUT")
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 200
+
+
+def test_direct_upload_goes_through_user_staging_object(direct_client, backend):
+    body = direct_upload_body(CONTENT)
+    ticket = direct_client.post("/api/files/direct-uploads", json=body).json()
+    assert ticket["key"].startswith("staging/direct/1/")
+
+    put_presigned(ticket["upload"], CONTENT)
+    response = direct_client.post("/api/files/direct-uploads/complete", json={**body, "key": ticket["key"]})
+
+    assert response.status_code == 201
+    blob_key = storage_key(response.json()["path"])
+    assert blob_key.startswith("blobs/")
+    assert asyncio.run(backend.size(blob_key)) == len(CONTENT)
+    assert not asyncio.run(backend.exists(ticket["key"]))
+
+
+def test_existing_blob_cannot_be_claimed_by_hash(direct_client, backend, tmp_path):
+    # Чужой файл уже лежит в хранилище блобов
+    body = direct_upload_body(CONTENT)
+    source = tmp_path / "victim"
+    source.write_bytes(CONTENT)
+    asyncio.run(backend.put_file(source, storage_key(blob_path(body["sha256"], ".jpg"))))
+
+    # Билет без загрузки: временного объекта нет
+    ticket = direct_client.post("/api/files/direct-uploads", json=body).json()
+    response = direct_client.post("/api/files/direct-uploads/complete", json={**body, "key": ticket["key"]})
+    assert response.status_code == 400
+
+    # Ключ на блоб, чужой пользователь или другое содержимое
+    other = direct_upload_body(b"attacker bytes")
+    forged_keys = [
+        storage_key(blob_path(body["sha256"], ".jpg")),
+        ticket["key"].replace("/1/", "/2/"),
+        ticket["key"].replace(body["sha256"], other["sha256"]),
+    ]
+    for key in forged_keys:
+        response = direct_client.post("/api/files/direct-uploads/complete", json={**body, "key": key})
+        assert response.status_code == 404
+
+    # Свои байты под чужой хэш: ключ выдан для другого содержимого
+    other_ticket = direct_client.post("/api/files/direct-uploads", json=other).json()
+    put_presigned(other_ticket["upload"], b"attacker bytes")
+    response = direct_client.post(
+        "/api/files/direct-uploads/complete", json={**body, "key": other_ticket["key"]}
+    )
+    assert response.status_code == 404
@@ -0,0 +1,32 @@
+# tests/test_uploads.py
+from pathlib import Path
+
+from sqlalchemy.dialects import postgresql
+
+from routers.uploads import registered_file_condition
+from services.blob_storage import upload_url, upload_key
+
+
+def compiled(condition) -> str:
+    return str(condition.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_files_are_looked_up_by_path():
+    # Старые строки: url /uploads/contacts/..., path uploads/contacts/...
+    assert compiled(registered_file_condition(Path("contacts/contact_1_front.jpg"))) == \
+        "files.path = 'uploads/contacts/contact_1_front.jpg'"
+    assert compiled(registered_file_condition(Path("blobs/ab/cd/abcd.jpg"))) == \
+        "files.path = 'uploads/blobs/ab/cd/abcd.jpg'"
+
+
+def test_thumbnails_are_looked_up_by_blob_or_file():
+    assert compiled(registered_file_condition(Path("thumbs/ab/cd/abcd_160.webp"))) == "files.sha256 = 'abcd'"
+    assert compiled(registered_file_condition(Path("thumbs/file_7_160.webp"))) == "files.id = 7"
+
+
+def test_upload_urls_keep_uploads_prefix():
+    # Фронтенд строит ${VITE_API_URL}${url}, роут отдаёт /api/uploads/...
+    url = upload_url("uploads/blobs/ab/cd/abcd.jpg")
+    assert url == "/uploads/blobs/ab/cd/abcd.jpg"
+    assert upload_key(url) == "blobs/ab/cd/abcd.jpg"
+    assert upload_key("/uploads/contacts/contact_1_front.jpg") == "contacts/contact_1_front.jpg"